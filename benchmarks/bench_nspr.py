@@ -0,0 +1,140 @@
+"""
+Benchmark of the NSPR representation: the former networkx DiGraph NSPR
+(VNFs as "vnf"+str(i) nodes with attribute dicts) against the __slots__
+array-backed NSPR of NSPRGenerator. Memory is measured with tracemalloc
+for a population of NSPRs as they pile up in the lifecycle lists, and the
+speed of the operations the Environment and the lifecycle manager perform
+on each NSPR (describe_vnfs, placements, deallocation reads, unset, deepcopy).
+
+Run with ``python benchmarks/bench_nspr.py``.
+"""
+import copy
+import time
+import argparse
+import tracemalloc
+import numpy
+import networkx
+from kns.pipelines.myclasses.NSPRGenerator import NSPR
+
+
+class GraphNSPR:
+    # former NSPR (only the methods exercised here)
+    def __init__(self, id, priority, duration, nsprtype) -> None:
+        self.nspr = networkx.DiGraph(name=id)
+        self.priority = priority
+        self.duration = duration
+        self.remaining_duration = self.duration
+        self.nsprtype = nsprtype
+        self.status_chain = ""
+
+    def add_vnf(self, rq_cpu, rq_ram, rq_stor, rq_bw):
+        number_of_vnfs = len(self.nspr)
+        if number_of_vnfs == 0:
+            self.nspr.add_node("vnf1", rq_cpu=rq_cpu, rq_ram=rq_ram, rq_stor=rq_stor, placement=None, satisf_res=None)
+        else:
+            self.nspr.add_node("vnf"+str(number_of_vnfs+1), rq_cpu=rq_cpu, rq_ram=rq_ram, rq_stor=rq_stor, placement=None, satisf_res=None)
+            self.nspr.add_edge("vnf"+str(number_of_vnfs), "vnf"+str(number_of_vnfs+1), rq_bw=rq_bw, matching=None, satisf_bw=None)
+
+    def n_vnfs(self):
+        return len(self.nspr)
+
+    def describe_vnfs(self):
+        all_descriptions = []
+        for i in range(1,len(self.nspr)+1):
+            vnf_desc = [self.nspr.nodes["vnf"+str(i)]["rq_cpu"], self.nspr.nodes["vnf"+str(i)]["rq_ram"], self.nspr.nodes["vnf"+str(i)]["rq_stor"]]
+            if i == 1: vnf_desc.append(0.0)
+            else: vnf_desc.append(self.nspr["vnf"+str(i-1)]["vnf"+str(i)]["rq_bw"])
+            all_descriptions.append(vnf_desc)
+        return all_descriptions
+
+    def set_placement(self, vnf_id, cnode_id):
+        self.nspr.nodes["vnf"+str(vnf_id)]["placement"] = "s"+str(cnode_id)
+
+    def get_placement(self, vnf_id):
+        return self.nspr.nodes["vnf"+str(vnf_id)]["placement"]
+
+    def set_satisfied_resources(self, vnf_id, cpu_ram_stor):
+        self.nspr.nodes["vnf"+str(vnf_id)]["satisf_res"] = cpu_ram_stor
+
+    def get_satisfied_resources(self, vnf_id):
+        return self.nspr.nodes["vnf"+str(vnf_id)]["satisf_res"]
+
+    def set_satisfied_bw(self, vnf_id, bandwidth):
+        if vnf_id > 1:
+            self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["satisf_bw"] = bandwidth
+
+    def get_satisfied_bw(self, vnf_id):
+        if vnf_id == 1:
+            return "NoNeed"
+        return self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["satisf_bw"]
+
+    def set_matching(self, vnf_id, physical_path):
+        if vnf_id > 1:
+            self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["matching"] = physical_path
+
+    def get_matching(self, vnf_id):
+        if vnf_id == 1:
+            return "NoNeed"
+        return self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["matching"]
+
+    def unset_placements_and_matchings(self):
+        for vnf_id in range(1,len(self.nspr)+1):
+            if self.nspr.nodes["vnf"+str(vnf_id)]["placement"] is not None:
+                self.nspr.nodes["vnf"+str(vnf_id)]["placement"] = None
+                self.nspr.nodes["vnf"+str(vnf_id)]["satisf_res"] = None
+                if vnf_id > 1:
+                    self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["matching"] = None
+                    self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["satisf_bw"] = None
+            else:
+                break
+
+
+def build(nspr_class, requirements):
+    nsprs = []
+    for nspr_id, vnfs_requirements in enumerate(requirements):
+        nspr = nspr_class("NSPR"+str(nspr_id), 1, 3, 'hard')
+        for rq_cpu, rq_ram, rq_stor, rq_bw in vnfs_requirements.tolist():
+            nspr.add_vnf(rq_cpu, rq_ram, rq_stor, rq_bw)
+        nsprs.append(nspr)
+    return nsprs
+
+
+def lifecycle(nspr):
+    # what an NSPR goes through: described, placed VNF by VNF, deep-copied on termination, then read back for deallocation
+    for vnf_id, requirements in enumerate(nspr.describe_vnfs(), start=1):
+        nspr.set_placement(vnf_id, vnf_id % 6 + 1)
+        nspr.set_satisfied_resources(vnf_id, requirements[:3])
+        nspr.set_matching(vnf_id, ["s1", "r1", "s2"])
+        nspr.set_satisfied_bw(vnf_id, requirements[3])
+    terminated = copy.deepcopy(nspr)
+    for vnf_id in range(1, terminated.n_vnfs()+1):
+        terminated.get_placement(vnf_id), terminated.get_satisfied_resources(vnf_id), terminated.get_matching(vnf_id), terminated.get_satisfied_bw(vnf_id)
+    nspr.unset_placements_and_matchings()
+
+
+def measure(nspr_class, requirements):
+    tracemalloc.start()
+    nsprs = build(nspr_class, requirements)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for nspr in nsprs:
+        lifecycle(nspr)
+    return memory / len(nsprs), (time.perf_counter() - start) / len(nsprs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nsprs", type=int, default=5000)
+    parser.add_argument("--vnfs", type=int, nargs="+", default=[5, 15, 50])
+    arguments = parser.parse_args()
+    print(f"{'VNFs':>5} {'graph memory':>14} {'array memory':>14} {'graph lifecycle':>16} {'array lifecycle':>16} {'speedup':>8}")
+    for n_vnfs in arguments.vnfs:
+        requirements = numpy.random.default_rng(n_vnfs).uniform(3.0, 40.0, size=(arguments.nsprs, n_vnfs, 4))
+        graph_memory, graph_time = measure(GraphNSPR, requirements)
+        array_memory, array_time = measure(NSPR, requirements)
+        print(f"{n_vnfs:>5} {graph_memory/1024:>11.1f}KiB {array_memory/1024:>11.1f}KiB {graph_time*1e6:>14.1f}us {array_time*1e6:>14.1f}us {graph_time/array_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
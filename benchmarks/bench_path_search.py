@@ -0,0 +1,120 @@
+"""
+Benchmark of the path search used when two consecutive VNFs are placed on
+different computing nodes: the former list-of-paths mBFS against the parent
+pointer BFS of InfrastructureManager (networkx) and the CSR PathSearchEngine
+used by ArrayInfrastructureManager. The mBFS frontier grows with the number of
+simple paths, so queries it cannot finish within ``--max-expansions`` popped
+paths are left out of its average (``done`` column).
+
+Run with ``python benchmarks/bench_path_search.py``.
+"""
+import copy
+import time
+import argparse
+import numpy
+import networkx
+from kns.pipelines.myclasses.InfrastructureManager import InfrastructureManager
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+
+
+class SearchBudgetExceeded(Exception):
+    pass
+
+
+def list_of_paths_mbfs(infrastructure, cnode_id1, cnode_id2, bandwidth, nsprtype, max_expansions=None):
+    # former InfrastructureManager.found_a_valid_path_between (one path copy per frontier entry)
+    # its frontier grows with the number of simple paths, so it is given up after max_expansions popped paths
+    paths = [[cnode_id1]]
+    expansions = 0
+    while len(paths) != 0:
+        expansions += 1
+        if max_expansions is not None and expansions > max_expansions:
+            raise SearchBudgetExceeded()
+        path = paths.pop(0)
+        node_name = path[-1]
+        if node_name == cnode_id2:
+            return path
+        for neighbor in networkx.neighbors(infrastructure, node_name):
+            if nsprtype == 'hard':
+                if neighbor not in path and infrastructure[node_name][neighbor]["bw"] >= bandwidth:
+                    paths.append(path+[neighbor])
+            elif nsprtype == 'soft':
+                if neighbor not in path and infrastructure[node_name][neighbor]["bw"] > 0:
+                    paths.append(path+[neighbor])
+    return None
+
+
+class FixedInfrastructure:
+    # minimal infrastructure generator always handing out the same topology
+    def __init__(self, infrastructure) -> None:
+        self.infrastructure = infrastructure
+        self.max_cpu = self.max_ram = self.max_stor = 1.0
+
+    def generate(self):
+        return copy.deepcopy(self.infrastructure) # Graph.copy() may reorder neighbors
+
+    def reset(self):
+        pass
+
+
+def random_infrastructure(n_routers, n_cnodes, seed):
+    # sparse core (random 3-regular graph) with computing nodes hanging off random routers
+    numpy_gen = numpy.random.default_rng(seed)
+    core = networkx.random_regular_graph(3, n_routers, seed=seed)
+    infrastructure = networkx.Graph()
+    for i in range(1, n_cnodes+1):
+        infrastructure.add_node("s"+str(i), cpu=1.0, ram=1.0, stor=1.0)
+    for router1, router2 in core.edges:
+        infrastructure.add_edge("r"+str(router1), "r"+str(router2), bw=numpy_gen.uniform(0.0, 100.0))
+    for i in range(1, n_cnodes+1):
+        infrastructure.add_edge("s"+str(i), "r"+str(numpy_gen.integers(0, n_routers)), bw=100.0)
+    return infrastructure
+
+
+def timed(function, queries):
+    start = time.perf_counter()
+    results = [function(*query) for query in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 3000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--max-expansions", type=int, default=100000, help="paths popped by the list-of-paths mBFS before a query is given up")
+    arguments = parser.parse_args()
+    print(f"{'nodes':>7} {'list-of-paths mBFS (done)':>23} {'graph BFS':>12} {'CSR engine':>12} {'speedup':>9}")
+    for size in arguments.sizes:
+        infrastructure = random_infrastructure(n_routers=size // 2, n_cnodes=size // 2, seed=size)
+        graph_manager = InfrastructureManager(FixedInfrastructure(infrastructure))
+        array_manager = ArrayInfrastructureManager(FixedInfrastructure(infrastructure))
+        numpy_gen = numpy.random.default_rng(0)
+        queries = []
+        while len(queries) < arguments.queries:
+            cnode_id1, cnode_id2 = numpy_gen.integers(1, size // 2 + 1, size=2)
+            if cnode_id1 != cnode_id2:
+                queries.append(("s"+str(cnode_id1), "s"+str(cnode_id2), 30.0, 'hard'))
+        graph_time, graph_paths = timed(graph_manager.found_a_valid_path_between, queries)
+        array_time, array_paths = timed(array_manager.found_a_valid_path_between, queries)
+        assert graph_paths == array_paths
+        # the list-of-paths mBFS is timed on the queries it completes within its budget, the engine on the same queries
+        completed = []
+        for query, array_path in zip(queries, array_paths):
+            try:
+                legacy_time, legacy_path = timed(lambda *query: list_of_paths_mbfs(infrastructure, *query, max_expansions=arguments.max_expansions), [query])
+            except SearchBudgetExceeded:
+                continue
+            assert legacy_path == [array_path]
+            completed.append((query, legacy_time))
+        if len(completed) > 0:
+            legacy_time = sum(query_time for _, query_time in completed) / len(completed)
+            array_time_on_completed, _ = timed(array_manager.found_a_valid_path_between, [query for query, _ in completed])
+            legacy, speedup = f"{legacy_time*1e3:>13.3f}ms", f"{legacy_time/array_time_on_completed:>8.1f}x"
+        else:
+            legacy, speedup = f"{'-':>15}", f"{'-':>9}"
+        legacy += f" ({len(completed):>2}/{len(queries)})"
+        print(f"{size:>7} {legacy} {graph_time*1e3:>10.3f}ms {array_time*1e3:>10.3f}ms {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Load generator of the placement service: replays the evaluation workload of
+NSPRGenerator (parameters of conf/base) from concurrent clients, either
+in-process (PlacementService.place) or over HTTP (PlacementHTTPServer, started
+here or already running at --url), for several micro-batch sizes, and prints
+the service's latency percentiles and throughput.
+
+Run with ``python benchmarks/bench_placement_service.py [--http]``.
+"""
+import copy
+import json
+import argparse
+import threading
+import urllib.request
+from kns.pipelines.myclasses.NSPRGenerator import NSPRGenerator
+from kns.pipelines.myclasses.PlacementService import PlacementService, PlacementHTTPServer, load_q_function
+from kns.pipelines.ddqn_4_features.nodes import build_environment, construct_nn
+from kns.pipelines.ddqn_4_features.serve import load_parameters
+
+
+def workload(nsprgen, n_arrivals):
+    # (arrival time, NSPR) in arrival order, as the evaluation environment would receive them
+    nsprgen = dict(copy.deepcopy(nsprgen), is_for_train=False)
+    generator = NSPRGenerator(nsprgen)
+    requests = []
+    for _ in range(n_arrivals):
+        arrival_time, nsprs = generator.next_arrival()
+        requests.extend((arrival_time, nspr) for nspr in nsprs)
+    return requests
+
+
+def http_place(url, arrival_time, nspr):
+    payload = {"vnfs": nspr.describe_vnfs(), "duration": nspr.duration, "nsprtype": nspr.nsprtype, "priority": int(nspr.priority), "arrival_time": int(arrival_time)}
+    request = urllib.request.Request(url + "/place", data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def replay(place, requests, n_clients):
+    # n_clients threads each send their next request as soon as the previous one is answered (closed loop), in arrival order overall
+    lock = threading.Lock()
+    iterator = iter(requests)
+    def client():
+        while True:
+            with lock:
+                request = next(iterator, None)
+            if request is None:
+                return
+            place(*request)
+    clients = [threading.Thread(target=client) for _ in range(n_clients)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--arrivals", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--max-batch-sizes", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--max-wait-ms", type=float, default=1.0)
+    parser.add_argument("--duration", type=int, default=None, help="duration (ticks) of every NSPR instead of nsprgen's, e.g. for departures to free resources")
+    parser.add_argument("--agent-directory", default=None, help="model.pt to serve (default: an untrained Q-function, latency doesn't depend on weights)")
+    parser.add_argument("--http", action="store_true", help="send requests over HTTP to a server started here")
+    parser.add_argument("--url", default=None, help="send requests over HTTP to an already running server (its stats are printed)")
+    arguments = parser.parse_args()
+    p = load_parameters()
+    if arguments.duration is not None:
+        p["nsprgen"].update(min_duration=arguments.duration, max_duration=arguments.duration)
+    requests = workload(p["nsprgen"], arguments.arrivals)
+    if arguments.url is not None:
+        replay(lambda arrival_time, nspr: http_place(arguments.url, arrival_time, nspr), requests, arguments.clients)
+        with urllib.request.urlopen(arguments.url + "/stats") as response:
+            print(json.loads(response.read()))
+        return
+    print(f"{len(requests)} NSPRs from {arguments.clients} clients {'over HTTP' if arguments.http else 'in-process'}")
+    print(f"{'batch':>6} {'accepted':>9} {'mean batch':>11} {'p50':>9} {'p99':>9} {'throughput':>12}")
+    for max_batch_size in arguments.max_batch_sizes:
+        environment = build_environment(p["infragen"], p["nsprgen"], p["envs"], is_for_train=False)
+        model = construct_nn(p["nn"], p["n_cnode_features"], p["n_vnf_features"], environment.infrastructure_manager.number_of_computing_nodes)
+        if arguments.agent_directory is not None:
+            model = load_q_function(model, arguments.agent_directory)
+        service = PlacementService(model, environment, max_batch_size=max_batch_size, max_wait=arguments.max_wait_ms / 1000)
+        if arguments.http:
+            server = PlacementHTTPServer(service, ("127.0.0.1", 0))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = "http://%s:%d" % server.server_address[:2]
+            replay(lambda arrival_time, nspr: http_place(url, arrival_time, nspr), requests, arguments.clients)
+            server.shutdown() ; server.server_close()
+        else:
+            replay(lambda arrival_time, nspr: service.place(nspr, arrival_time), copy.deepcopy(requests), arguments.clients)
+        service.close()
+        stats = service.stats()
+        print(f"{max_batch_size:>6} {stats['accepted']:>9} {stats['mean_batch_size']:>11.1f} {stats['p50_ms']:>7.2f}ms {stats['p99_ms']:>7.2f}ms {stats['throughput']:>8.0f} rq/s")
+
+
+if __name__ == "__main__":
+    main()
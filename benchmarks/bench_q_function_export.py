@@ -0,0 +1,84 @@
+"""
+Benchmark of the exported inference path of the Q-function (ExportedQFunction):
+per-call latency of greedy actions for batch sizes 1 and N, eager pfrl model
+against its frozen TorchScript export with and without dynamic int8
+quantization, and agreement of the chosen actions with the eager model on
+observations of the evaluation environment (random placements, conf/base).
+
+Run with ``python benchmarks/bench_q_function_export.py [--agent-directory myagent]``.
+"""
+import time
+import argparse
+import statistics
+import numpy
+import torch
+from kns.pipelines.myclasses.PlacementService import load_q_function
+from kns.pipelines.myclasses.QFunctionExport import ExportedQFunction
+from kns.pipelines.ddqn_4_features.nodes import build_environment, construct_nn
+from kns.pipelines.ddqn_4_features.serve import load_parameters
+
+
+def observations(environment, n_observations, seed=0):
+    # float32 inputs of the Q-function met along random placements (episodes restart when done)
+    numpy_gen = numpy.random.default_rng(seed)
+    n_cnodes = environment.infrastructure_manager.number_of_computing_nodes
+    inputs = []
+    obs = environment.reset()
+    while len(inputs) < n_observations:
+        inputs.append(numpy.concatenate((obs[0], obs[1])).astype(numpy.float32))
+        obs, _, done, _ = environment.step(int(numpy_gen.integers(n_cnodes)))
+        if done:
+            obs = environment.reset()
+    return torch.as_tensor(numpy.stack(inputs))
+
+
+def eager_actions(model):
+    def actions(x):
+        with torch.no_grad():
+            return model(x).q_values.argmax(dim=1)
+    return actions
+
+
+def per_call_seconds(function, x, rounds=7, min_round_seconds=0.05):
+    function(x)
+    iterations = max(1, int(min_round_seconds / max(timed(function, x, 1), 1e-9)))
+    return statistics.median(timed(function, x, iterations) / iterations for _ in range(rounds))
+
+
+def timed(function, x, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(x)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=128, help="N of the batched calls")
+    parser.add_argument("--observations", type=int, default=5000, help="observations on which actions are compared")
+    parser.add_argument("--agent-directory", default=None, help="model.pt to export (default: an untrained Q-function)")
+    parser.add_argument("--threads", type=int, default=1, help="torch CPU threads")
+    arguments = parser.parse_args()
+    torch.set_num_threads(arguments.threads)
+    torch.manual_seed(0)
+    p = load_parameters()
+    environment = build_environment(p["infragen"], p["nsprgen"], p["envs"], is_for_train=False)
+    model = construct_nn(p["nn"], p["n_cnode_features"], p["n_vnf_features"], environment.infrastructure_manager.number_of_computing_nodes).eval()
+    if arguments.agent_directory is not None:
+        model = load_q_function(model, arguments.agent_directory)
+    x = observations(environment, arguments.observations)
+    paths = {"eager": eager_actions(model)}
+    for name, quantize in [("torchscript", False), ("quantized int8", True)]:
+        paths[name] = ExportedQFunction(model, x.shape[1], quantize=quantize, fixed_batch_sizes=(1, arguments.batch_size))
+    reference = paths["eager"](x)
+    print(f"{p['nn']['architecture']} {p['nn']['hidden_sizes']}, {x.shape[1]} inputs, {torch.get_num_threads()} thread(s)")
+    print(f"{'path':<16} {'batch 1':>10} {'batch '+str(arguments.batch_size):>11} {'agreement':>10}")
+    for name, actions in paths.items():
+        batch_1 = per_call_seconds(actions, x[:1])
+        batch_n = per_call_seconds(actions, x[:arguments.batch_size])
+        agreement = (actions(x) == reference).double().mean().item()
+        print(f"{name:<16} {batch_1*1e6:>8.1f}us {batch_n*1e6:>9.1f}us {agreement:>9.2%}")
+
+
+if __name__ == "__main__":
+    main()
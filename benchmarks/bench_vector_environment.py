@@ -0,0 +1,67 @@
+"""
+Benchmark of training environment throughput (environment steps per second)
+when N environments are stepped in lockstep, either in the training process
+(VectorEnvironment) or each in its own worker process sharing observations
+through shared memory (SubprocessVectorEnvironment). Actions are drawn
+uniformly among feasible cnodes so only environment work is measured.
+
+Workers only pay off with several CPU cores: on a single core the subprocess
+pool is expected to be slower (pipe round trips and context switches).
+
+Run with ``python benchmarks/bench_vector_environment.py``.
+"""
+import os
+import time
+import argparse
+import functools
+import yaml
+import numpy
+from kns.pipelines.ddqn_4_features.nodes import build_environment, SEED_STRIDE
+from kns.pipelines.myclasses.InfrastructureGenerator import InfrastructureGenerator
+from kns.pipelines.myclasses.VectorEnvironment import VectorEnvironment, SubprocessVectorEnvironment
+
+
+def load_parameters(backend):
+    with open(os.path.join(os.path.dirname(__file__), "..", "conf", "base", "parameters.yml")) as file:
+        parameters = yaml.safe_load(file)
+    envs = dict(parameters["envs"], action_mask=True, infrastructure_backend=backend)
+    n_cnodes = InfrastructureGenerator(dict(parameters["infragen"], is_for_train=True)).number_of_computing_nodes()
+    return parameters["infragen"], parameters["nsprgen"], envs, n_cnodes
+
+
+def random_feasible_actions(action_masks, numpy_gen):
+    # one uniformly drawn feasible action per environment (any action when none is feasible)
+    masks = action_masks | ~action_masks.any(axis=1, keepdims=True)
+    return (numpy_gen.random(masks.shape) * masks).argmax(axis=1)
+
+
+def steps_per_second(vector_env, steps):
+    numpy_gen = numpy.random.default_rng(0)
+    try:
+        vector_env.reset()
+        start = time.perf_counter()
+        for _ in range(steps):
+            vector_env.step(random_feasible_actions(vector_env.action_masks, numpy_gen))
+        return steps * vector_env.n_envs / (time.perf_counter() - start)
+    finally:
+        vector_env.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-envs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--steps", type=int, default=500, help="lockstep steps per measure")
+    parser.add_argument("--backend", choices=["graph", "array"], default="array")
+    arguments = parser.parse_args()
+    infragen, nsprgen, envs, n_cnodes = load_parameters(arguments.backend)
+    print(f"{os.cpu_count()} CPU(s), {arguments.backend} backend")
+    print(f"{'n_envs':>7} {'in-process':>14} {'workers':>14} {'speedup':>9}")
+    for n_envs in arguments.n_envs:
+        factories = [functools.partial(build_environment, infragen, nsprgen, envs, True, env_index*SEED_STRIDE) for env_index in range(n_envs)]
+        in_process = steps_per_second(VectorEnvironment([factory() for factory in factories]), arguments.steps)
+        workers = steps_per_second(SubprocessVectorEnvironment(factories, 4*n_cnodes+4, n_cnodes, action_mask=True), arguments.steps)
+        print(f"{n_envs:>7} {in_process:>10.0f} st/s {workers:>10.0f} st/s {workers/in_process:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Timing harness of the microbenchmark suite (``benchmarks/test_*.py``).
+
+Every benchmark measures the median time of one call over several rounds and
+compares it, relative to a fixed calibration workload timed in the same
+session, with the baseline stored in ``benchmarks/baselines.json``. It fails
+when it is slower than its baseline by more than the threshold factor, which
+keeps the baselines meaningful from one machine to another.
+
+Run with ``python -m pytest benchmarks --no-cov`` (coverage tracing distorts
+timings), ``--benchmark-threshold 1.5`` sets the tolerated slowdown factor and
+``--benchmark-update`` stores the measured timings as the new baselines.
+"""
+import os
+import sys
+import json
+import time
+import statistics
+import numpy
+import pytest
+
+BASELINES_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--benchmark-threshold", type=float, default=1.5, help="tolerated slowdown factor against the stored baselines")
+    group.addoption("--benchmark-update", action="store_true", default=False, help="store measured timings as the new baselines")
+    group.addoption("--benchmark-rounds", type=int, default=7, help="rounds per benchmark (the median round is kept)")
+
+
+def calibration_workload():
+    # fixed mix of interpreter and small NumPy work, the kind the simulator hot paths do
+    numpy_gen = numpy.random.default_rng(0)
+    values = numpy_gen.uniform(size=(64,4))
+    total = 0.0
+    for i in range(2000):
+        row = values[i % 64]
+        total += sum(row.tolist()) + float(numpy.minimum(row, 0.5).sum())
+    return total
+
+
+class BenchmarkSession:
+    def __init__(self, config) -> None:
+        self.threshold = config.getoption("benchmark_threshold")
+        self.update = config.getoption("benchmark_update")
+        self.rounds = config.getoption("benchmark_rounds")
+        self.baselines = {}
+        if os.path.exists(BASELINES_FILE):
+            with open(BASELINES_FILE) as file:
+                self.baselines = json.load(file)["benchmarks"]
+        self.results = {} # name -> (seconds per call, normalized time)
+        self.calibration_seconds = None
+
+    def calibrate(self):
+        if self.calibration_seconds is None:
+            calibration_workload()
+            self.calibration_seconds = statistics.median(timed(calibration_workload, 1) for _ in range(self.rounds))
+        return self.calibration_seconds
+
+    def measure(self, name, function, setup=None, min_round_seconds=0.02, max_iterations=2000):
+        # median time of one call of function over self.rounds rounds, setup (untimed) is called before every round
+        # the number of calls per round is chosen once so that a round lasts about min_round_seconds
+        if sys.gettrace() is not None:
+            pytest.skip("timings under a tracer (coverage, debugger) are not comparable, run with --no-cov")
+        if setup is not None:
+            setup()
+        iterations = max(1, min(max_iterations, int(min_round_seconds / max(timed(function, 1), 1e-9))))
+        timings = []
+        for _ in range(self.rounds):
+            if setup is not None:
+                setup()
+            timings.append(timed(function, iterations) / iterations)
+        seconds = statistics.median(timings)
+        normalized = seconds / self.calibrate()
+        self.results[name] = (seconds, normalized)
+        if self.update or name not in self.baselines:
+            if not self.update:
+                pytest.skip(f"no baseline for {name}, run with --benchmark-update to store one")
+            return seconds
+        slowdown = normalized / self.baselines[name]["normalized"]
+        assert slowdown <= self.threshold, f"{name} regressed: {slowdown:.2f}x its baseline ({seconds*1e6:.3f} us per call), threshold {self.threshold:.2f}x"
+        return seconds
+
+    def save(self):
+        benchmarks = dict(self.baselines)
+        benchmarks.update({name: {"seconds": seconds, "normalized": normalized} for name, (seconds, normalized) in self.results.items()})
+        with open(BASELINES_FILE, "w") as file:
+            json.dump({"calibration_seconds": self.calibrate(), "benchmarks": dict(sorted(benchmarks.items()))}, file, indent=2)
+            file.write("\n")
+
+
+def timed(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return time.perf_counter() - start
+
+
+def pytest_configure(config):
+    config.benchmark_session = BenchmarkSession(config)
+
+
+def pytest_sessionfinish(session):
+    benchmark_session = session.config.benchmark_session
+    if benchmark_session.update and len(benchmark_session.results) > 0:
+        benchmark_session.save()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    benchmark_session = config.benchmark_session
+    if len(benchmark_session.results) == 0:
+        return
+    terminalreporter.section("benchmarks")
+    terminalreporter.write_line(f"{'benchmark':<60} {'us/call':>12} {'vs baseline':>12}")
+    for name, (seconds, normalized) in benchmark_session.results.items():
+        baseline = benchmark_session.baselines.get(name)
+        ratio = f"{normalized / baseline['normalized']:.2f}x" if baseline is not None else "-"
+        terminalreporter.write_line(f"{name:<60} {seconds*1e6:>12.3f} {ratio:>12}")
+
+
+@pytest.fixture
+def benchmark(request):
+    # benchmark(function, setup=None) measures function under the name of the running test
+    benchmark_session = request.config.benchmark_session
+    def measure(function, setup=None, **kwargs):
+        return benchmark_session.measure(request.node.name, function, setup, **kwargs)
+    return measure
@@ -0,0 +1,136 @@
+"""
+Microbenchmarks of the simulator hot paths that bound training throughput,
+on both infrastructure backends and several fat-tree sizes (16, 54 and 128
+cnodes), and for the NSPR side on several batch sizes and numbers of running
+NSPRs. Everything is seeded and runs offline on CPU.
+
+See ``benchmarks/conftest.py`` for how timings are compared with baselines.
+"""
+import os
+import copy
+import functools
+import itertools
+import yaml
+import numpy
+import pytest
+from kns.pipelines.ddqn_4_features.nodes import build_environment
+from kns.pipelines.myclasses.NSPRGenerator import NSPR, NSPRGenerator
+from kns.pipelines.myclasses.NSPRLifecycleManager import NSPRLifecycleManager
+
+BACKENDS = ["graph", "array"]
+FAT_TREE_SIZES = [4, 6, 8] # k^3/4 cnodes
+BATCH_SIZES = [1, 8, 64]
+RUNNING_NSPRS = [10, 1000]
+
+
+@functools.lru_cache(maxsize=None)
+def load_parameters():
+    with open(os.path.join(os.path.dirname(__file__), "..", "conf", "base", "parameters.yml")) as file:
+        return yaml.safe_load(file)
+
+
+def make_environment(backend, k, batch_size=1):
+    parameters = load_parameters()
+    infragen = dict(parameters["infragen"], infrastructure="fat_tree", topology={"k": k})
+    nsprgen = dict(parameters["nsprgen"], min_batch_nsprs=batch_size, max_batch_nsprs=batch_size)
+    envs = dict(parameters["envs"], action_mask=True, infrastructure_backend=backend)
+    return build_environment(infragen, nsprgen, envs, True)
+
+
+def random_feasible_action(action_mask, numpy_gen):
+    feasible = numpy.flatnonzero(action_mask)
+    return int(numpy_gen.choice(feasible)) if len(feasible) > 0 else 0
+
+
+@pytest.mark.parametrize("k", FAT_TREE_SIZES)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_environment_step(benchmark, backend, k):
+    env = make_environment(backend, k)
+    numpy_gen = numpy.random.default_rng(0)
+    observation = [env.reset()]
+    def step():
+        observation[0], _, done, _ = env.step(random_feasible_action(observation[0][2], numpy_gen))
+        if done:
+            observation[0] = env.reset()
+    benchmark(step)
+
+
+@pytest.mark.parametrize("k", FAT_TREE_SIZES)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_environment_reset(benchmark, backend, k):
+    env = make_environment(backend, k)
+    benchmark(env.reset)
+
+
+@pytest.mark.parametrize("k", FAT_TREE_SIZES)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_describe(benchmark, backend, k):
+    env = make_environment(backend, k)
+    env.reset()
+    benchmark(env.infrastructure_manager.describe)
+
+
+@pytest.mark.parametrize("k", FAT_TREE_SIZES)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_found_a_valid_path_between(benchmark, backend, k):
+    env = make_environment(backend, k)
+    env.reset()
+    infrastructure_manager = env.infrastructure_manager
+    n_cnodes = infrastructure_manager.number_of_computing_nodes
+    pairs = numpy.random.default_rng(0).integers(1, n_cnodes+1, size=(256,2))
+    queries = itertools.cycle(pairs[pairs[:,0] != pairs[:,1]].tolist())
+    def search():
+        cnode_id1, cnode_id2 = next(queries)
+        infrastructure_manager.found_a_valid_path_between("s"+str(cnode_id1), "s"+str(cnode_id2), 5.0, 'hard')
+    benchmark(search)
+
+
+@pytest.mark.parametrize("k", FAT_TREE_SIZES)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_place_vnf_and_deallocate_whole_nspr(benchmark, backend, k):
+    # places every VNF of an NSPR (with the paths between consecutive VNFs) then gives everything back
+    env = make_environment(backend, k)
+    env.reset()
+    infrastructure_manager = env.infrastructure_manager
+    n_cnodes = infrastructure_manager.number_of_computing_nodes
+    nspr = copy.deepcopy(env.ongoing_nspr)
+    vnfs = nspr.describe_vnfs()
+    placements = (numpy.random.default_rng(0).permutation(n_cnodes)[:len(vnfs)] + 1).tolist() # distinct cnodes
+    def place_and_deallocate():
+        for vnf_id, (requirements, cnode_id) in enumerate(zip(vnfs, placements), start=1):
+            nspr.set_placement(vnf_id, cnode_id)
+            nspr.set_satisfied_resources(vnf_id, infrastructure_manager.place_vnf(requirements, cnode_id))
+            if vnf_id > 1:
+                path = infrastructure_manager.found_a_valid_path_between("s"+str(placements[vnf_id-2]), "s"+str(cnode_id), requirements[3], 'hard')
+                nspr.set_matching(vnf_id, path)
+                nspr.set_satisfied_bw(vnf_id, infrastructure_manager.allocate_path(path, requirements[3]))
+        infrastructure_manager.deallocate_whole_nspr(nspr)
+        nspr.unset_placements_and_matchings()
+    benchmark(place_and_deallocate)
+
+
+@pytest.mark.parametrize("batch_size", BATCH_SIZES)
+def test_nspr_generator_generate(benchmark, batch_size):
+    parameters = load_parameters()
+    generator = NSPRGenerator(dict(parameters["nsprgen"], min_batch_nsprs=batch_size, max_batch_nsprs=batch_size, is_for_train=True))
+    benchmark(generator.generate)
+
+
+@pytest.mark.parametrize("running_nsprs", RUNNING_NSPRS)
+def test_lifecycle_advance_clock(benchmark, running_nsprs):
+    # steady state : one NSPR is admitted and one expires at every tick, running_nsprs are running
+    # (advance_clock replaced the tick by tick decrement_running_nsprs_durations)
+    lifecycle_manager = NSPRLifecycleManager()
+    admitted = itertools.cycle([NSPR(id="NSPR"+str(i), priority=1, duration=running_nsprs, nsprtype='hard') for i in range(2*running_nsprs)])
+    def admit(remaining_duration):
+        nspr = next(admitted)
+        nspr.remaining_duration, nspr.status_chain = remaining_duration, ""
+        lifecycle_manager.add_to_running_nsprs(nspr)
+    def setup():
+        lifecycle_manager.reset()
+        for remaining_duration in range(1, running_nsprs+1):
+            admit(remaining_duration)
+    def tick():
+        admit(running_nsprs)
+        lifecycle_manager.advance_clock()
+    benchmark(tick, setup=setup)
@@ -0,0 +1,66 @@
+"""
+Microbenchmarks of the replay buffer work done on every training step once
+updates start (one append, then sampling 128 transitions and updating their
+priorities), for pfrl's PrioritizedReplayBuffer and ArrayPrioritizedReplayBuffer
+filled to several sizes with observations of the 6-cnode infrastructure.
+
+See ``benchmarks/conftest.py`` for how timings are compared with baselines.
+"""
+import functools
+import numpy
+import pytest
+from pfrl.replay_buffer import batch_experiences
+from kns.pipelines.ddqn_4_features.nodes import construct_replay_buffer
+from kns.pipelines.myclasses.DDQN import DDQN, float32_observations
+
+STORAGES = ["pfrl", "array"]
+FILLS = [10000, 100000]
+MINIBATCH_SIZE = 128
+OBSERVATION_SIZE = 6*4+4
+RBUF = {"capacity": 1000000, "alpha": 1.0, "beta0": 0.4, "betasteps": 15, "epsilon": 0.1, "normalize_by_max": 'batch', "num_steps": 1}
+
+
+@functools.lru_cache(maxsize=None)
+def filled_replay_buffer(storage, fill):
+    # episodes of 1000 steps, consecutive transitions share their observation objects as DQN's do
+    numpy.random.seed(0)
+    replay_buffer = construct_replay_buffer(dict(RBUF, storage=storage))
+    observations = numpy.random.uniform(size=(fill+1, OBSERVATION_SIZE))
+    for step in range(fill):
+        replay_buffer.append(state=observations[step], action=step % 6, reward=1.0, next_state=observations[step+1], is_state_terminal=(step % 1000 == 999))
+    return replay_buffer
+
+
+def sample_and_update(replay_buffer):
+    experiences = replay_buffer.sample(MINIBATCH_SIZE)
+    replay_buffer.update_errors(numpy.random.uniform(size=MINIBATCH_SIZE))
+    return experiences
+
+
+@pytest.mark.parametrize("fill", FILLS)
+@pytest.mark.parametrize("storage", STORAGES)
+def test_replay_sample_and_update_errors(benchmark, storage, fill):
+    replay_buffer = filled_replay_buffer(storage, fill)
+    benchmark(functools.partial(sample_and_update, replay_buffer))
+
+
+@pytest.mark.parametrize("fill", FILLS)
+@pytest.mark.parametrize("storage", STORAGES)
+def test_replay_minibatch_to_tensors(benchmark, storage, fill):
+    # sampling plus the stacking into tensors DQN.update does before its forward passes
+    replay_buffer = filled_replay_buffer(storage, fill)
+    agent = DDQN.__new__(DDQN) # only the batching attributes of the agent are used
+    agent.device, agent.gamma, agent.phi = "cpu", 0.99, float32_observations
+    def minibatch():
+        experiences = sample_and_update(replay_buffer)
+        if isinstance(experiences, dict):
+            return agent.batch_arrays(experiences)
+        return batch_experiences(experiences, agent.device, agent.phi, agent.gamma)
+    benchmark(minibatch)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_replay_append(benchmark, storage):
+    replay_buffer = filled_replay_buffer(storage, FILLS[-1])
+    observations = numpy.random.default_rng(0).uniform(size=(2, OBSERVATION_SIZE))
+    benchmark(functools.partial(replay_buffer.append, state=observations[0], action=0, reward=1.0, next_state=observations[1], is_state_terminal=False))
@@ -0,0 +1,5 @@
+"""Kedro datasets of the project."""
+
+from .checkpoint_dataset import CheckpointDataset
+
+__all__ = ["CheckpointDataset"]
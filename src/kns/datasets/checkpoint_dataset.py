@@ -0,0 +1,69 @@
+"""``CheckpointDataset`` saves and loads training checkpoints as directories."""
+
+import os
+import glob
+import pickle
+import shutil
+from pathlib import PurePosixPath
+from typing import Any
+
+import numpy
+import torch
+from kedro.io.core import AbstractVersionedDataset, Version, VersionNotFoundError
+
+
+class CheckpointDataset(AbstractVersionedDataset[dict, dict]):
+    """Local directory holding a training checkpoint, one directory per version.
+
+    A checkpoint is a dict with three entries: ``arrays`` (NumPy arrays, one
+    ``.npy`` file each, memory-mapped on load so that large replay storage is
+    only paged in when read), ``torch`` (state dicts, saved with ``torch.save``)
+    and ``state`` (anything picklable). A version is written in a temporary
+    directory first and renamed once complete, so an interrupted save never
+    shadows the previous version.
+
+    Example catalog entry:
+
+    .. code-block:: yaml
+
+        training_checkpoint:
+          type: kns.datasets.CheckpointDataset
+          filepath: data/06_models/training_checkpoint
+          versioned: true
+    """
+
+    def __init__(self, *, filepath: str, version: Version | None = None, mmap: bool = True, metadata: dict[str, Any] | None = None) -> None:
+        super().__init__(filepath=PurePosixPath(filepath), version=version, exists_function=os.path.exists, glob_function=glob.glob)
+        self._mmap = mmap
+        self.metadata = metadata
+
+    def _save(self, data: dict) -> None:
+        path = str(self._get_save_path())
+        temporary_path = path + ".tmp"
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        os.makedirs(os.path.join(temporary_path, "arrays"))
+        for name, array in data["arrays"].items():
+            numpy.save(os.path.join(temporary_path, "arrays", name + ".npy"), array)
+        torch.save(data["torch"], os.path.join(temporary_path, "torch.pt"))
+        with open(os.path.join(temporary_path, "state.pkl"), "wb") as file:
+            pickle.dump(data["state"], file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.rename(temporary_path, path)
+
+    def _load(self) -> dict:
+        path = str(self._get_load_path())
+        arrays = {}
+        for array_file in sorted(os.listdir(os.path.join(path, "arrays"))):
+            arrays[array_file[:-len(".npy")]] = numpy.load(os.path.join(path, "arrays", array_file), mmap_mode="r" if self._mmap else None)
+        with open(os.path.join(path, "state.pkl"), "rb") as file:
+            state = pickle.load(file)
+        return {"arrays": arrays, "torch": torch.load(os.path.join(path, "torch.pt"), map_location="cpu"), "state": state}
+
+    def _exists(self) -> bool:
+        try:
+            load_path = str(self._get_load_path())
+        except VersionNotFoundError:
+            return False
+        return os.path.isdir(load_path)
+
+    def _describe(self) -> dict[str, Any]:
+        return {"filepath": self._filepath, "version": self._version, "mmap": self._mmap}
@@ -12,5 +12,5 @@ def register_pipelines() -> Dict[str, Pipeline]:
         A mapping from pipeline names to ``Pipeline`` objects.
     """
     pipelines = find_pipelines()
-    pipelines["__default__"] = sum(pipelines.values())
+    pipelines["__default__"] = sum(pipeline for name, pipeline in pipelines.items() if name != "sweep") # sweeps are run on demand
     return pipelines
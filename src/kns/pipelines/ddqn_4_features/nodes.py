@@ -4,28 +4,53 @@ generated using Kedro 0.19.7
 """
 
 import copy
+import logging
+import functools
 import pfrl
 import numpy
 from typing import Any
 from kns.pipelines.myclasses.InfrastructureGenerator import InfrastructureGenerator
 from kns.pipelines.myclasses.InfrastructureManager import InfrastructureManager
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
 from kns.pipelines.myclasses.NSPRGenerator import NSPRGenerator
 from kns.pipelines.myclasses.NSPRLifecycleManager import NSPRLifecycleManager
+from kns.pipelines.myclasses.NSPRSelector import NSPRSelector
 from kns.pipelines.myclasses.Environment import Environment
-from kns.pipelines.myclasses.QFunction import QFunction
+from kns.pipelines.myclasses.VectorEnvironment import VectorEnvironment, SubprocessVectorEnvironment
+from kns.pipelines.myclasses.QFunction import QFunction, SharedEncoderQFunction
 from kns.pipelines.myclasses.lion_pytorch import Lion
-from kns.pipelines.myclasses.DDQN import DDQN
+from kns.pipelines.myclasses.DDQN import DDQN, FeasibleRandomAction, float32_observations
+from kns.pipelines.myclasses.ArrayReplayBuffer import ArrayPrioritizedReplayBuffer
+from kns.pipelines.myclasses.PicklableReplayBuffer import PicklablePrioritizedReplayBuffer
+from kns.pipelines.myclasses.Instrumentation import PhaseTimers, EpisodeProfiler
+from kns.pipelines.myclasses.Checkpointing import TrainingCheckpointer
+from kns.pipelines.myclasses.EvaluationWorker import EvaluationWorker
+from kns.pipelines.myclasses.PlacementService import PlacementService, load_q_function
+from kns.pipelines.myclasses.QFunctionExport import ExportedQFunction
+from kns.pipelines.myclasses.HeuristicPolicies import HeuristicPolicy, run_heuristic_episodes
+
+logger = logging.getLogger(__name__)
 
 def construct_infrastructure_generators(infragen: dict):
     train_infragen = copy.deepcopy(infragen)
     train_infragen["is_for_train"] = True
     eval_infragen = copy.deepcopy(infragen)
     eval_infragen["is_for_train"] = False
-    return InfrastructureGenerator(parameters=train_infragen), InfrastructureGenerator(parameters=eval_infragen)
+    train_infra_gen = InfrastructureGenerator(parameters=train_infragen)
+    # the number of computing nodes (size of the action space) is derived from the topology
+    return train_infra_gen, InfrastructureGenerator(parameters=eval_infragen), train_infra_gen.number_of_computing_nodes()
+
+
+def construct_infrastructure_manager(infra_gen: Any, envs: dict):
+    assert envs["infrastructure_backend"] in ['graph', 'array']
+    if envs["infrastructure_backend"] == 'graph': # networkx attribute dicts (reference implementation)
+        return InfrastructureManager(infrastructure_generator=infra_gen)
+    elif envs["infrastructure_backend"] == 'array': # integer-indexed NumPy arrays
+        return ArrayInfrastructureManager(infrastructure_generator=infra_gen, candidate_paths=envs["candidate_paths"])
 
 
-def construct_infrastructure_managers(train_infra_gen: Any, eval_infra_gen: Any):
-    return InfrastructureManager(infrastructure_generator=train_infra_gen), InfrastructureManager(infrastructure_generator=eval_infra_gen)
+def construct_infrastructure_managers(train_infra_gen: Any, eval_infra_gen: Any, envs: dict):
+    return construct_infrastructure_manager(train_infra_gen, envs), construct_infrastructure_manager(eval_infra_gen, envs)
 
 
 def construct_nspr_generators(nsprgen: dict):
@@ -40,18 +65,79 @@ def construct_nsprs_lifecycle_managers():
     return NSPRLifecycleManager(), NSPRLifecycleManager()
 
 
+def construct_nspr_selector(infra_man, envs: dict):
+    if envs["nspr_selection"] == 'fifo':
+        return None
+    elif envs["nspr_selection"] == 'allocability_flexibility':
+        return NSPRSelector(infrastructure_manager=infra_man)
+
+
+def construct_environment(infra_man, nspr_gen, nsprs_man, envs: dict):
+    return Environment(infrastructure_manager=infra_man, nsprs_generator=nspr_gen, nsprs_lifecycle_manager=nsprs_man, failed_nspr_strategy=envs["failed_nspr_strategy"], keep_information=envs["keep_information"], action_mask=envs["action_mask"], nspr_selector=construct_nspr_selector(infra_man, envs))
+
+
 def construct_environments(train_infra_man, eval_infra_man, train_nspr_gen, eval_nspr_gen, train_nsprs_man, eval_nsprs_man, envs: dict):
-    return Environment(infrastructure_manager=train_infra_man, nsprs_generator=train_nspr_gen, nsprs_lifecycle_manager=train_nsprs_man, failed_nspr_strategy=envs["failed_nspr_strategy"], keep_information=envs["keep_information"]), \
-            Environment(infrastructure_manager=eval_infra_man, nsprs_generator=eval_nspr_gen, nsprs_lifecycle_manager=eval_nsprs_man, failed_nspr_strategy=envs["failed_nspr_strategy"], keep_information=envs["keep_information"])
+    return construct_environment(train_infra_man, train_nspr_gen, train_nsprs_man, envs), construct_environment(eval_infra_man, eval_nspr_gen, eval_nsprs_man, envs)
+
+
+SEED_STRIDE = 1000000 # seed shift between environments of a VectorEnvironment (training seeds grow by one per reset)
+
+
+def build_environment(infragen: dict, nsprgen: dict, envs: dict, is_for_train: bool, seed_offset: int = 0):
+    # builds a whole Environment stack whose generators seeds are shifted by seed_offset
+    seed_key = "train_seed" if is_for_train else "eval_seed"
+    infragen = copy.deepcopy(infragen)
+    infragen["is_for_train"] = is_for_train
+    infragen[seed_key] += seed_offset
+    nsprgen = copy.deepcopy(nsprgen)
+    nsprgen["is_for_train"] = is_for_train
+    nsprgen[seed_key] += seed_offset
+    return construct_environment(construct_infrastructure_manager(InfrastructureGenerator(parameters=infragen), envs), NSPRGenerator(parameters=nsprgen), NSPRLifecycleManager(), envs)
+
+
+def construct_train_vector_environment(train_env, infragen: dict, nsprgen: dict, envs: dict, loop: dict, n_vnf_features: int):
+    # with loop.n_envs > 1, train_env is stepped in lockstep with n_envs-1 other independently seeded training environments
+    # with loop.env_workers, the n_envs environments (train_env's twin included) are rather built and stepped in worker processes
+    if loop["n_envs"] == 1:
+        return train_env
+    if loop["env_workers"]:
+        environment_factories = [functools.partial(build_environment, infragen, nsprgen, envs, True, env_index*SEED_STRIDE) for env_index in range(loop["n_envs"])]
+        cnodes_description_size = len(train_env.infrastructure_manager.describe())
+        return SubprocessVectorEnvironment(environment_factories, cnodes_description_size+n_vnf_features, train_env.infrastructure_manager.number_of_computing_nodes, envs["action_mask"])
+    return VectorEnvironment([train_env] + [build_environment(infragen, nsprgen, envs, True, seed_offset=env_index*SEED_STRIDE) for env_index in range(1, loop["n_envs"])])
 
 
 def construct_nn(nn: dict, n_cnode_features: int, n_vnf_features: int, n_cnodes: int):
-    input_size = (n_cnode_features * n_cnodes) + n_vnf_features
-    return QFunction(input_size=input_size, hidden_sizes=nn["hidden_sizes"], n_actions=n_cnodes, nonlinearity=nn["activation_func"])
+    if nn["architecture"] == 'mlp':
+        input_size = (n_cnode_features * n_cnodes) + n_vnf_features
+        return QFunction(input_size=input_size, hidden_sizes=nn["hidden_sizes"], n_actions=n_cnodes, nonlinearity=nn["activation_func"])
+    elif nn["architecture"] == 'shared_encoder':
+        return SharedEncoderQFunction(n_cnode_features=n_cnode_features, n_vnf_features=n_vnf_features, hidden_sizes=nn["hidden_sizes"], nonlinearity=nn["activation_func"])
+
+
+def construct_placement_service(infragen: dict, nsprgen: dict, envs: dict, nn: dict, n_cnode_features: int, n_vnf_features: int, service: dict):
+    # serves the Q-function saved in service.agent_directory on a fresh evaluation infrastructure (its NSPR generator is unused)
+    environment = build_environment(infragen, nsprgen, envs, is_for_train=False)
+    model = load_q_function(construct_nn(nn, n_cnode_features, n_vnf_features, environment.infrastructure_manager.number_of_computing_nodes), service["agent_directory"])
+    if service["export"] != 'eager':
+        assert service["export"] in ['torchscript', 'quantized']
+        model = ExportedQFunction(model, len(environment.infrastructure_manager.describe()) + n_vnf_features, quantize=(service["export"] == 'quantized'),
+                                  fixed_batch_sizes=(1, service["max_batch_size"])) # single requests and full micro-batches
+    return PlacementService(model, environment, max_batch_size=service["max_batch_size"], max_wait=service["max_wait_ms"] / 1000, action_mask=service["action_mask"])
 
 
 def construct_replay_buffer(rbuf: dict):
-    return pfrl.replay_buffers.PrioritizedReplayBuffer(
+    # rbuf.storage is optional : the pfrl buffer stays the default, the array one is opt-in
+    if rbuf.get("storage", 'pfrl') == 'array':
+        return ArrayPrioritizedReplayBuffer(
+            capacity=rbuf['capacity'],
+            alpha=rbuf['alpha'],
+            beta0=rbuf['beta0'],
+            betasteps=rbuf['betasteps'],
+            eps=rbuf['epsilon'],
+            normalize_by_max=rbuf["normalize_by_max"],
+            num_steps=rbuf['num_steps'] )
+    return PicklablePrioritizedReplayBuffer(
             capacity=rbuf['capacity'],
             alpha=rbuf['alpha'],
             beta0=rbuf['beta0'],
@@ -66,7 +152,7 @@ def construct_explorer(explor: dict, n_cnodes: int):
             start_epsilon=explor['start_epsilon'],
             end_epsilon=explor['end_epsilon'],
             decay_steps=explor['decay_steps'],
-            random_action_func=lambda : numpy.random.randint(low=0, high=n_cnodes) )
+            random_action_func=FeasibleRandomAction(n_actions=n_cnodes) )
 
 
 def construct_optimizer_and_ddqn_agent(model, opt: dict, replay_buffer, explorer, ddqn: dict):
@@ -77,17 +163,88 @@ def construct_optimizer_and_ddqn_agent(model, opt: dict, replay_buffer, explorer
             # optimizer=Lion(params=model.parameters(), lr=1e-4),
             replay_buffer=replay_buffer,
             explorer=explorer,
-            phi=lambda x: x.astype(numpy.float32, copy=False),
+            phi=float32_observations,
             **ddqn )
 
 
-def agent_and_envs_interaction(ddqn_agent, train_env, eval_env, loop: dict):
-    performance_records = []
-    actions_records = []
+def construct_phase_timers(ddqn_agent, train_env, checkpointer, instrumentation: dict):
+    # wraps the hot paths of the training loop with timers ; returns None, wrapping nothing, when instrumentation is disabled
+    if not instrumentation["enabled"]:
+        return None
+    timers = PhaseTimers()
+    if isinstance(train_env, Environment):
+        train_env.instrument(timers)
+        timers.instrument(ddqn_agent, "act", "agent.act")
+        timers.instrument(ddqn_agent, "observe", "agent.observe")
+    else:
+        if isinstance(train_env, VectorEnvironment): # environments of a SubprocessVectorEnvironment live in worker processes
+            for environment in train_env.environments:
+                environment.instrument(timers)
+        timers.instrument(train_env, "step", "vector_env.step")
+        timers.instrument(train_env, "reset", "vector_env.reset")
+        timers.instrument(ddqn_agent, "batch_act", "agent.act")
+        timers.instrument(ddqn_agent, "batch_observe", "agent.observe")
+    timers.instrument(ddqn_agent.replay_updater, "update_func", "agent.update") # gradient updates, called from observe
+    timers.instrument(ddqn_agent.replay_buffer, "sample", "agent.replay_sample")
+    timers.instrument(ddqn_agent, "save", "agent.save_best")
+    if checkpointer is not None:
+        timers.instrument(checkpointer, "save", "checkpoint.save") # state capture only, files are written in the background
+    return timers
+
+
+def construct_episode_profiler(instrumentation: dict):
+    if instrumentation["profiler"] is None:
+        return None
+    first_episode, last_episode = instrumentation["profile_episodes"]
+    return EpisodeProfiler(instrumentation["profiler"], first_episode, last_episode, instrumentation["profile_file"])
+
+
+def construct_checkpointer(checkpoint: dict):
+    if checkpoint["interval"] == 0 and not checkpoint["resume"]:
+        return None
+    return TrainingCheckpointer(filepath=checkpoint["filepath"], interval=checkpoint["interval"], background=checkpoint["background"])
+
+
+def resume_training(checkpointer, ddqn_agent, train_env, checkpoint: dict):
+    # returns the last episode done and the records (performance_records, actions_records, best_performance) to start from
+    if checkpointer is not None and checkpoint["resume"]:
+        resumed = checkpointer.resume(ddqn_agent, train_env)
+        if resumed is not None:
+            episode, records = resumed
+            return episode, records["performance_records"], records["actions_records"], records["best_performance"]
+    return 0, [], [], 0
+
+
+def construct_evaluation(ddqn_agent, eval_env, loop: dict, timers):
+    # returns the evaluation function (same signature as evaluation) and the evaluation worker running it (None for in-line evaluations)
+    evaluation_worker = EvaluationWorker(ddqn_agent, eval_env, loop) if loop["eval_worker"] else None
+    evaluate = evaluation if evaluation_worker is None else evaluation_worker.evaluate
+    return (evaluate if timers is None else timers.timed("evaluation", evaluate)), evaluation_worker
+
+
+def log_training_progress(episode: int, performance_records: list, actions_records: list):
+    logger.info("Training episode: %d, P: %s, A: %s", episode, performance_records[-10:], actions_records[-20:])
+
+
+def log_timing_report(timers, episode: int, env_steps: int):
+    report = timers.report(episode, env_steps, timers.calls["agent.update"])
+    logger.info("Training timings at %s", PhaseTimers.summary(report))
+
+
+def agent_and_envs_interaction(ddqn_agent, train_env, eval_env, loop: dict, instrumentation: dict, checkpoint: dict):
+    # returns the performance records and the timing reports (empty when instrumentation is disabled)
+    # with checkpoint.resume, training resumes after the episode of the latest checkpoint (performance records included)
+    if isinstance(train_env, (VectorEnvironment, SubprocessVectorEnvironment)):
+        return batch_agent_and_envs_interaction(ddqn_agent, train_env, eval_env, loop, instrumentation, checkpoint)
+    checkpointer = construct_checkpointer(checkpoint)
+    timers = construct_phase_timers(ddqn_agent, train_env, checkpointer, instrumentation)
+    profiler = construct_episode_profiler(instrumentation)
     #=======================
-    best_performance = 0 # number of placed NSPRs
-    for episode in range(1, loop["max_episodes"]+1): # training episodes loop
-        if episode % 100 == 0: print("Training episode:",episode) ; print("P: ", performance_records[-10:]) ; print("A: ", actions_records[-20:])
+    last_episode, performance_records, actions_records, best_performance = resume_training(checkpointer, ddqn_agent, train_env, checkpoint) # best_performance : number of placed NSPRs
+    timed_evaluation, evaluation_worker = construct_evaluation(ddqn_agent, eval_env, loop, timers)
+    for episode in range(last_episode+1, loop["max_episodes"]+1): # training episodes loop
+        if episode % 100 == 0: log_training_progress(episode, performance_records, actions_records)
+        if profiler is not None: profiler.episode_started(episode)
         obs = train_env.reset()
         iteration = loop["max_iterations"]
         while iteration is None or iteration > 0: # iterations loop
@@ -100,27 +257,107 @@ def agent_and_envs_interaction(ddqn_agent, train_env, eval_env, loop: dict):
             if done: break
             #-----------------------------------------------------------------------------------
         if episode % loop["eval_episodes_interval"] == 0: # start an evaluation if condition met
-            performance = 0
-            with ddqn_agent.eval_mode():
-                e_obs = eval_env.reset()
-                e_iteration = loop["eval_max_iterations"]
-                while e_iteration is None or e_iteration > 0:
-                    e_action = ddqn_agent.act(e_obs)
-                    actions_records.append(e_action)
-                    e_obs,e_reward,e_done,e_info = eval_env.step(e_action)
-                    e_reset = e_done or (e_iteration is not None and e_iteration==1)
-                    ddqn_agent.observe(e_obs, e_reward, e_done, e_reset)
-                    if e_iteration is not None:
-                        e_iteration -= 1
-                    if e_done:
-                        performance = eval_env.nsprs_lifecycle_manager.running_and_successfully_terminated_nsprs()
-                        performance_records.append( performance )
-                        break
-                    #-----------------------------
-                if performance > best_performance:
-                    best_performance = performance
-                    ddqn_agent.save( "myagent" )
-    return performance_records
+            best_performance = timed_evaluation(ddqn_agent, eval_env, loop, performance_records, actions_records, best_performance)
+        if checkpointer is not None and checkpointer.should_save(episode):
+            if evaluation_worker is not None: best_performance = evaluation_worker.collect(performance_records, actions_records, best_performance, block=True)
+            checkpointer.save(episode, ddqn_agent, train_env, {"performance_records": performance_records, "actions_records": actions_records, "best_performance": best_performance})
+        if profiler is not None: profiler.episode_finished(episode)
+        if timers is not None and (episode % instrumentation["report_interval"] == 0 or episode == loop["max_episodes"]):
+            log_timing_report(timers, episode, timers.calls["env.step"])
+    if profiler is not None: profiler.stop()
+    if checkpointer is not None: checkpointer.wait()
+    if evaluation_worker is not None: evaluation_worker.close(performance_records, actions_records, best_performance)
+    return performance_records, ([] if timers is None else timers.reports)
+
+
+def batch_agent_and_envs_interaction(ddqn_agent, train_vector_env, eval_env, loop: dict, instrumentation: dict, checkpoint: dict):
+    # same as agent_and_envs_interaction but training steps all environments of train_vector_env at once through batch_act/batch_observe
+    # max_episodes counts episodes finished by any of the environments ; on resume, episodes that were in progress in the other environments restart
+    checkpointer = construct_checkpointer(checkpoint)
+    timers = construct_phase_timers(ddqn_agent, train_vector_env, checkpointer, instrumentation)
+    profiler = construct_episode_profiler(instrumentation)
+    #=======================
+    episode, performance_records, actions_records, best_performance = resume_training(checkpointer, ddqn_agent, train_vector_env, checkpoint) # best_performance : number of placed NSPRs
+    timed_evaluation, evaluation_worker = construct_evaluation(ddqn_agent, eval_env, loop, timers)
+    if profiler is not None: profiler.episode_started(episode+1)
+    obs = train_vector_env.reset()
+    iterations = numpy.zeros(train_vector_env.n_envs, dtype=int) # iterations of the ongoing episode of each environment
+    while episode < loop["max_episodes"]:
+        actions = ddqn_agent.batch_act(obs, train_vector_env.action_masks)
+        obs,rewards,dones,infos = train_vector_env.step(actions) # environments whose episode is done are already reset
+        iterations += 1
+        resets = dones | (loop["max_iterations"] is not None and iterations >= loop["max_iterations"])
+        ddqn_agent.batch_observe(obs, rewards, dones, resets)
+        if resets.any():
+            truncated = numpy.flatnonzero(resets & ~dones)
+            if len(truncated) > 0:
+                obs = train_vector_env.reset(truncated)
+            iterations[resets] = 0
+            for _ in range(int(resets.sum())):
+                episode += 1
+                if episode % 100 == 0: log_training_progress(episode, performance_records, actions_records)
+                if episode % loop["eval_episodes_interval"] == 0: # start an evaluation if condition met
+                    best_performance = timed_evaluation(ddqn_agent, eval_env, loop, performance_records, actions_records, best_performance)
+                if checkpointer is not None and checkpointer.should_save(episode):
+                    if evaluation_worker is not None: best_performance = evaluation_worker.collect(performance_records, actions_records, best_performance, block=True)
+                    checkpointer.save(episode, ddqn_agent, train_vector_env, {"performance_records": performance_records, "actions_records": actions_records, "best_performance": best_performance})
+                if profiler is not None: profiler.episode_finished(episode) ; profiler.episode_started(episode+1)
+                if timers is not None and (episode % instrumentation["report_interval"] == 0 or episode == loop["max_episodes"]):
+                    log_timing_report(timers, episode, timers.calls["vector_env.step"] * train_vector_env.n_envs)
+    if profiler is not None: profiler.stop()
+    if checkpointer is not None: checkpointer.wait()
+    if evaluation_worker is not None: evaluation_worker.close(performance_records, actions_records, best_performance)
+    train_vector_env.close() # stops worker processes if any
+    return performance_records, ([] if timers is None else timers.reports)
+
+
+def evaluation(ddqn_agent, eval_env, loop: dict, performance_records: list, actions_records: list, best_performance: int):
+    # runs an evaluation episode, records its performance and saves the agent if it's the best so far ; returns the best performance
+    performance = 0
+    with ddqn_agent.eval_mode():
+        e_obs = eval_env.reset()
+        e_iteration = loop["eval_max_iterations"]
+        while e_iteration is None or e_iteration > 0:
+            e_action = ddqn_agent.act(e_obs)
+            actions_records.append(e_action)
+            e_obs,e_reward,e_done,e_info = eval_env.step(e_action)
+            e_reset = e_done or (e_iteration is not None and e_iteration==1)
+            ddqn_agent.observe(e_obs, e_reward, e_done, e_reset)
+            if e_iteration is not None:
+                e_iteration -= 1
+            if e_done:
+                performance = eval_env.nsprs_lifecycle_manager.running_and_successfully_terminated_nsprs()
+                performance_records.append( performance )
+                break
+            #-----------------------------
+        if performance > best_performance:
+            best_performance = performance
+            ddqn_agent.save( "myagent" )
+    return best_performance
+
+
+def compare_with_heuristic_baselines(performance_records: list, infragen: dict, nsprgen: dict, envs: dict, n_vnf_features: int, baselines: dict):
+    # performances (running and successfully terminated NSPRs) of each heuristic on baselines.n_episodes evaluation episodes, next to the DDQN's
+    # episode i runs on evaluation environments whose seeds are shifted by i*SEED_STRIDE : episode 0 is the one DDQN evaluations run on
+    # the episodes run at once in a VectorEnvironment (in worker processes with baselines.env_workers)
+    # environments provide action masks whatever envs.action_mask : heuristics then only choose cnodes that self.place accepts
+    envs = dict(envs, action_mask=True)
+    environment_factories = [functools.partial(build_environment, infragen, nsprgen, envs, False, episode*SEED_STRIDE) for episode in range(baselines["n_episodes"])]
+    if baselines["env_workers"]:
+        n_cnodes = InfrastructureGenerator(parameters=dict(infragen, is_for_train=False)).number_of_computing_nodes() # no environment built in this process
+        vector_env = SubprocessVectorEnvironment(environment_factories, 4*n_cnodes+n_vnf_features, n_cnodes, envs["action_mask"])
+    else:
+        vector_env = VectorEnvironment([environment_factory() for environment_factory in environment_factories])
+    comparison = {"ddqn": {"evaluations": len(performance_records), "best": max(performance_records, default=None),
+                           "last": performance_records[-1] if len(performance_records) > 0 else None}}
+    for heuristic in baselines["heuristics"]:
+        performances = [env_performances[0] for env_performances in run_heuristic_episodes(HeuristicPolicy(heuristic, n_vnf_features=n_vnf_features), vector_env)]
+        comparison[heuristic] = {"evaluation_episode": performances[0], "mean": float(numpy.mean(performances)), "min": min(performances), "max": max(performances), "episodes": performances}
+    vector_env.close()
+    logger.info("Placed NSPRs on the evaluation episode: %s", ", ".join(
+        [f"ddqn best {comparison['ddqn']['best']} (last {comparison['ddqn']['last']})"] +
+        [f"{heuristic} {comparison[heuristic]['evaluation_episode']} (mean {comparison[heuristic]['mean']:.1f} over {baselines['n_episodes']} episodes)" for heuristic in baselines["heuristics"]]))
+    return comparison
 
 
 def plotting_performance_results(performance_records: list):
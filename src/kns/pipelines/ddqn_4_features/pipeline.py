@@ -6,20 +6,20 @@ generated using Kedro 0.19.7
 from kedro.pipeline import Pipeline, pipeline, node
 from .nodes import construct_infrastructure_generators, construct_infrastructure_managers, \
 construct_nspr_generators, construct_nsprs_lifecycle_managers, construct_environments, construct_nn, \
-construct_replay_buffer, construct_explorer, construct_optimizer_and_ddqn_agent, \
-agent_and_envs_interaction, plotting_performance_results
+construct_train_vector_environment, construct_replay_buffer, construct_explorer, construct_optimizer_and_ddqn_agent, \
+agent_and_envs_interaction, compare_with_heuristic_baselines, plotting_performance_results
 
 def create_pipeline(**kwargs) -> Pipeline:
     return pipeline([
         node(
             func=construct_infrastructure_generators,
             inputs="params:infragen",
-            outputs=["train_infra_gen", "eval_infra_gen"],
+            outputs=["train_infra_gen", "eval_infra_gen", "n_cnodes"],
             name="infras_gen_node"
         ),
         node(
             func=construct_infrastructure_managers,
-            inputs=["train_infra_gen", "eval_infra_gen"],
+            inputs=["train_infra_gen", "eval_infra_gen", "params:envs"],
             outputs=["train_infra_man", "eval_infra_man"],
             name="infras_man_node"
         ),
@@ -41,9 +41,15 @@ def create_pipeline(**kwargs) -> Pipeline:
             outputs=["train_env", "eval_env"],
             name="envs_node"
         ),
+        node(
+            func=construct_train_vector_environment,
+            inputs=["train_env", "params:infragen", "params:nsprgen", "params:envs", "params:loop", "params:n_vnf_features"],
+            outputs="train_vector_env",
+            name="vector_env_node"
+        ),
         node(
             func=construct_nn,
-            inputs=["params:nn", "params:n_cnode_features", "params:n_vnf_features", "params:infragen.n_cnodes"],
+            inputs=["params:nn", "params:n_cnode_features", "params:n_vnf_features", "n_cnodes"],
             outputs="model",
             name="nn_node"
         ),
@@ -55,7 +61,7 @@ def create_pipeline(**kwargs) -> Pipeline:
         ),
         node(
             func=construct_explorer,
-            inputs=["params:explor", "params:infragen.n_cnodes"],
+            inputs=["params:explor", "n_cnodes"],
             outputs="explorer",
             name="explorer_node"
         ),
@@ -67,10 +73,16 @@ def create_pipeline(**kwargs) -> Pipeline:
         ),
         node(
             func=agent_and_envs_interaction,
-            inputs=["ddqn_agent", "train_env", "eval_env", "params:loop"],
-            outputs="performance_records",
+            inputs=["ddqn_agent", "train_vector_env", "eval_env", "params:loop", "params:instrumentation", "params:checkpoint"],
+            outputs=["performance_records", "timing_reports"],
             name="interaction_node"
         ),
+        node(
+            func=compare_with_heuristic_baselines,
+            inputs=["performance_records", "params:infragen", "params:nsprgen", "params:envs", "params:n_vnf_features", "params:baselines"],
+            outputs="baseline_comparison",
+            name="baselines_node"
+        ),
         node(
             func=plotting_performance_results,
             inputs="performance_records",
@@ -0,0 +1,48 @@
+"""
+Serves the agent trained by this pipeline over HTTP (see ``params:service``
+and ``PlacementRequestHandler``):
+
+    python -m kns.pipelines.ddqn_4_features.serve [--env local] [--port 8000]
+
+then e.g. ``curl -d '{"vnfs": [[5, 5, 5, 0], [5, 5, 5, 4]], "duration": 100,
+"arrival_time": 0}' localhost:8000/place`` and ``curl localhost:8000/stats``.
+Requests carry their arrival time (in ticks of the simulation clock): it is
+what makes the accepted NSPRs expire and give their resources back.
+"""
+import argparse
+import logging
+from kedro.config import OmegaConfigLoader
+from kns.pipelines.myclasses.PlacementService import PlacementHTTPServer
+from .nodes import construct_placement_service
+
+logger = logging.getLogger(__name__)
+
+
+def load_parameters(conf_source="conf", env="local"):
+    return OmegaConfigLoader(conf_source=conf_source, base_env="base", default_run_env=env)["parameters"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--conf", default="conf", help="Kedro configuration directory")
+    parser.add_argument("--env", default="local", help="configuration environment overriding base")
+    parser.add_argument("--host", default=None, help="defaults to service.host")
+    parser.add_argument("--port", type=int, default=None, help="defaults to service.port")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    p = load_parameters(args.conf, args.env)
+    service = construct_placement_service(p["infragen"], p["nsprgen"], p["envs"], p["nn"], p["n_cnode_features"], p["n_vnf_features"], p["service"])
+    server = PlacementHTTPServer(service, (args.host or p["service"]["host"], args.port or p["service"]["port"]))
+    logger.info("Serving placements on http://%s:%d (POST /place, GET /stats)", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        logger.info("Placement service stats: %s", service.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import numpy
+
+
+def masked_greedy_actions(batch_q, batch_action_masks):
+    # argmax of every row of batch_q among the actions allowed by its mask (None : all actions)
+    # NumPy only : shared by the DDQN agent and the policies that must run without torch (e.g. heuristic baselines)
+    n_actions = batch_q.shape[1]
+    batch_masks = numpy.array([numpy.ones(n_actions, dtype=bool) if action_mask is None else action_mask for action_mask in batch_action_masks])
+    batch_masks[~batch_masks.any(axis=1)] = True # nothing is feasible : fall back to the unmasked greedy action
+    return numpy.where(batch_masks, batch_q, -numpy.inf).argmax(axis=1)
@@ -0,0 +1,162 @@
+import numpy
+from kns.pipelines.myclasses.InfrastructureManager import InfrastructureManager
+from kns.pipelines.myclasses.PathSearchEngine import PathSearchEngine
+from kns.pipelines.myclasses.CandidatePathIndex import CandidatePathIndex
+
+class ArrayInfrastructureManager(InfrastructureManager):
+    # same interface and results as InfrastructureManager, but the mutable state lives in contiguous NumPy arrays indexed by integers:
+    # node_resources[cnode_id-1] holds CPU,RAM,STORAGE of cnode cnode_id and edge_bandwidths[edge_id] holds the bandwidth of link edge_id
+    # networkx is only touched when a freshly generated infrastructure is loaded (__init__ and reset)
+    def __init__(self, infrastructure_generator, candidate_paths=0, dtype=numpy.float64) -> None:
+        # candidate_paths is the number k of shortest-hop paths indexed per pair of cnodes, on demand (0 disables the index, every query is then a BFS)
+        # dtype=numpy.float64 keeps bookkeeping bit-identical to the graph backend (float32 halves memory but rounds every allocation)
+        self.infrastructure_generator = infrastructure_generator
+        self.candidate_paths = candidate_paths ; assert candidate_paths >= 0
+        self.dtype = dtype
+        self.load_infrastructure(self.infrastructure_generator.generate())
+
+    def load_infrastructure(self, infrastructure):
+        # translate a NetworkX-like infrastructure into integer-indexed arrays
+        # computing nodes "s1".."sN" take indexes 0..N-1, switches and routers follow in graph order
+        self.infrastructure = infrastructure
+        cnode_names = sorted([cnode for cnode, cpu in infrastructure.nodes.data("cpu") if cpu is not None], key=lambda name: int(name[1:]))
+        assert cnode_names == ["s"+str(i) for i in range(1, len(cnode_names)+1)]
+        self.number_of_computing_nodes = len(cnode_names)
+        self.node_names = cnode_names + [node for node in infrastructure.nodes if infrastructure.nodes[node].get("cpu") is None]
+        self.node_index = {name: index for index, name in enumerate(self.node_names)}
+        #---resources---
+        self.node_resources = numpy.array([[infrastructure.nodes[cnode]["cpu"], infrastructure.nodes[cnode]["ram"], infrastructure.nodes[cnode]["stor"]] for cnode in cnode_names], dtype=self.dtype).reshape(-1, 3)
+        #---links---
+        self.edge_index = {} # (node_index1,node_index2) -> edge_id, registered in both directions
+        bandwidths = []
+        for node1, node2, bandwidth in infrastructure.edges.data("bw"):
+            self.edge_index[(self.node_index[node1], self.node_index[node2])] = len(bandwidths)
+            self.edge_index[(self.node_index[node2], self.node_index[node1])] = len(bandwidths)
+            bandwidths.append(bandwidth)
+        self.edge_bandwidths = numpy.array(bandwidths, dtype=self.dtype)
+        # CSR adjacency (neighbors of node i are neighbors[indptr[i]:indptr[i+1]]) kept in networkx neighbor order so that path search tie-breaking matches the graph backend
+        degrees = [infrastructure.degree(name) for name in self.node_names]
+        self.indptr = numpy.concatenate(([0], numpy.cumsum(degrees))).astype(numpy.int64)
+        self.neighbors = numpy.array([self.node_index[neighbor] for name in self.node_names for neighbor in infrastructure.neighbors(name)], dtype=numpy.int64)
+        self.neighbor_edges = numpy.array([self.edge_index[(index, neighbor)] for index in range(len(self.node_names)) for neighbor in self.neighbors[self.indptr[index]:self.indptr[index+1]].tolist()], dtype=numpy.int64)
+        self.path_search_engine = PathSearchEngine(self.indptr, self.neighbors, self.neighbor_edges)
+        self.candidate_path_index = None
+        if self.candidate_paths > 0:
+            self.candidate_path_index = CandidatePathIndex.for_topology(self.indptr, self.neighbors, self.neighbor_edges, self.number_of_computing_nodes, self.candidate_paths)
+        # links incident to each computing node (flattened) used to aggregate cnodes bandwidth in one pass
+        self.cnode_edges_flat = self.neighbor_edges[:self.indptr[self.number_of_computing_nodes]]
+        self.cnode_edges_owner = numpy.repeat(numpy.arange(self.number_of_computing_nodes), degrees[:self.number_of_computing_nodes])
+        self.build_observation()
+        #---initial state, restored by reset when the same infrastructure is handed out again---
+        self.initial_state = [array.copy() for array in self.mutable_state()]
+
+    def mutable_state(self):
+        return self.node_resources, self.edge_bandwidths, self.cnodes_bandwidth, self.observation
+
+    def build_observation(self):
+        self.cnodes_bandwidth = self.cnodes_bandwidths()
+        self.observation = numpy.column_stack((self.node_resources, self.cnodes_bandwidth)).astype(numpy.float32).ravel()
+        self.cnodes_observation = self.observation.reshape(-1,4)
+
+    def refresh_cnode_resources(self, cnode_id):
+        self.cnodes_observation[cnode_id-1,:3] = self.node_resources[cnode_id-1]
+
+    def refresh_cnode_bandwidth(self, cnode_id):
+        # summed in the graph backend order so that the aggregate is the same float
+        self.cnodes_bandwidth[cnode_id-1] = sum(self.edge_bandwidths[self.neighbor_edges[self.indptr[cnode_id-1]:self.indptr[cnode_id]]].tolist())
+        self.cnodes_observation[cnode_id-1,3] = self.cnodes_bandwidth[cnode_id-1]
+
+    def refresh_path_bandwidths(self, path):
+        for node_name in path:
+            if self.node_index[node_name] < self.number_of_computing_nodes:
+                self.refresh_cnode_bandwidth(self.node_index[node_name]+1)
+
+    def cnodes_bandwidths(self):
+        # bandwidth available around every computing node (sum of incident links, summed in the same order as the graph backend)
+        return numpy.bincount(self.cnode_edges_owner, weights=self.edge_bandwidths[self.cnode_edges_flat], minlength=self.number_of_computing_nodes)
+
+    def path_edges(self, path):
+        # list of edge ids along a path given as a list of node names
+        return numpy.array([self.edge_index[(self.node_index[path[i]], self.node_index[path[i+1]])] for i in range(len(path)-1)], dtype=numpy.int64)
+
+    def get_resources(self, cnode_id):
+        # returns CPU,RAM,STORAGE,BANDWIDTH of cnode cnode_id
+        cpu, ram, stor = self.node_resources[cnode_id-1].tolist()
+        return [cpu, ram, stor, self.cnodes_bandwidth[cnode_id-1].item()]
+
+    def is_vnf_placeable(self, vnf_requirements, cnode_id, nsprtype):
+        # verify all resources on cnode_id are higher or equal to vnf resource requirements
+        cpu, ram, stor = self.node_resources[cnode_id-1].tolist()
+        if nsprtype == 'hard':
+            return cpu >= vnf_requirements[0] and ram >= vnf_requirements[1] and stor >= vnf_requirements[2]
+        elif nsprtype == 'soft':
+            return cpu > 0 and ram > 0 and stor > 0
+
+    def feasible_cnodes(self, vnf_requirements, nsprtype):
+        # boolean array whose entry cnode_id-1 tells whether is_vnf_placeable(vnf_requirements, cnode_id, nsprtype) holds
+        if nsprtype == 'hard':
+            return numpy.all(self.node_resources >= numpy.asarray(vnf_requirements[:3]), axis=1)
+        elif nsprtype == 'soft':
+            return numpy.all(self.node_resources > 0, axis=1)
+
+    def reachable_cnodes(self, cnode_name, bandwidth, nsprtype):
+        # boolean array whose entry cnode_id-1 tells whether found_a_valid_path_between(cnode_name, "s"+str(cnode_id), bandwidth, nsprtype) would find a path
+        usable_edges = PathSearchEngine.usable_edges(self.edge_bandwidths, bandwidth, nsprtype)
+        return self.path_search_engine.reachable(self.node_index[cnode_name], usable_edges)[:self.number_of_computing_nodes]
+
+    def place_vnf(self, vnf_requirements, cnode_id):
+        # simulate a VNF placement on cnode_id by allocating resources and returns allocated resources
+        allocated = numpy.minimum(self.node_resources[cnode_id-1], vnf_requirements[:3])
+        self.node_resources[cnode_id-1] -= allocated
+        self.refresh_cnode_resources(cnode_id)
+        return allocated.tolist()
+
+    def remove_vnf(self, vnf_requirements, cnode_name):
+        self.node_resources[self.node_index[cnode_name]] += vnf_requirements[:3]
+        self.refresh_cnode_resources(self.node_index[cnode_name]+1)
+
+    def minimum_bandwidth_of_path(self, path):
+        return self.edge_bandwidths[self.path_edges(path)].min().item()
+
+    def found_a_valid_path_between(self, cnode_id1, cnode_id2, bandwidth, nsprtype):
+        # return a list of the nodes in the first shortest-hop path whose links can carry bandwidth if path found, otherwise return None
+        # indexed candidates are checked first, the BFS only runs when none of them is usable and they don't cover every path
+        if self.candidate_path_index is not None:
+            path, conclusive = self.candidate_path_index.first_usable_path(self.node_index[cnode_id1], self.node_index[cnode_id2], self.edge_bandwidths, bandwidth, nsprtype)
+            if conclusive:
+                return None if path is None else [self.node_names[index] for index in path]
+        usable_edges = PathSearchEngine.usable_edges(self.edge_bandwidths, bandwidth, nsprtype)
+        path = self.path_search_engine.find_path(self.node_index[cnode_id1], self.node_index[cnode_id2], usable_edges)
+        if path is None:
+            return None
+        return [self.node_names[index] for index in path]
+
+    def allocate_path(self, found_path, bandwidth):
+        edges = self.path_edges(found_path)
+        bandwidth_allocated = min(bandwidth, self.edge_bandwidths[edges].min().item())
+        self.edge_bandwidths[edges] -= bandwidth_allocated
+        self.refresh_path_bandwidths(found_path)
+        return bandwidth_allocated # satisfied bandwidth
+
+    def deallocate_path(self, found_path, bandwidth):
+        self.edge_bandwidths[self.path_edges(found_path)] += bandwidth
+        self.refresh_path_bandwidths(found_path)
+
+    def deallocate_whole_nspr(self, nspr):
+        # same as InfrastructureManager.deallocate_whole_nspr but resources of all placed VNFs are given back at once from the NSPR arrays
+        n_placed = nspr.number_of_placed_vnfs()
+        numpy.add.at(self.node_resources, nspr.placements[:n_placed]-1, nspr.satisfied_resources[:n_placed])
+        for cnode_id in numpy.unique(nspr.placements[:n_placed]).tolist():
+            self.refresh_cnode_resources(cnode_id)
+        for vnf_id in range(2, n_placed+1):
+            if nspr.get_matching(vnf_id) is not None:
+                self.deallocate_path(nspr.get_matching(vnf_id), nspr.get_satisfied_bw(vnf_id))
+
+    def reset(self):
+        self.infrastructure_generator.reset()
+        infrastructure = self.infrastructure_generator.generate(restore=False) # the graph is only read, at load
+        if infrastructure is self.infrastructure: # same topology (e.g. evaluation): one array copy per state array
+            for array, initial_array in zip(self.mutable_state(), self.initial_state):
+                numpy.copyto(array, initial_array)
+        else:
+            self.load_infrastructure(infrastructure)
@@ -0,0 +1,183 @@
+import collections
+import numpy
+from pfrl.replay_buffer import AbstractReplayBuffer
+from pfrl.replay_buffers.prioritized import PriorityWeightError
+from kns.pipelines.myclasses.SumTree import SumTree
+
+
+class ArrayPrioritizedReplayBuffer(AbstractReplayBuffer, PriorityWeightError):
+    # same parameters and prioritization as pfrl's PrioritizedReplayBuffer, but transitions live in preallocated arrays indexed by a ring pointer:
+    # slot s holds states[s] (float32), actions[s], rewards[s] and is_state_terminal[s] ; the next state is not stored twice,
+    # next_indices[s] is the slot of the following transition of the same environment whose state it is
+    # the last transition of an episode stopped before its end points to a slot holding only its next state (is_transition False)
+    # a transition is sampled once its num_steps followers (or its episode end) are known ; sample returns a dict of batched arrays (see DDQN.update)
+    # priorities of slots are the leaves of a SumTree (0 for slots that can't be sampled) : minibatches are drawn by stratified sampling
+    # (with replacement, unlike pfrl which removes sampled transitions until update_errors) and their priorities are updated at once
+    def __init__(self, capacity, alpha=0.6, beta0=0.4, betasteps=2e5, eps=0.01, normalize_by_max=True, error_min=0, error_max=1, num_steps=1) -> None:
+        assert capacity is not None and capacity > 0 and num_steps > 0
+        self._capacity = int(capacity)
+        self.num_steps = num_steps
+        PriorityWeightError.__init__(self, alpha, beta0, betasteps, eps, normalize_by_max, error_min=error_min, error_max=error_max)
+        self.states = None # allocated at the first append, once the size of observations is known
+        self.actions = numpy.zeros(self._capacity, dtype=numpy.int64)
+        self.rewards = numpy.zeros(self._capacity, dtype=numpy.float32)
+        self.is_state_terminal = numpy.zeros(self._capacity, dtype=bool)
+        self.next_indices = numpy.zeros(self._capacity, dtype=numpy.int64)
+        self.is_transition = numpy.zeros(self._capacity, dtype=bool)
+        self.is_sampleable = numpy.zeros(self._capacity, dtype=bool)
+        self.pointer = 0 # next slot written
+        self.size = 0 # slots written so far (up to capacity)
+        self.n_sampleable = 0
+        self.priorities = SumTree(self._capacity)
+        self.max_priority = 1.0
+        self.pending = collections.defaultdict(collections.deque) # env_id -> slots of its episode not sampleable yet
+        self.pending_next_states = {} # env_id -> next state of its last appended transition
+        self.sampled_indices = None
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def __len__(self):
+        return self.n_sampleable
+
+    def write_slot(self, state):
+        # writes state in the oldest slot (once the ring is full) and returns the slot
+        if self.states is None:
+            self.states = numpy.zeros((self._capacity, len(state)), dtype=numpy.float32)
+        slot = self.pointer
+        if self.is_sampleable[slot]: # overwritten transition
+            self.is_sampleable[slot] = False
+            self.n_sampleable -= 1
+            self.priorities.set(slot, 0.0, numpy.inf)
+        self.size = min(self.size + 1, self._capacity)
+        self.states[slot] = state
+        self.pointer = (slot + 1) % self._capacity
+        return slot
+
+    def make_sampleable(self, slot):
+        self.is_sampleable[slot] = True
+        self.n_sampleable += 1
+        self.priorities.set(slot, self.max_priority)
+
+    def append(self, state, action, reward, next_state=None, next_action=None, is_state_terminal=False, env_id=0, **kwargs):
+        slot = self.write_slot(state)
+        self.actions[slot] = action
+        self.rewards[slot] = reward
+        self.is_state_terminal[slot] = is_state_terminal
+        self.is_transition[slot] = True
+        self.next_indices[slot] = slot # until the next transition of env_id comes (terminal transitions never bootstrap)
+        pending = self.pending[env_id]
+        if len(pending) > 0:
+            self.next_indices[pending[-1]] = slot
+        pending.append(slot)
+        self.pending_next_states[env_id] = next_state
+        if is_state_terminal:
+            while pending:
+                self.make_sampleable(pending.popleft())
+        elif len(pending) > self.num_steps:
+            self.make_sampleable(pending.popleft())
+
+    def stop_current_episode(self, env_id=0):
+        pending = self.pending[env_id]
+        if len(pending) > 0:
+            slot = self.write_slot(self.pending_next_states[env_id]) # next state of the interrupted episode's last transition
+            self.is_transition[slot] = False
+            self.next_indices[pending[-1]] = slot
+            while pending:
+                self.make_sampleable(pending.popleft())
+        self.pending_next_states.pop(env_id, None)
+
+    def sample(self, n):
+        # n transitions drawn proportionally to their priority, one in each of n equal slices of the total priority (global numpy RNG, as pfrl)
+        # returns the n-step batch: state, action, reward (n x num_steps, 0 after the episode end), n_steps, next_state, is_state_terminal and weight
+        assert self.n_sampleable >= n
+        total_priority = self.priorities.total()
+        indices, priorities = self.priorities.sample(n, numpy.random.random_sample(n))
+        self.sampled_indices = indices
+        batch = self.gather(indices)
+        batch["weight"] = self.weights_from_probabilities(priorities / total_priority, self.priorities.min() / total_priority)
+        return batch
+
+    def gather(self, indices):
+        # follows next_indices up to num_steps transitions of the same episode by fancy indexing
+        rewards = numpy.zeros((len(indices), self.num_steps), dtype=numpy.float32)
+        rewards[:, 0] = self.rewards[indices]
+        n_steps = numpy.ones(len(indices), dtype=numpy.int64)
+        last = indices.copy()
+        going = ~self.is_state_terminal[last]
+        for step in range(1, self.num_steps):
+            following = self.next_indices[last]
+            going &= self.is_transition[following]
+            last = numpy.where(going, following, last)
+            rewards[going, step] = self.rewards[last[going]]
+            n_steps += going
+            going &= ~self.is_state_terminal[last]
+        return {"state": self.states[indices], "action": self.actions[indices], "reward": rewards, "n_steps": n_steps,
+                "next_state": self.states[self.next_indices[last]], "is_state_terminal": self.is_state_terminal[last]}
+
+    def priority_from_errors(self, errors):
+        errors = numpy.asarray(errors, dtype=numpy.float64)
+        if self.error_min is not None:
+            errors = numpy.maximum(self.error_min, errors)
+        if self.error_max is not None:
+            errors = numpy.minimum(self.error_max, errors)
+        return (errors + self.eps) ** self.alpha
+
+    def weights_from_probabilities(self, probabilities, min_probability):
+        if self.normalize_by_max == "batch":
+            min_probability = probabilities.min()
+        if self.normalize_by_max:
+            weights = (probabilities / min_probability) ** -self.beta
+        else:
+            weights = (self.n_sampleable * probabilities) ** -self.beta
+        self.beta = min(1.0, self.beta + self.beta_add)
+        return weights.astype(numpy.float32)
+
+    def update_errors(self, errors):
+        assert self.sampled_indices is not None and len(errors) == len(self.sampled_indices)
+        priorities = self.priority_from_errors(errors)
+        assert (priorities > 0).all()
+        self.priorities.update(self.sampled_indices, priorities)
+        self.max_priority = max(self.max_priority, priorities.max().item())
+        self.sampled_indices = None
+
+    def state_dict(self):
+        # copies of the arrays and the scalars of the buffer, e.g. for training checkpoints ; episodes in progress are not kept (their transitions are never sampled)
+        size = self.size
+        arrays = {"states": self.states[:size].copy() if self.states is not None else numpy.zeros((0, 0), dtype=numpy.float32),
+                  "actions": self.actions[:size].copy(), "rewards": self.rewards[:size].copy(), "is_state_terminal": self.is_state_terminal[:size].copy(),
+                  "next_indices": self.next_indices[:size].copy(), "is_transition": self.is_transition[:size].copy(), "is_sampleable": self.is_sampleable[:size].copy(),
+                  "priorities": self.priorities.leaves(numpy.arange(size))}
+        return arrays, {"pointer": self.pointer, "beta": self.beta, "max_priority": self.max_priority}
+
+    def load_state_dict(self, arrays, scalars):
+        size = len(arrays["actions"])
+        assert size <= self._capacity
+        self.states = None
+        if size > 0:
+            self.states = numpy.zeros((self._capacity, arrays["states"].shape[1]), dtype=numpy.float32)
+            self.states[:size] = arrays["states"]
+        for name in ("actions", "rewards", "is_state_terminal", "next_indices", "is_transition", "is_sampleable"):
+            getattr(self, name)[:] = 0
+            getattr(self, name)[:size] = arrays[name]
+        self.size, self.pointer = size, scalars["pointer"]
+        self.n_sampleable = int(self.is_sampleable.sum())
+        self.priorities = SumTree(self._capacity)
+        priorities = numpy.asarray(arrays["priorities"], dtype=numpy.float64)
+        self.priorities.update(numpy.arange(size), priorities, numpy.where(self.is_sampleable[:size], priorities, numpy.inf))
+        self.beta, self.max_priority = scalars["beta"], scalars["max_priority"]
+        self.pending.clear()
+        self.pending_next_states.clear()
+        self.sampled_indices = None
+
+    def save(self, filename):
+        arrays, scalars = self.state_dict()
+        numpy.savez(filename, **arrays, **{"scalar_"+name: value for name, value in scalars.items()})
+
+    def load(self, filename):
+        with numpy.load(filename) as data:
+            arrays = {name: data[name] for name in data.files if not name.startswith("scalar_")}
+            scalars = {name[len("scalar_"):]: data[name].item() for name in data.files if name.startswith("scalar_")}
+        self.load_state_dict(arrays, scalars)
+
@@ -0,0 +1,68 @@
+import numpy
+
+class TickArrivals:
+    # one batch of NSPRs per simulation clock tick : arrival times 0,1,2,...
+    def reset(self, numpy_gen):
+        self.next_time = 0
+
+    def next_arrival_time(self):
+        time = self.next_time
+        self.next_time += 1
+        return time
+
+
+class PoissonArrivals:
+    # batches arrive as a Poisson process of rate batches per tick (exponential inter-arrival times, first arrival after the first gap)
+    # gaps are drawn chunk_size at a time from the numpy generator handed out by reset
+    def __init__(self, rate, chunk_size=4096) -> None:
+        self.rate = float(rate) # YAML reads exponent notation without a dot (e.g. 1e-5) as a string
+        assert self.rate > 0 and chunk_size >= 1
+        self.chunk_size = chunk_size
+
+    def reset(self, numpy_gen):
+        self.numpy_gen = numpy_gen
+        self.last_time = 0.0
+        self.times = []
+
+    def next_arrival_time(self):
+        if len(self.times) == 0:
+            times = self.last_time + numpy.cumsum(self.numpy_gen.exponential(1.0 / self.rate, size=self.chunk_size))
+            self.last_time = times[-1].item()
+            self.times = times.tolist()[::-1] # popped from the end
+        return self.times.pop()
+
+
+class TraceArrivals:
+    # batches arrive at the times listed in the first column of a text/CSV file (sorted, a header line is allowed)
+    # once the trace is exhausted it is replayed shifted by its last time, so that episodes are not bounded by its length
+    def __init__(self, path, delimiter=",") -> None:
+        with open(path) as file:
+            lines = [line.split(delimiter)[0].strip() for line in file if line.strip() != ""]
+        if len(lines) > 0 and not is_number(lines[0]):
+            lines = lines[1:] # header
+        self.trace = numpy.array(lines, dtype=numpy.float64)
+        assert len(self.trace) > 0 and (self.trace >= 0).all() and (numpy.diff(self.trace) >= 0).all() and self.trace[-1] > 0
+        self.trace = self.trace.tolist()
+
+    def reset(self, numpy_gen):
+        self.index = 0
+        self.offset = 0.0
+
+    def next_arrival_time(self):
+        if self.index == len(self.trace):
+            self.index = 0
+            self.offset += self.trace[-1]
+        time = self.offset + self.trace[self.index]
+        self.index += 1
+        return time
+
+
+def is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+ARRIVAL_PROCESSES = {"tick": TickArrivals, "poisson": PoissonArrivals, "trace": TraceArrivals}
@@ -0,0 +1,137 @@
+import heapq
+import numpy
+from collections import OrderedDict
+from kns.pipelines.myclasses.PathSearchEngine import PathSearchEngine
+
+class CandidatePathIndex:
+    # index of the k first shortest-hop paths (in the order the mBFS pops them, ignoring bandwidth) between computing nodes
+    # bandwidths change during an episode but the topology does not: a query only checks the bottleneck bandwidth of the indexed candidates
+    # since the candidates of a pair are a prefix of that order, the first usable candidate is exactly the path a full search would return
+    # candidates are built lazily on the first query of a pair : from the BFS tree of its source for k=1 (one BFS per source, kept for
+    # its other targets) and with Yen's algorithm for k>1 ; indexes are cached per topology (see for_topology) so resets reusing a
+    # topology (e.g. evaluation or training on a fixed topology) don't rebuild them
+    cache = OrderedDict()
+    cache_size = 8
+
+    def __init__(self, indptr, neighbors, neighbor_edges, number_of_computing_nodes, k) -> None:
+        assert k >= 1
+        self.number_of_computing_nodes = number_of_computing_nodes
+        self.k = k
+        self.candidates = {} # (source,target) -> (node paths, edge ids matrix padded with 0, padding mask, exhaustive), filled on demand
+        self.shortest_path_trees = {} # source -> parent of every node in the BFS from source (-1 : source or unreached), k=1 only
+        self.engine = PathSearchEngine(indptr, neighbors, neighbor_edges)
+        self.edge_of = {} # (node,neighbor) -> edge id
+        self.rank_of = {} # (node,neighbor) -> position of neighbor among the neighbors of node (the mBFS expansion order)
+        for node in range(self.engine.number_of_nodes):
+            for position in range(self.engine.indptr[node], self.engine.indptr[node+1]):
+                self.edge_of[(node, self.engine.neighbors[position])] = self.engine.neighbor_edges[position]
+                self.rank_of[(node, self.engine.neighbors[position])] = position - self.engine.indptr[node]
+        self.all_edges = bytes(b"\x01" * (max(self.engine.neighbor_edges, default=-1) + 1))
+
+    @classmethod
+    def for_topology(cls, indptr, neighbors, neighbor_edges, number_of_computing_nodes, k):
+        key = (indptr.tobytes(), neighbors.tobytes(), neighbor_edges.tobytes(), number_of_computing_nodes, k)
+        if key in cls.cache:
+            cls.cache.move_to_end(key)
+            return cls.cache[key]
+        index = cls(indptr, neighbors, neighbor_edges, number_of_computing_nodes, k)
+        cls.cache[key] = index
+        if len(cls.cache) > cls.cache_size:
+            cls.cache.popitem(last=False)
+        return index
+
+    def candidates_of(self, source, target):
+        if (source, target) not in self.candidates:
+            if self.k == 1:
+                # only an unreachable target is exhaustive : a reachable one may have other paths when its shortest one lacks bandwidth
+                parents = self.shortest_path_tree(source)
+                paths = [] if parents[target] == -1 else [self.parent_path(source, target, parents)]
+                self.candidates[(source, target)] = self.pack(paths, len(paths) == 0)
+            else:
+                paths = self.k_shortest_paths(source, target)
+                self.candidates[(source, target)] = self.pack(paths, len(paths) < self.k)
+        return self.candidates[(source, target)]
+
+    def shortest_path_tree(self, source):
+        # k=1 : one BFS gives the first shortest-hop path to every reachable node
+        if source not in self.shortest_path_trees:
+            n_reached = self.engine.breadth_first_search(source, self.all_edges)
+            parents = [-1] * self.engine.number_of_nodes
+            for node in self.engine.queue[1:n_reached]:
+                parents[node] = self.engine.parents[node]
+            self.engine.clear(n_reached)
+            self.shortest_path_trees[source] = parents
+        return self.shortest_path_trees[source]
+
+    def parent_path(self, source, target, parents):
+        path = [target]
+        while path[-1] != source:
+            path.append(parents[path[-1]])
+        path.reverse()
+        return path
+
+    def first_path(self, source, target, usable_edges, removed_nodes=()):
+        # first shortest-hop path from source to target avoiding removed_nodes (marked visited so the BFS never enters them), None if there is none
+        for node in removed_nodes:
+            self.engine.visited[node] = 1
+        n_reached = self.engine.breadth_first_search(source, usable_edges, target)
+        path = self.parent_path(source, target, self.engine.parents) if self.engine.visited[target] else None
+        self.engine.clear(n_reached)
+        for node in removed_nodes:
+            self.engine.visited[node] = 0
+        return path
+
+    def order_key(self, path):
+        # mBFS order : shorter paths first, then lexicographic order of the neighbor positions taken at each hop
+        return len(path), tuple(self.rank_of[(path[i], path[i+1])] for i in range(len(path)-1))
+
+    def k_shortest_paths(self, source, target):
+        # Yen's algorithm : the next path deviates from an already found one at a spur node, after a shared root, and its spur part is
+        # the first shortest-hop path from the spur node avoiding the root nodes and the links the found paths take after that root
+        # the BFS returns the spur part first in mBFS order, so paths come out in mBFS order ; less than k paths means every simple path was found
+        first = self.first_path(source, target, self.all_edges)
+        if first is None:
+            return []
+        paths = [first]
+        heap, seen = [], {tuple(first)}
+        while len(paths) < self.k:
+            previous = paths[-1]
+            for i in range(len(previous)-1):
+                root = previous[:i+1]
+                usable_edges = bytearray(self.all_edges)
+                for path in paths:
+                    if path[:i+1] == root:
+                        usable_edges[self.edge_of[(path[i], path[i+1])]] = 0
+                spur = self.first_path(previous[i], target, usable_edges, root[:-1])
+                if spur is not None and tuple(root[:-1] + spur) not in seen:
+                    candidate = root[:-1] + spur
+                    seen.add(tuple(candidate))
+                    heapq.heappush(heap, (self.order_key(candidate), candidate))
+            if len(heap) == 0:
+                break
+            paths.append(heapq.heappop(heap)[1])
+        return paths
+
+    def pack(self, paths, exhaustive):
+        # candidate paths of a pair as a padded matrix of edge ids so that their bottlenecks are computed in one NumPy call
+        length = max([len(path)-1 for path in paths], default=0)
+        edges = numpy.zeros((len(paths), length), dtype=numpy.int64)
+        padding = numpy.ones((len(paths), length), dtype=bool)
+        for row, path in enumerate(paths):
+            edges[row, :len(path)-1] = [self.edge_of[(path[i], path[i+1])] for i in range(len(path)-1)]
+            padding[row, :len(path)-1] = False
+        return paths, edges, padding, exhaustive
+
+    def first_usable_path(self, source, target, edge_bandwidths, bandwidth, nsprtype):
+        # returns (path, conclusive) : path is the first candidate whose links can all carry bandwidth (list of node indexes) or None
+        # conclusive is False when no candidate is usable but other (longer) paths may exist, a full search is then needed
+        paths, edges, padding, exhaustive = self.candidates_of(source, target)
+        if len(paths) > 0:
+            bottlenecks = numpy.where(padding, numpy.inf, edge_bandwidths[edges]).min(axis=1)
+            if nsprtype == 'hard':
+                usable = bottlenecks >= bandwidth
+            elif nsprtype == 'soft':
+                usable = bottlenecks > 0
+            if usable.any():
+                return paths[int(usable.argmax())], True
+        return None, exhaustive
@@ -0,0 +1,177 @@
+import copy
+import random
+import logging
+import threading
+import numpy
+import torch
+from kedro.io.core import Version
+from pfrl.collections.prioritized import PrioritizedBuffer
+from kns.datasets import CheckpointDataset
+from kns.pipelines.myclasses.ArrayReplayBuffer import ArrayPrioritizedReplayBuffer
+from kns.pipelines.myclasses.VectorEnvironment import SubprocessVectorEnvironment
+
+logger = logging.getLogger(__name__)
+
+AGENT_COUNTERS = ("t", "optim_t", "_cumulative_steps") # DoubleDQN counters (target network syncs, explorer and update schedules follow t)
+AGENT_STATISTICS = ("q_record", "loss_record")
+
+
+class TrainingCheckpointer:
+    # periodic checkpoints of the whole training state to a versioned CheckpointDataset, and resume from the latest one :
+    # agent networks, optimizer and counters, replay buffer (as arrays), RNG states, seeds of the training environments and the records
+    # the state is captured at the end of an episode in the training thread, its files are written by a background thread while training goes on
+    def __init__(self, filepath, interval, background=True) -> None:
+        self.filepath = filepath
+        self.interval = interval ; assert interval >= 0 # 0 : no periodic checkpoint (resume only)
+        self.background = background
+        self.writer = None
+        self.writer_error = None
+
+    def should_save(self, episode):
+        return self.interval > 0 and episode % self.interval == 0
+
+    def save(self, episode, ddqn_agent, train_env, records: dict):
+        data = {"arrays": {}, "torch": {}, "state": {"episode": episode, "records": copy.deepcopy(records)}}
+        data["torch"] = {name: copy.deepcopy(getattr(ddqn_agent, name).state_dict()) for name in ddqn_agent.saved_attributes}
+        data["state"]["agent"] = {name: getattr(ddqn_agent, name) for name in AGENT_COUNTERS}
+        data["state"]["agent_statistics"] = {name: list(getattr(ddqn_agent, name)) for name in AGENT_STATISTICS}
+        data["arrays"], data["state"]["replay_buffer"] = replay_buffer_snapshot(ddqn_agent.replay_buffer)
+        data["state"]["rng"] = rng_states()
+        data["state"]["environments_seeds"] = environments_seeds(train_env)
+        self.wait()
+        dataset = CheckpointDataset(filepath=self.filepath, version=Version(None, None)) # new save version
+        if self.background:
+            self.writer = threading.Thread(target=self.write, args=(dataset, data), daemon=False)
+            self.writer.start()
+        else:
+            self.write(dataset, data)
+
+    def write(self, dataset, data):
+        try:
+            dataset.save(data)
+            logger.info("Training checkpoint of episode %d saved to %s (version %s)", data["state"]["episode"], self.filepath, dataset.resolve_save_version())
+        except Exception as error:
+            self.writer_error = error
+
+    def wait(self):
+        # waits for the checkpoint being written (if any) and raises its error (if any)
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        if self.writer_error is not None:
+            error, self.writer_error = self.writer_error, None
+            raise error
+
+    def resume(self, ddqn_agent, train_env):
+        # restores the latest checkpoint into ddqn_agent and train_env and returns its episode and records (None if there is no checkpoint)
+        # ddqn_agent and train_env are expected fresh (as built by a new run) : the next train_env.reset() then starts the episode that followed the checkpointed one
+        dataset = CheckpointDataset(filepath=self.filepath, version=Version(None, None))
+        if not dataset.exists():
+            logger.info("No training checkpoint found in %s, training starts from scratch", self.filepath)
+            return None
+        data = dataset.load()
+        for name, state_dict in data["torch"].items():
+            getattr(ddqn_agent, name).load_state_dict(state_dict)
+        for name, value in data["state"]["agent"].items():
+            setattr(ddqn_agent, name, value)
+        for name, values in data["state"]["agent_statistics"].items():
+            getattr(ddqn_agent, name).clear()
+            getattr(ddqn_agent, name).extend(values)
+        restore_replay_buffer(ddqn_agent.replay_buffer, data["arrays"], data["state"]["replay_buffer"])
+        restore_rng_states(data["state"]["rng"])
+        restore_environments_seeds(train_env, data["state"]["environments_seeds"])
+        logger.info("Training resumed from the checkpoint of episode %d (step %d)", data["state"]["episode"], ddqn_agent.t)
+        return data["state"]["episode"], data["state"]["records"]
+
+
+def replay_buffer_snapshot(replay_buffer):
+    if isinstance(replay_buffer, ArrayPrioritizedReplayBuffer):
+        arrays, scalars = replay_buffer.state_dict()
+        return {"replay_"+name: array for name, array in arrays.items()}, scalars
+    # arrays of the transitions of a pfrl PrioritizedReplayBuffer in memory order, with their priorities, and its scalar state
+    # unlike the array storage (a copy of its preallocated arrays), this walks every transition dict and the whole priority tree in Python,
+    # in the training thread : with a full buffer (up to capacity transitions) each checkpoint stalls training for that long
+    # entries are lists of num_steps transitions (fewer at episode ends) : transitions are flattened and entry_lengths keeps the split
+    # transitions being gathered (last_n_transitions) are not kept : checkpoints are taken at episode ends where there are none
+    entries = list(replay_buffer.memory.data)
+    transitions = [transition for entry in entries for transition in entry]
+    arrays = {"replay_states": numpy.array([transition["state"] for transition in transitions]),
+              "replay_actions": numpy.array([transition["action"] for transition in transitions], dtype=numpy.int64),
+              "replay_rewards": numpy.array([transition["reward"] for transition in transitions], dtype=numpy.float64),
+              "replay_next_states": numpy.array([transition["next_state"] for transition in transitions]),
+              "replay_terminals": numpy.array([transition["is_state_terminal"] for transition in transitions], dtype=bool),
+              "replay_entry_lengths": numpy.array([len(entry) for entry in entries], dtype=numpy.int64),
+              "replay_priorities": numpy.array(tree_queue_values(replay_buffer.memory.priority_sums), dtype=numpy.float64)}
+    return arrays, {"beta": replay_buffer.beta, "max_priority": replay_buffer.memory.max_priority}
+
+
+def restore_replay_buffer(replay_buffer, arrays, state):
+    if isinstance(replay_buffer, ArrayPrioritizedReplayBuffer):
+        return replay_buffer.load_state_dict({name[len("replay_"):]: array for name, array in arrays.items() if name.startswith("replay_")}, state)
+    memory = PrioritizedBuffer(capacity=replay_buffer.capacity)
+    states, next_states = numpy.asarray(arrays["replay_states"]), numpy.asarray(arrays["replay_next_states"])
+    actions, rewards, terminals = arrays["replay_actions"].tolist(), arrays["replay_rewards"].tolist(), arrays["replay_terminals"].tolist()
+    start = 0
+    for entry_length, priority in zip(arrays["replay_entry_lengths"].tolist(), arrays["replay_priorities"].tolist()):
+        memory.append([dict(state=numpy.array(states[i]), action=actions[i], reward=rewards[i], next_state=numpy.array(next_states[i]),
+                            next_action=None, is_state_terminal=terminals[i]) for i in range(start, start+entry_length)], priority)
+        start += entry_length
+    memory.max_priority = state["max_priority"]
+    replay_buffer.memory = memory
+    replay_buffer.beta = state["beta"]
+    replay_buffer.last_n_transitions.clear()
+
+
+def tree_queue_values(tree):
+    # values of a pfrl TreeQueue (e.g. the priorities of a PrioritizedBuffer) in queue order, in one walk of its nested [left, right, value] nodes
+    values = []
+    def walk(index_left, index_right, node):
+        if not node:
+            return
+        if index_right - index_left == 1:
+            values.append(node[2])
+            return
+        index_center = (index_left + index_right) // 2
+        walk(index_left, index_center, node[0])
+        walk(index_center, index_right, node[1])
+    if tree.length > 0:
+        walk(*tree.bounds, tree.root)
+    return values
+
+
+def rng_states():
+    # global generators used by pfrl (sampling, exploration), FeasibleRandomAction and torch
+    return {"python": random.getstate(), "numpy": numpy.random.get_state(), "torch": torch.get_rng_state()}
+
+
+def restore_rng_states(states):
+    random.setstate(states["python"])
+    numpy.random.set_state(states["numpy"])
+    torch.set_rng_state(states["torch"])
+
+
+def local_environments(train_env):
+    # training environments run in this process (Environment or VectorEnvironment)
+    return [environment for environment in getattr(train_env, "environments", [train_env]) if hasattr(environment, "nsprs_generator")]
+
+
+def environments_seeds(train_env):
+    # seeds of the current episode of every training environment, asked to the worker processes when they run there
+    if isinstance(train_env, SubprocessVectorEnvironment):
+        return [tuple(seeds) for seeds in train_env.environments_seeds()]
+    return [(environment.infrastructure_manager.infrastructure_generator.current_seed, environment.nsprs_generator.current_seed)
+            for environment in local_environments(train_env)]
+
+
+def restore_environments_seeds(train_env, seeds):
+    # generators reseed from current_seed+1 at reset : the next reset starts the episode following the checkpointed one
+    # another number of environments (e.g. loop.n_envs changed) couldn't replay the checkpointed workload : resuming then fails
+    n_environments = train_env.n_envs if isinstance(train_env, SubprocessVectorEnvironment) else len(local_environments(train_env))
+    if n_environments != len(seeds):
+        raise ValueError(f"the checkpoint holds the seeds of {len(seeds)} training environments but {n_environments} are trained (resume with the same loop.n_envs)")
+    if isinstance(train_env, SubprocessVectorEnvironment):
+        train_env.restore_environments_seeds(seeds)
+        return
+    for environment, (infrastructure_seed, nsprs_seed) in zip(local_environments(train_env), seeds):
+        environment.infrastructure_manager.infrastructure_generator.current_seed = infrastructure_seed
+        environment.nsprs_generator.current_seed = nsprs_seed
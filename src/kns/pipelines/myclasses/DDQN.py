@@ -1,14 +1,89 @@
 import numpy
-from typing import Any
+import torch
+from typing import Any, Optional, Sequence
 from pfrl.agents import DoubleDQN
+from pfrl.utils import evaluating, clip_l2_grad_norm_
+from kns.pipelines.myclasses.ActionSelection import masked_greedy_actions
+
+
+class FeasibleRandomAction:
+    # random_action_func of pfrl explorers: uniform choice among the actions allowed by DDQN's current action mask (among all actions if there is no mask)
+    def __init__(self, n_actions) -> None:
+        self.n_actions = n_actions
+        self.action_mask = None
+
+    def __call__(self):
+        if self.action_mask is None or not self.action_mask.any():
+            return numpy.random.randint(low=0, high=self.n_actions)
+        return numpy.random.choice(numpy.flatnonzero(self.action_mask))
+
+
+def float32_observations(x):
+    # phi of the agent (a module-level function so that agents can be pickled, e.g. by Kedro's ParallelRunner)
+    return x.astype(numpy.float32, copy=False)
 
 
 class DDQN(DoubleDQN):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-    
+
+    def split_observation(self, obs: Any):
+        # observations are [cnodes_description, vnf_requirements] optionally followed by a boolean mask of feasible actions
+        return numpy.concatenate((obs[0], obs[1])), (obs[2] if len(obs) > 2 else None)
+
     def act(self, obs: Any) -> Any:
-        return super().act(numpy.array(obs[0] + obs[1]))
+        x, action_mask = self.split_observation(obs)
+        return self.batch_act([x], [action_mask])[0]
     
     def observe(self, obs: Any, reward: float, done: bool, reset: bool) -> None:
-        return super().observe(numpy.array(obs[0] + obs[1]), reward, done, reset)
\ No newline at end of file
+        return super().observe(self.split_observation(obs)[0], reward, done, reset)
+
+    def batch_act(self, batch_obs: Sequence[Any], batch_action_masks: Optional[Sequence[Any]] = None) -> Sequence[Any]:
+        # same as DQN.batch_act but greedy and random actions are only taken among feasible actions when masks are given
+        if batch_action_masks is None or all(action_mask is None for action_mask in batch_action_masks):
+            return super().batch_act(batch_obs)
+        with torch.no_grad(), evaluating(self.model):
+            batch_av = self._evaluate_model_and_update_recurrent_states(batch_obs)
+            batch_argmax = masked_greedy_actions(batch_av.q_values.detach().cpu().numpy(), batch_action_masks)
+        if self.training:
+            random_action_func = getattr(self.explorer, "random_action_func", None)
+            batch_action = []
+            for i in range(len(batch_obs)):
+                if isinstance(random_action_func, FeasibleRandomAction):
+                    random_action_func.action_mask = batch_action_masks[i]
+                batch_action.append(self.explorer.select_action(self.t, lambda: batch_argmax[i], action_value=batch_av[i : i + 1]))
+            if isinstance(random_action_func, FeasibleRandomAction):
+                random_action_func.action_mask = None
+            self.batch_last_obs = list(batch_obs)
+            self.batch_last_action = list(batch_action)
+        else:
+            batch_action = batch_argmax
+        return batch_action
+
+    def update(self, experiences, errors_out: Optional[list] = None) -> None:
+        # same as DQN.update, also for the dict of batched arrays sampled from an ArrayPrioritizedReplayBuffer (no per-transition stacking)
+        if not isinstance(experiences, dict):
+            return super().update(experiences, errors_out=errors_out)
+        exp_batch = self.batch_arrays(experiences)
+        errors_out = [] if errors_out is None else errors_out
+        loss = self._compute_loss(exp_batch, errors_out=errors_out)
+        self.replay_buffer.update_errors(errors_out)
+        self.loss_record.append(float(loss.detach().cpu().numpy()))
+        self.optimizer.zero_grad()
+        loss.backward()
+        if self.max_grad_norm is not None:
+            clip_l2_grad_norm_(self.model.parameters(), self.max_grad_norm)
+        self.optimizer.step()
+        self.optim_t += 1
+
+    def batch_arrays(self, experiences: dict) -> dict:
+        # tensors of pfrl's batch_experiences from batched n-step arrays (reward has one column per step, 0 after the episode end)
+        discounts = self.gamma ** numpy.arange(experiences["reward"].shape[1], dtype=numpy.float32)
+        return {
+            "state": torch.as_tensor(self.phi(experiences["state"]), device=self.device),
+            "action": torch.as_tensor(experiences["action"], device=self.device),
+            "reward": torch.as_tensor(experiences["reward"] @ discounts, dtype=torch.float32, device=self.device),
+            "next_state": torch.as_tensor(self.phi(experiences["next_state"]), device=self.device),
+            "is_state_terminal": torch.as_tensor(experiences["is_state_terminal"], dtype=torch.float32, device=self.device),
+            "discount": torch.as_tensor(self.gamma ** experiences["n_steps"], dtype=torch.float32, device=self.device),
+            "weights": torch.as_tensor(experiences["weight"], dtype=torch.float32, device=self.device) }
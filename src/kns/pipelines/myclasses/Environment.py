@@ -1,12 +1,16 @@
 class Environment:
-    def __init__(self, infrastructure_manager, nsprs_generator, nsprs_lifecycle_manager, failed_nspr_strategy, keep_information=True) -> None:
+    def __init__(self, infrastructure_manager, nsprs_generator, nsprs_lifecycle_manager, failed_nspr_strategy, keep_information=True, action_mask=False, nspr_selector=None) -> None:
         # keep_information is used to decide wether to keep placements and matchings information for terminated VNFs (PS: keeping it may consume few more memory)
+        # action_mask is used to decide wether observations also carry a boolean mask of the cnodes on which the VNF to place can actually be placed
+        # nspr_selector picks the next waiting NSPR of the batch (e.g. an NSPRSelector), None processes them in FIFO order
         self.infrastructure_manager = infrastructure_manager
         self.nsprs_generator = nsprs_generator
         self.nsprs_lifecycle_manager = nsprs_lifecycle_manager
         assert failed_nspr_strategy in [1,2]
         self.failed_nspr_strategy = failed_nspr_strategy
         self.keep_information = keep_information ; assert keep_information in [True,False]
+        self.action_mask = action_mask ; assert action_mask in [True,False]
+        self.nspr_selector = nspr_selector
         #--------------------
         self.cnodes_resources_upper_bounds = self.infrastructure_manager.get_resources_upper_bounds()
         #--------------------
@@ -26,12 +30,12 @@ class Environment:
         # reset NSPRs mifecycle manager
         self.nsprs_lifecycle_manager.reset()
         #-----------------------------------
-        self.nsprs_lifecycle_manager.add_to_waiting_nsprs( self.nsprs_generator.generate() )
+        self.receive_next_batch_of_nsprs()
         self.load_a_nspr_from_current_batch_and_if_empty_receive_new_batch_of_nsprs_and_load_one()
         # describing infrastructure just after allow to take into account any changes that may occur in above function
         cnodes_description = self.infrastructure_manager.describe()
         self.number_of_successful_nsprs_in_batch = 0
-        return [cnodes_description, self.requirements_of_vnf_to_place]
+        return self.observation(cnodes_description)
 
     def step(self, action):
         cnodes_description = None
@@ -67,25 +71,54 @@ class Environment:
                 cnodes_description = self.infrastructure_manager.describe()
                 info = "moved-to-next-nspr" #TODO remove later if needed
         # print([cnodes_description, self.requirements_of_vnf_to_place])
-        return [cnodes_description, self.requirements_of_vnf_to_place], reward, done, info #TODO not placed has replaced done
+        return self.observation(cnodes_description), reward, done, info #TODO not placed has replaced done
+
+    def observation(self, cnodes_description):
+        if self.action_mask:
+            return [cnodes_description, self.requirements_of_vnf_to_place, self.compute_action_mask()]
+        return [cnodes_description, self.requirements_of_vnf_to_place]
+
+    def compute_action_mask(self, nspr=None, vnf_id=None, vnf_requirements=None):
+        # boolean array whose entry action tells whether placing the VNF to place on cnode action+1 would succeed in self.place
+        # cases 1 and 3 of self.place are covered at once : resources of all cnodes are checked together and a single BFS from the precedent VNF's cnode gives every cnode it can reach
+        # nspr, vnf_id and vnf_requirements default to the VNF to place of the ongoing NSPR
+        if nspr is None:
+            nspr, vnf_id, vnf_requirements = self.ongoing_nspr, self.id_of_vnf_to_place, self.requirements_of_vnf_to_place
+        nsprtype = nspr.nsprtype
+        mask = self.infrastructure_manager.feasible_cnodes(vnf_requirements, nsprtype)
+        if vnf_id > 1:
+            precedent_cnode = nspr.get_placement(vnf_id-1)
+            reachable = self.infrastructure_manager.reachable_cnodes(precedent_cnode, vnf_requirements[-1], nsprtype)
+            reachable[int(precedent_cnode[1:])-1] = True # case 2 needs no path
+            mask = mask & reachable
+        return mask
 
     def close(self):
         pass
 
+    def instrument(self, timers):
+        # times steps, resets and their main sub-phases with timers (a PhaseTimers) ; sub-phases are nested in env.step and env.reset
+        for method_name, phase in [("step", "env.step"), ("reset", "env.reset"), ("place", "env.place"), ("compute_action_mask", "env.action_mask"),
+                                   ("load_a_nspr_from_current_batch_and_if_empty_receive_new_batch_of_nsprs_and_load_one", "env.load_nspr"),
+                                   ("trigger_simulation_clock", "env.simulation_clock")]:
+            timers.instrument(self, method_name, phase)
+
     def iterative_nspr_vnfs_descriptions(self):
         vnfs_descriptions = self.ongoing_nspr.describe_vnfs()
         for vnf_id in range(len(vnfs_descriptions)):
             yield vnf_id+1, vnfs_descriptions[vnf_id]
     
-    def place(self, vnf_id, vnf_requirements, cnode_id):
+    def place(self, vnf_id, vnf_requirements, cnode_id, nspr=None):
         # this function checks the placeability of the vnf (whose requirements are provided) on the cnode (whose id is provided)
-        # if successful placement: information on placements and matchings are added into nspr
+        # if successful placement: information on placements and matchings are added into nspr (the ongoing NSPR by default)
+        if nspr is None:
+            nspr = self.ongoing_nspr
         placed = True
         mbfs_path = None
         reward = 0.0
         if vnf_id == 1:
             # we just need to check vnf_id can be place on cnode_id (no matching verification as it's first VNF)
-            if self.infrastructure_manager.is_vnf_placeable(vnf_requirements, cnode_id, self.ongoing_nspr.nsprtype):
+            if self.infrastructure_manager.is_vnf_placeable(vnf_requirements, cnode_id, nspr.nsprtype):
                 placed = True
             else:
                 placed = False
@@ -94,9 +127,9 @@ class Environment:
             # case 1 : VNF vnf_id is not placeable on cnode_id
             # case 2 : VNF vnf_id is placeable on cnode_id which is the same proposed for precedent VNF (vnf_id-1) meaning VNFs vnf_id and vnf_id-1 are on same cnode_id (no matching verification)
             # case 3 : VNF vnf_id is placeable on cnode_id which is different from the precedent VNF (vnf_id-1)' cnode meaning VNF vnf_id should be placeable on cnode_id AND there should be a path to link VNF vnf_id-1 cnode to the one of VNF vnf_id
-            if self.infrastructure_manager.is_vnf_placeable(vnf_requirements, cnode_id, self.ongoing_nspr.nsprtype):
-                if self.ongoing_nspr.get_placement(vnf_id-1) != "s"+str(cnode_id): # case 3
-                    mbfs_path = self.infrastructure_manager.found_a_valid_path_between(self.ongoing_nspr.get_placement(vnf_id-1), "s"+str(cnode_id), vnf_requirements[-1], self.ongoing_nspr.nsprtype)
+            if self.infrastructure_manager.is_vnf_placeable(vnf_requirements, cnode_id, nspr.nsprtype):
+                if nspr.get_placement(vnf_id-1) != "s"+str(cnode_id): # case 3
+                    mbfs_path = self.infrastructure_manager.found_a_valid_path_between(nspr.get_placement(vnf_id-1), "s"+str(cnode_id), vnf_requirements[-1], nspr.nsprtype)
                     if mbfs_path is not None:
                         placed = True
                     else:
@@ -107,13 +140,13 @@ class Environment:
                 placed = False
         #-----------------------------------------------------------------------
         if placed:
-            self.ongoing_nspr.set_placement(vnf_id, cnode_id) # set placement information
+            nspr.set_placement(vnf_id, cnode_id) # set placement information
             cnode_resources = self.infrastructure_manager.get_resources(cnode_id)
-            self.ongoing_nspr.set_satisfied_resources( vnf_id, self.infrastructure_manager.place_vnf(vnf_requirements, cnode_id) ) # concretely place VNF implying cnode resources update
+            nspr.set_satisfied_resources( vnf_id, self.infrastructure_manager.place_vnf(vnf_requirements, cnode_id) ) # concretely place VNF implying cnode resources update
             if mbfs_path is not None:
                 bw_reward = 1.0 / (len(mbfs_path) - 1)
-                self.ongoing_nspr.set_matching(vnf_id, mbfs_path) # set matching information
-                self.ongoing_nspr.set_satisfied_bw(vnf_id, self.infrastructure_manager.allocate_path(mbfs_path, vnf_requirements[-1]))
+                nspr.set_matching(vnf_id, mbfs_path) # set matching information
+                nspr.set_satisfied_bw(vnf_id, self.infrastructure_manager.allocate_path(mbfs_path, vnf_requirements[-1]))
             else:
                 bw_reward = 1.0
             # reward = 100.0 * bw_reward * ((cnode_resources[0]/self.cnodes_resources_upper_bounds[0])+(cnode_resources[1]/self.cnodes_resources_upper_bounds[1])+(cnode_resources[2]/self.cnodes_resources_upper_bounds[2]))
@@ -125,27 +158,33 @@ class Environment:
     def load_a_nspr_from_current_batch_and_if_empty_receive_new_batch_of_nsprs_and_load_one(self):
         # retrieve a waiting NSPR (allocability and flexibility are used here), verify it's different from None and load it
         episode_should_be_stopped = False
-        self.ongoing_nspr = self.nsprs_lifecycle_manager.retrieve_a_waiting_nspr()
+        self.ongoing_nspr = self.nsprs_lifecycle_manager.retrieve_a_waiting_nspr(self.nspr_selector)
         if self.ongoing_nspr is None: # end of current batch of waiting NSPRs
-            self.trigger_simulation_clock()
             if self.number_of_successful_nsprs_in_batch == 0:
                 episode_should_be_stopped = True
             else:
                 self.number_of_successful_nsprs_in_batch = 0
-        while self.ongoing_nspr is None:
-            self.nsprs_lifecycle_manager.add_to_waiting_nsprs( self.nsprs_generator.generate() )
-            self.ongoing_nspr = self.nsprs_lifecycle_manager.retrieve_a_waiting_nspr()
+        while self.ongoing_nspr is None: # the clock jumps to the arrival of the next (non empty) batch
+            self.receive_next_batch_of_nsprs()
+            self.ongoing_nspr = self.nsprs_lifecycle_manager.retrieve_a_waiting_nspr(self.nspr_selector)
         # loading next NSPR to be processed
         self.nspr_vnfs = self.iterative_nspr_vnfs_descriptions()
         self.id_of_vnf_to_place, self.requirements_of_vnf_to_place = next(self.nspr_vnfs)
         return episode_should_be_stopped
     
-    def trigger_simulation_clock(self):
-        # update nsprs' lifecycle by decrementing running nsprs' remaining durations
-        # 1) decrement running NSPRs duration by 1
-        # 2) retrieve terminated NSPRs (if any)
-        # 3) deallocate their resources
-        # 4) delete their information about placement and matchings
-        nsprs_to_deallocate = self.nsprs_lifecycle_manager.decrement_running_nsprs_durations(keep_terminated_nsprs_information=self.keep_information)
+    def receive_next_batch_of_nsprs(self):
+        # discrete event simulation : the clock jumps straight to the arrival time of the next batch of NSPRs, which then waits to be processed
+        arrival_time, new_nsprs = self.nsprs_generator.next_arrival()
+        self.trigger_simulation_clock(arrival_time)
+        self.nsprs_lifecycle_manager.add_to_waiting_nsprs(new_nsprs)
+
+    def trigger_simulation_clock(self, time):
+        # update nsprs' lifecycle by advancing the simulation clock to time
+        # 1) retrieve running NSPRs whose end time is reached by time (if any), whatever the number of ticks in between
+        # 2) deallocate their resources
+        # 3) delete their information about placement and matchings (only once deallocated)
+        nsprs_to_deallocate = self.nsprs_lifecycle_manager.advance_clock_to(time)
         for nspr in nsprs_to_deallocate:
-            self.infrastructure_manager.deallocate_whole_nspr(nspr)
\ No newline at end of file
+            self.infrastructure_manager.deallocate_whole_nspr(nspr)
+            if not self.keep_information:
+                nspr.unset_placements_and_matchings()
\ No newline at end of file
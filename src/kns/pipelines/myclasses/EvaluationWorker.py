@@ -0,0 +1,111 @@
+import os
+import copy
+import collections
+import traceback
+import multiprocessing
+import numpy
+import torch
+from kns.pipelines.myclasses.ActionSelection import masked_greedy_actions
+
+
+def evaluation_worker(snapshots, connection, eval_env, model, phi, eval_max_iterations):
+    # evaluates every snapshot (state dict of the agent's model) greedily on eval_env and sends back (performance, actions)
+    torch.set_num_threads(1) # leaves the cores to training
+    try:
+        while True:
+            snapshot = snapshots.get()
+            if snapshot is None:
+                break
+            model.load_state_dict(snapshot)
+            performance, actions = greedy_episode(model, phi, eval_env, eval_max_iterations)
+            connection.send(("result", (performance, actions)))
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def greedy_episode(model, phi, eval_env, eval_max_iterations):
+    # same episode as nodes.evaluation with a DDQN in eval mode: greedy actions (among feasible ones if observations carry a mask)
+    # returns the performance (None if the episode isn't done within eval_max_iterations, it's then not recorded) and the actions taken
+    actions = []
+    obs = eval_env.reset()
+    iteration = eval_max_iterations
+    with torch.no_grad():
+        while iteration is None or iteration > 0:
+            x = phi(numpy.concatenate((obs[0], obs[1])))
+            batch_q = model(torch.as_tensor(x[None])).q_values.numpy()
+            action = masked_greedy_actions(batch_q, [obs[2] if len(obs) > 2 else None])[0]
+            actions.append(action)
+            obs, _, done, _ = eval_env.step(action)
+            if iteration is not None:
+                iteration -= 1
+            if done:
+                return eval_env.nsprs_lifecycle_manager.running_and_successfully_terminated_nsprs(), actions
+    return None, actions
+
+
+class EvaluationWorker:
+    # runs the evaluations of nodes.evaluation in a worker process while training goes on: evaluate hands out a snapshot of the agent's
+    # weights and returns at once, performances and actions are appended to the records as the worker reports them (in submission order)
+    # the worker keeps its own copies of eval_env and of the Q-function (fork) and only receives the model's weights : the rest of the
+    # agent (target model, optimizer) stays in this process and is saved here, with the evaluated weights, when a new best is reported
+    # at most max_pending evaluations are pending : evaluate waits for the worker when it lags further behind, so snapshots don't pile up
+    def __init__(self, ddqn_agent, eval_env, loop: dict, agent_directory="myagent", start_method="fork", max_pending=2) -> None:
+        context = multiprocessing.get_context(start_method)
+        self.snapshots = context.Queue(max_pending) # written by a feeder thread, never full since pending evaluations are bounded
+        self.connection, worker_connection = context.Pipe(duplex=False)
+        self.worker = context.Process(target=evaluation_worker, daemon=True,
+                                      args=(self.snapshots, worker_connection, eval_env, copy.deepcopy(ddqn_agent.model).eval(), ddqn_agent.phi,
+                                            loop["eval_max_iterations"]))
+        self.worker.start()
+        worker_connection.close()
+        self.max_pending = max_pending
+        self.agent_directory = agent_directory
+        self.pending = collections.deque() # state dicts of the agent's saved attributes for the evaluations submitted but not reported yet
+        self.closed = False
+
+    def __getstate__(self):
+        raise TypeError("EvaluationWorker can't be pickled, its worker belongs to the process that created it")
+
+    def submit(self, ddqn_agent):
+        # copies are taken here, in the training thread, so that later updates don't leak into the snapshot
+        snapshot = {name: copy.deepcopy(getattr(ddqn_agent, name).state_dict()) for name in ddqn_agent.saved_attributes}
+        self.snapshots.put(snapshot["model"])
+        self.pending.append(snapshot)
+
+    def collect(self, performance_records: list, actions_records: list, best_performance, block=False, max_pending=None):
+        # appends the reported evaluations to the records and returns the best performance, saving the agent (as DDQN.save would) on a new best
+        # waits for all pending evaluations if block, for enough of them to leave at most max_pending pending if given
+        while len(self.pending) > 0 and (block or (max_pending is not None and len(self.pending) > max_pending) or self.connection.poll()):
+            kind, content = self.connection.recv()
+            if kind == "error":
+                raise RuntimeError("Evaluation worker failed:\n" + content)
+            performance, actions = content
+            snapshot = self.pending.popleft()
+            actions_records.extend(actions)
+            if performance is not None:
+                performance_records.append(performance)
+                if performance > best_performance:
+                    best_performance = performance
+                    os.makedirs(self.agent_directory, exist_ok=True)
+                    for name, state_dict in snapshot.items():
+                        torch.save(state_dict, os.path.join(self.agent_directory, name + ".pt"))
+        return best_performance
+
+    def evaluate(self, ddqn_agent, eval_env, loop: dict, performance_records: list, actions_records: list, best_performance):
+        # drop-in replacement of nodes.evaluation (eval_env and loop are the worker's)
+        best_performance = self.collect(performance_records, actions_records, best_performance, max_pending=self.max_pending-1)
+        self.submit(ddqn_agent)
+        return self.collect(performance_records, actions_records, best_performance)
+
+    def close(self, performance_records: list, actions_records: list, best_performance):
+        # waits for the pending evaluations, stops the worker and returns the best performance
+        if self.closed:
+            return best_performance
+        best_performance = self.collect(performance_records, actions_records, best_performance, block=True)
+        self.snapshots.put(None)
+        self.worker.join()
+        self.snapshots.close()
+        self.closed = True
+        return best_performance
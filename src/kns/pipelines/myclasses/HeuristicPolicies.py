@@ -0,0 +1,84 @@
+import numpy
+from kns.pipelines.myclasses.ActionSelection import masked_greedy_actions
+
+
+# scores of the cnodes for the VNF to place (the feasible cnode of highest score is chosen), one row per observation :
+# cnodes is (batch x n_cnodes x CPU,RAM,STORAGE,BANDWIDTH), requirements is (batch x CPU,RAM,STORAGE,BANDWIDTH) and
+# predecessors holds the cnode index of the precedent VNF of the same NSPR (-1 for first VNFs)
+
+def first_fit(cnodes, requirements, predecessors):
+    # lowest cnode id
+    return numpy.broadcast_to(-numpy.arange(cnodes.shape[1], dtype=numpy.float64), cnodes.shape[:2])
+
+
+def residual_resources(cnodes, requirements):
+    # CPU+RAM+STORAGE left on each cnode once the VNF is placed on it
+    return (cnodes[:, :, :3] - requirements[:, None, :3]).sum(axis=2)
+
+
+def best_fit(cnodes, requirements, predecessors):
+    # tightest cnode : least resources left once the VNF is placed
+    return -residual_resources(cnodes, requirements)
+
+
+def worst_fit(cnodes, requirements, predecessors):
+    # loosest cnode : most resources left once the VNF is placed
+    return residual_resources(cnodes, requirements)
+
+
+def bandwidth_greedy(cnodes, requirements, predecessors):
+    # the precedent VNF's cnode (its virtual link then needs no bandwidth at all), otherwise the cnode with the most bandwidth around it
+    scores = cnodes[:, :, 3].astype(numpy.float64)
+    has_predecessor = numpy.flatnonzero(predecessors >= 0)
+    scores[has_predecessor, predecessors[has_predecessor]] = numpy.inf
+    return scores
+
+
+HEURISTICS = {"first_fit": first_fit, "best_fit": best_fit, "worst_fit": worst_fit, "bandwidth_greedy": bandwidth_greedy}
+
+
+class HeuristicPolicy:
+    # non-learned placement policy acting on Environment observations (act) or on stacked VectorEnvironment observations
+    # (batch_act, same signature as DDQN.batch_act) : one vectorized scoring of all cnodes of all environments per step
+    # actions are taken among feasible cnodes : those of the action masks when environments provide them, otherwise those with
+    # enough CPU, RAM and STORAGE (hard NSPRs) and, beyond the first VNF, the precedent VNF's cnode or cnodes with enough bandwidth around them
+    # (an approximation : a cnode with enough bandwidth around it may have no usable path to the precedent VNF's cnode)
+    # the precedent VNF's cnode is the previous action of the same environment : only first VNFs need no bandwidth (their requirement is 0)
+    def __init__(self, heuristic, n_cnode_features=4, n_vnf_features=4) -> None:
+        assert heuristic in HEURISTICS, f"unknown heuristic '{heuristic}' (expected one of {sorted(HEURISTICS)})"
+        self.heuristic = heuristic
+        self.score = HEURISTICS[heuristic]
+        self.n_cnode_features = n_cnode_features
+        self.n_vnf_features = n_vnf_features
+        self.last_actions = None # previous action of each environment
+
+    def batch_act(self, batch_obs, batch_action_masks=None):
+        batch_obs = numpy.asarray(batch_obs)
+        cnodes = batch_obs[:, :-self.n_vnf_features].reshape(len(batch_obs), -1, self.n_cnode_features)
+        requirements = batch_obs[:, -self.n_vnf_features:]
+        if self.last_actions is None or len(self.last_actions) != len(batch_obs):
+            self.last_actions = numpy.full(len(batch_obs), -1)
+        predecessors = numpy.where(requirements[:, 3] > 0, self.last_actions, -1)
+        if batch_action_masks is None or any(action_mask is None for action_mask in batch_action_masks):
+            batch_action_masks = numpy.all(cnodes[:, :, :3] >= requirements[:, None, :3], axis=2) & \
+                                 ((cnodes[:, :, 3] >= requirements[:, None, 3]) | (numpy.arange(cnodes.shape[1]) == predecessors[:, None]))
+        actions = masked_greedy_actions(self.score(cnodes, requirements, predecessors), batch_action_masks)
+        self.last_actions = actions
+        return actions
+
+    def act(self, obs):
+        # obs as returned by Environment.reset and Environment.step
+        x = numpy.concatenate((obs[0], obs[1]))
+        return self.batch_act(x[None], None if len(obs) < 3 else [obs[2]])[0]
+
+
+def run_heuristic_episodes(policy, vector_env, episodes_per_env=1):
+    # performances (running and successfully terminated NSPRs) of the first episodes_per_env episodes of every environment of vector_env
+    # (a VectorEnvironment or SubprocessVectorEnvironment), all stepped at once ; row i holds those of environment i
+    performances = [[] for _ in range(vector_env.n_envs)]
+    obs = vector_env.reset()
+    while min(len(env_performances) for env_performances in performances) < episodes_per_env:
+        obs, _, dones, infos = vector_env.step(policy.batch_act(obs, vector_env.action_masks))
+        for env_index in numpy.flatnonzero(dones):
+            performances[env_index].append(infos[env_index]["performance"])
+    return [env_performances[:episodes_per_env] for env_performances in performances]
@@ -1,10 +1,33 @@
-import copy
 import numpy
 import networkx
+from kns.pipelines.myclasses.Topologies import TOPOLOGIES
+
+
+class InfrastructureSnapshot:
+    # initial state of an infrastructure as flat arrays: CPU,RAM,STORAGE of cnodes "s1".."sN" (in that order) and bandwidth of links (in graph order)
+    # restoring writes them back into the infrastructure attributes, the graph structure itself is never copied
+    def __init__(self, infrastructure) -> None:
+        self.cnode_names = sorted([cnode for cnode, cpu in infrastructure.nodes.data("cpu") if cpu is not None], key=lambda name: int(name[1:]))
+        self.resources = numpy.array([[infrastructure.nodes[cnode]["cpu"], infrastructure.nodes[cnode]["ram"], infrastructure.nodes[cnode]["stor"]] for cnode in self.cnode_names]).reshape(-1,3)
+        self.links = list(infrastructure.edges)
+        self.bandwidths = numpy.array([bandwidth for _, _, bandwidth in infrastructure.edges.data("bw")])
+
+    def restore(self, infrastructure):
+        # infrastructure must have the structure the snapshot was taken from
+        for cnode, (cpu, ram, stor) in zip(self.cnode_names, self.resources.tolist()):
+            attributes = infrastructure.nodes[cnode]
+            attributes["cpu"], attributes["ram"], attributes["stor"] = cpu, ram, stor
+        for (node1, node2), bandwidth in zip(self.links, self.bandwidths.tolist()):
+            infrastructure[node1][node2]["bw"] = bandwidth
+
 
 class InfrastructureGenerator:
     def __init__(self, parameters) -> None:
-        self.infrastructure = int(parameters["infrastructure"]) ; assert int(parameters["infrastructure"]) in [1]
+        # infrastructure is 1 (6 cnodes, 3 switches and 4 routers) or the name of a topology of Topologies.TOPOLOGIES built from parameters["topology"]
+        self.infrastructure = parameters["infrastructure"] ; assert self.infrastructure in [1] + list(TOPOLOGIES)
+        self.topology = None
+        if self.infrastructure != 1:
+            self.topology = TOPOLOGIES[self.infrastructure](**parameters["topology"])
         #-------------------------------------------------------------------------------------------------
         assert parameters["is_for_train"] in [True,False]
         self.is_for_train = parameters["is_for_train"]
@@ -28,17 +51,31 @@ class InfrastructureGenerator:
         self.min_latency = parameters["min_latency"]
         self.max_latency = parameters["max_latency"]
         #-------------------------------------------
-        self.backup_of_infrastructure = None
+        self.backup_of_infrastructure = None # last generated infrastructure (the one handed out)
+        self.snapshot = None # initial state of backup_of_infrastructure
 
-    def generate(self):
+    def generate(self, restore=True):
         # returns a NetworkX-like object representing the infrastructure
+        # for evaluation the same object is handed out at every reset, restored to its initial state (no copy of the graph)
+        # restore is False for callers that never write into the graph (ArrayInfrastructureManager keeps the live state in its arrays)
         if (not self.is_for_train) and (self.backup_of_infrastructure is not None):
-            return copy.deepcopy(self.backup_of_infrastructure)
+            if restore:
+                self.snapshot.restore(self.backup_of_infrastructure)
+            return self.backup_of_infrastructure
         if self.infrastructure == 1:
             self.backup_of_infrastructure = self.infrastructure1()
+        else:
+            self.backup_of_infrastructure = self.infrastructure_from_topology()
+        self.snapshot = InfrastructureSnapshot(self.backup_of_infrastructure) if not self.is_for_train else None
         #--------------------------------------------------
-        return copy.deepcopy(self.backup_of_infrastructure)
+        return self.backup_of_infrastructure
     
+    def number_of_computing_nodes(self):
+        # known without generating any infrastructure (the structure doesn't depend on the seed)
+        if self.infrastructure == 1:
+            return 6
+        return self.topology.n_cnodes
+
     def reset(self):
         if self.is_for_train:
             self.current_seed += 1
@@ -77,4 +114,23 @@ class InfrastructureGenerator:
             for j in range(i+1,5):
                 infrastructure.add_edge("r"+str(i), "r"+str(j), bw=self.numpy_gen.uniform(self.corePl_min_bw,self.corePl_max_bw))
         # return final result
-        return infrastructure
\ No newline at end of file
+        return infrastructure
+
+    def infrastructure_from_topology(self):
+        # draws resources of the computing nodes and bandwidths of the links of self.topology (one call per kind of value)
+        topology = self.topology
+        n_cnodes = topology.n_cnodes
+        resources = self.numpy_gen.uniform(low=[self.min_cpu,self.min_ram,self.min_stor], high=[self.max_cpu,self.max_ram,self.max_stor], size=(n_cnodes,3)).tolist()
+        cnode_bandwidths = self.numpy_gen.uniform(self.cnodePl_min_bw, self.cnodePl_max_bw, size=n_cnodes).tolist()
+        if topology.bandwidths is None:
+            core_bandwidths = self.numpy_gen.uniform(self.corePl_min_bw, self.corePl_max_bw, size=len(topology.links)).tolist()
+        else:
+            core_bandwidths = topology.bandwidths.tolist()
+        infrastructure = networkx.Graph()
+        infrastructure.add_nodes_from(("s"+str(i+1), {"cpu": cpu, "initial_cpu": cpu, "ram": ram, "initial_ram": ram, "stor": stor, "initial_stor": stor, "load": 0.0, "initial_bw": bandwidth})
+                                      for i, ((cpu, ram, stor), bandwidth) in enumerate(zip(resources, cnode_bandwidths)))
+        infrastructure.add_nodes_from(topology.network_nodes)
+        network_nodes = topology.network_nodes
+        infrastructure.add_edges_from(("s"+str(i+1), network_nodes[node], {"bw": bandwidth}) for i, (node, bandwidth) in enumerate(zip(topology.cnode_attachments.tolist(), cnode_bandwidths)))
+        infrastructure.add_edges_from((network_nodes[node1], network_nodes[node2], {"bw": bandwidth}) for (node1, node2), bandwidth in zip(topology.links.tolist(), core_bandwidths))
+        return infrastructure
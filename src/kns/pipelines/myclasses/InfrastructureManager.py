@@ -1,18 +1,45 @@
+import numpy
 import networkx
+from collections import deque
 
 class InfrastructureManager:
     def __init__(self, infrastructure_generator) -> None:
         self.infrastructure_generator = infrastructure_generator
         self.infrastructure_to_manage = self.infrastructure_generator.generate() # infrastructure_to_manage is a NetworkX-like graph
         self.number_of_computing_nodes = len([cnode for cnode in self.infrastructure_to_manage.nodes.data("cpu") if cnode[1] is not None])
-    
+        self.build_observation()
+
+    def build_observation(self):
+        # preallocated float32 observation (CPU,RAM,STORAGE,BANDWIDTH of each cnode) and aggregate bandwidth around each cnode
+        # both are then updated in place, only for the cnodes touched by place_vnf, remove_vnf, allocate_path and deallocate_path
+        self.cnodes_bandwidth = numpy.zeros(self.number_of_computing_nodes)
+        self.observation = numpy.zeros(4*self.number_of_computing_nodes, dtype=numpy.float32)
+        self.cnodes_observation = self.observation.reshape(-1,4) # row cnode_id-1 is a view on the features of cnode cnode_id
+        for cnode_id in range(1,self.number_of_computing_nodes+1):
+            self.refresh_cnode_resources(cnode_id)
+            self.refresh_cnode_bandwidth(cnode_id)
+
+    def refresh_cnode_resources(self, cnode_id):
+        cnode = self.infrastructure_to_manage.nodes["s"+str(cnode_id)]
+        self.cnodes_observation[cnode_id-1,:3] = (cnode["cpu"], cnode["ram"], cnode["stor"])
+
+    def refresh_cnode_bandwidth(self, cnode_id):
+        # sum of the bandwidths of the links around cnode_id (recomputed rather than shifted so that it never drifts)
+        self.cnodes_bandwidth[cnode_id-1] = sum([self.infrastructure_to_manage["s"+str(cnode_id)][n]["bw"] for n in networkx.neighbors(self.infrastructure_to_manage,"s"+str(cnode_id))])
+        self.cnodes_observation[cnode_id-1,3] = self.cnodes_bandwidth[cnode_id-1]
+
+    def refresh_path_bandwidths(self, path):
+        for node_name in path:
+            if self.infrastructure_to_manage.nodes[node_name].get("cpu") is not None:
+                self.refresh_cnode_bandwidth(int(node_name[1:]))
+
     def get_resources(self, cnode_id):
         # returns CPU,RAM,STORAGE,BANDWIDTH of cnode cnode_id
         return [
             self.infrastructure_to_manage.nodes["s"+str(cnode_id)]["cpu"],
             self.infrastructure_to_manage.nodes["s"+str(cnode_id)]["ram"],
             self.infrastructure_to_manage.nodes["s"+str(cnode_id)]["stor"],
-            sum([self.infrastructure_to_manage["s"+str(cnode_id)][n]["bw"] for n in networkx.neighbors(self.infrastructure_to_manage,"s"+str(cnode_id))])
+            self.cnodes_bandwidth[cnode_id-1].item()
         ]
     
     def get_resources_upper_bounds(self):
@@ -24,11 +51,9 @@ class InfrastructureManager:
         ]
 
     def describe(self):
-        # returns a list describing each computing node (CPU,RAM,STORAGE,BANDWIDTH)
-        resources = []
-        for cnode_id in range(1,self.number_of_computing_nodes+1):
-            resources.extend( self.get_resources(cnode_id) )
-        return resources
+        # returns a float32 array describing each computing node (CPU,RAM,STORAGE,BANDWIDTH)
+        # it is a view on the maintained observation (no copy): it changes with the infrastructure, copy it to keep it
+        return self.observation
     
     # mBFS functions
     def is_vnf_placeable(self, vnf_requirements, cnode_id, nsprtype):
@@ -48,6 +73,29 @@ class InfrastructureManager:
             else:
                 return False
 
+    def feasible_cnodes(self, vnf_requirements, nsprtype):
+        # boolean array whose entry cnode_id-1 tells whether is_vnf_placeable(vnf_requirements, cnode_id, nsprtype) holds
+        resources = numpy.array([[self.infrastructure_to_manage.nodes["s"+str(cnode_id)]["cpu"], self.infrastructure_to_manage.nodes["s"+str(cnode_id)]["ram"], self.infrastructure_to_manage.nodes["s"+str(cnode_id)]["stor"]] for cnode_id in range(1,self.number_of_computing_nodes+1)]).reshape(-1,3)
+        if nsprtype == 'hard':
+            return numpy.all(resources >= numpy.asarray(vnf_requirements[:3]), axis=1)
+        elif nsprtype == 'soft':
+            return numpy.all(resources > 0, axis=1)
+
+    def reachable_cnodes(self, cnode_name, bandwidth, nsprtype):
+        # boolean array whose entry cnode_id-1 tells whether found_a_valid_path_between(cnode_name, "s"+str(cnode_id), bandwidth, nsprtype) would find a path
+        # (one BFS from cnode_name instead of one search per cnode ; entry of cnode_name itself is True)
+        visited = {cnode_name}
+        queue = deque([cnode_name])
+        while len(queue) != 0:
+            node_name = queue.popleft()
+            for neighbor in networkx.neighbors(self.infrastructure_to_manage,node_name):
+                if neighbor not in visited:
+                    if (nsprtype == 'hard' and self.infrastructure_to_manage[node_name][neighbor]["bw"]>=bandwidth) or \
+                    (nsprtype == 'soft' and self.infrastructure_to_manage[node_name][neighbor]["bw"]>0):
+                        visited.add(neighbor)
+                        queue.append(neighbor)
+        return numpy.array(["s"+str(cnode_id) in visited for cnode_id in range(1,self.number_of_computing_nodes+1)])
+
     def place_vnf(self, vnf_requirements, cnode_id):
         # simulate a VNF placement on cnode_id by allocating resources and returns unsatisfied resources
         #---cpu---
@@ -59,12 +107,14 @@ class InfrastructureManager:
         #---stor---
         allocated_stor = min(self.infrastructure_to_manage.nodes["s"+str(cnode_id)]["stor"], vnf_requirements[2])
         self.infrastructure_to_manage.nodes["s"+str(cnode_id)]["stor"] -= allocated_stor
+        self.refresh_cnode_resources(cnode_id)
         return [allocated_cpu, allocated_ram, allocated_stor]
 
     def remove_vnf(self, vnf_requirements, cnode_name):
         self.infrastructure_to_manage.nodes[cnode_name]["cpu"] += vnf_requirements[0]
         self.infrastructure_to_manage.nodes[cnode_name]["ram"] += vnf_requirements[1]
         self.infrastructure_to_manage.nodes[cnode_name]["stor"] += vnf_requirements[2]
+        self.refresh_cnode_resources(int(cnode_name[1:]))
 
     def minimum_bandwidth_of_path(self, path):
         minimum_bandwidth = self.infrastructure_to_manage[path[0]][path[1]]["bw"]
@@ -74,39 +124,38 @@ class InfrastructureManager:
                 minimum_bandwidth = segment_bandwith
         return minimum_bandwidth
     def found_a_valid_path_between(self, cnode_id1, cnode_id2, bandwidth, nsprtype):
-        # mBFS : return a list of the nodes in the path if path found, otherwise return None along with guaranteed bandwidth
+        # BFS with parent pointers : return a list of the nodes in the first shortest-hop path found, otherwise return None
+        # (a node is enqueued once, when first discovered, so the path is the one a BFS over whole paths would reach first)
         assert cnode_id1 != cnode_id2
-        paths = []
-        path = None
-        neighbors = []
-        node_name = cnode_id1
-        paths.append([cnode_id1])
-        while len(paths) != 0:
-            path = paths.pop(0)
-            node_name = path[-1]
-            if node_name == cnode_id2:
-                return path
+        parents = {cnode_id1: None}
+        queue = deque([cnode_id1])
+        while len(queue) != 0 and cnode_id2 not in parents:
+            node_name = queue.popleft()
             for neighbor in networkx.neighbors(self.infrastructure_to_manage,node_name):
-                if nsprtype == 'hard':
-                    if neighbor not in path and self.infrastructure_to_manage[node_name][neighbor]["bw"]>=bandwidth:
-                        neighbors.append(neighbor)
-                elif nsprtype == 'soft':
-                    if neighbor not in path and self.infrastructure_to_manage[node_name][neighbor]["bw"]>0:
-                        neighbors.append(neighbor)
-            for neighbor in neighbors:
-                paths.append(path+[neighbor])
-            del neighbors[:]
-        return None
+                if neighbor not in parents:
+                    if (nsprtype == 'hard' and self.infrastructure_to_manage[node_name][neighbor]["bw"]>=bandwidth) or \
+                    (nsprtype == 'soft' and self.infrastructure_to_manage[node_name][neighbor]["bw"]>0):
+                        parents[neighbor] = node_name
+                        queue.append(neighbor)
+        if cnode_id2 not in parents:
+            return None
+        path = [cnode_id2]
+        while parents[path[-1]] is not None:
+            path.append(parents[path[-1]])
+        path.reverse()
+        return path
 
     def allocate_path(self, found_path, bandwidth):
         bandwidth_allocated = min(bandwidth, self.minimum_bandwidth_of_path(found_path))
         for i in range(len(found_path)-1):
             self.infrastructure_to_manage[found_path[i]][found_path[i+1]]["bw"] -= bandwidth_allocated
+        self.refresh_path_bandwidths(found_path)
         return bandwidth_allocated # satisfied bandwidth
 
     def deallocate_path(self, found_path, bandwidth):
         for i in range(len(found_path)-1):
             self.infrastructure_to_manage[found_path[i]][found_path[i+1]]["bw"] += bandwidth
+        self.refresh_path_bandwidths(found_path)
     
     def deallocate_whole_nspr(self, nspr):
         # vnfs_requirements = nspr.describe_vnfs() # vnfs_requirements is a list of [CPU,RAM,STORAGE,BANDWIDTH] per VNF
@@ -121,4 +170,5 @@ class InfrastructureManager:
     def reset(self):
         self.infrastructure_generator.reset()
         self.infrastructure_to_manage = self.infrastructure_generator.generate() # infrastructure_to_manage is a NetworkX-like graph
-        self.number_of_computing_nodes = len([cnode for cnode in self.infrastructure_to_manage.nodes.data("cpu") if cnode[1] is not None])
\ No newline at end of file
+        self.number_of_computing_nodes = len([cnode for cnode in self.infrastructure_to_manage.nodes.data("cpu") if cnode[1] is not None])
+        self.build_observation()
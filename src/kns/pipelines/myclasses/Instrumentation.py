@@ -0,0 +1,89 @@
+import os
+import time
+import pstats
+import cProfile
+import functools
+from collections import defaultdict
+
+class PhaseTimers:
+    # cumulative wall time and number of calls of every instrumented phase of the training loop
+    # phases are instrumented by wrapping methods of the objects themselves (instance attributes shadowing the class methods),
+    # so nothing is wrapped, and nothing costs, when instrumentation is disabled
+    def __init__(self) -> None:
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.start = time.perf_counter()
+        self.reports = [] # reports taken along training
+
+    def timed(self, phase, function):
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[phase] += time.perf_counter() - start
+                self.calls[phase] += 1
+        return timed_function
+
+    def instrument(self, obj, method_name, phase):
+        # obj.method_name is timed as phase from now on (calls made through self.method_name inside obj included)
+        setattr(obj, method_name, self.timed(phase, getattr(obj, method_name)))
+
+    def report(self, episode, env_steps, updates):
+        # snapshot of the cumulative timers : per phase seconds, calls, mean call duration and share of wall time (nested phases overlap),
+        # plus env steps and updates per second of wall time ; it is kept in self.reports and returned
+        elapsed = time.perf_counter() - self.start
+        phases = {phase: {"seconds": seconds, "calls": self.calls[phase], "mean_us": 1e6 * seconds / max(self.calls[phase], 1), "share": seconds / elapsed}
+                  for phase, seconds in sorted(self.seconds.items(), key=lambda item: -item[1])}
+        report = {"episode": episode, "elapsed_seconds": elapsed, "env_steps": env_steps, "updates": updates,
+                  "env_steps_per_second": env_steps / elapsed, "updates_per_second": updates / elapsed, "phases": phases}
+        self.reports.append(report)
+        return report
+
+    @staticmethod
+    def summary(report):
+        # one line description of a report for the logs
+        phases = ", ".join(f"{phase} {values['seconds']:.1f}s ({100*values['share']:.0f}%)" for phase, values in report["phases"].items())
+        return f"episode {report['episode']}: {report['env_steps_per_second']:.0f} env steps/s, {report['updates_per_second']:.1f} updates/s | {phases}"
+
+
+class EpisodeProfiler:
+    # captures a cProfile or torch.profiler profile of training episodes first_episode..last_episode (both included)
+    # cProfile stats are written to output_file+".prof" (sorted cumulative listing in output_file+".txt"), torch ones to output_file+".json" (chrome trace)
+    def __init__(self, tool, first_episode, last_episode, output_file) -> None:
+        assert tool in ['cprofile','torch'] and 1 <= first_episode <= last_episode
+        self.tool = tool
+        self.first_episode = first_episode
+        self.last_episode = last_episode
+        self.output_file = output_file
+        self.profiler = None
+
+    def episode_started(self, episode):
+        if episode == self.first_episode:
+            if self.tool == 'cprofile':
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+            elif self.tool == 'torch':
+                import torch.profiler
+                self.profiler = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=False)
+                self.profiler.start()
+
+    def episode_finished(self, episode):
+        if episode == self.last_episode:
+            self.stop()
+
+    def stop(self):
+        # ends the capture (training may end before last_episode) and writes the profile
+        if self.profiler is None:
+            return
+        os.makedirs(os.path.dirname(self.output_file) or ".", exist_ok=True)
+        if self.tool == 'cprofile':
+            self.profiler.disable()
+            self.profiler.dump_stats(self.output_file+".prof")
+            with open(self.output_file+".txt", "w") as file:
+                pstats.Stats(self.profiler, stream=file).sort_stats("cumulative").print_stats(50)
+        elif self.tool == 'torch':
+            self.profiler.stop()
+            self.profiler.export_chrome_trace(self.output_file+".json")
+        self.profiler = None
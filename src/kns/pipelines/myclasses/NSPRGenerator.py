@@ -1,16 +1,39 @@
 import numpy
-import networkx
+from collections import deque
+from kns.pipelines.myclasses.ArrivalProcesses import ARRIVAL_PROCESSES
 
 class NSPR:
-    def __init__(self, id, priority, duration, nsprtype) -> None:
-        self.nspr = networkx.DiGraph(name=id)
+    # a chain of VNFs vnf1..vnfN where virtual link (vnf_id-1;vnf_id) carries the bandwidth requirement of vnf_id
+    # VNFs are stored in arrays indexed by vnf_id-1 instead of a networkx graph (compact in memory, no string-keyed lookups):
+    # requirements[i] is CPU,RAM,STORAGE,BANDWIDTH (0.0 for vnf1), placements[i] the cnode id hosting vnf i+1 (0 when not placed),
+    # satisfied_resources[i] and satisfied_bw[i] what was allocated to it (NaN when not set) and matchings[i] its physical path
+    __slots__ = ("id", "priority", "duration", "remaining_duration", "nsprtype", "status_chain",
+                 "number_of_vnfs", "requirements", "placements", "satisfied_resources", "satisfied_bw", "matchings")
+
+    def __init__(self, id, priority, duration, nsprtype, vnfs_requirements=None) -> None:
+        # vnfs_requirements optionally gives the VNFs at once as an (n_vnfs x 4) array (same rows as describe_vnfs)
+        self.id = id
         self.priority = priority
         assert duration > 0
         self.duration = duration # integer greater than 0 initially
         self.remaining_duration = self.duration
         self.nsprtype = nsprtype # 'hard' or 'soft' requirements
         self.status_chain = ""
-    
+        requirements = numpy.zeros((0,4)) if vnfs_requirements is None else numpy.array(vnfs_requirements, dtype=numpy.float64).reshape(-1,4)
+        self.number_of_vnfs = len(requirements)
+        if self.number_of_vnfs > 0:
+            requirements[0,3] = 0.0
+        self.allocate(requirements, max(self.number_of_vnfs, 1))
+
+    def allocate(self, requirements, capacity):
+        # (re)allocates per-VNF arrays for capacity VNFs keeping the first number_of_vnfs entries of requirements
+        self.requirements = numpy.zeros((capacity,4))
+        self.requirements[:self.number_of_vnfs] = requirements[:self.number_of_vnfs]
+        self.placements = numpy.zeros(capacity, dtype=numpy.int64)
+        self.satisfied_resources = numpy.full((capacity,3), numpy.nan)
+        self.satisfied_bw = numpy.full(capacity, numpy.nan)
+        self.matchings = [None] * capacity
+
     def update_status_chain(self, new_status):
         if self.status_chain == "": self.status_chain += new_status
         else: self.status_chain += "-"+new_status
@@ -19,7 +42,7 @@ class NSPR:
         return self.status_chain
 
     def get_id(self):
-        return self.nspr.name
+        return self.id
     
     def get_priority(self):
         return self.priority
@@ -44,63 +67,64 @@ class NSPR:
             return False
     
     def add_vnf(self, rq_cpu, rq_ram, rq_stor, rq_bw):
-        number_of_vnfs = len(self.nspr)
-        if number_of_vnfs == 0:
-            self.nspr.add_node("vnf1", rq_cpu=rq_cpu, rq_ram=rq_ram, rq_stor=rq_stor, placement=None, satisf_res=None)
-        else:
-            self.nspr.add_node("vnf"+str(number_of_vnfs+1), rq_cpu=rq_cpu, rq_ram=rq_ram, rq_stor=rq_stor, placement=None, satisf_res=None)
-            self.nspr.add_edge("vnf"+str(number_of_vnfs), "vnf"+str(number_of_vnfs+1), rq_bw=rq_bw, matching=None, satisf_bw=None)
+        # rq_bw is ignored for the first VNF (no virtual link precedes it)
+        assert not self.placements.any(), "VNFs can't be added once placements started"
+        if self.number_of_vnfs == len(self.requirements): # grow capacity geometrically
+            self.allocate(self.requirements, 2*len(self.requirements))
+        self.requirements[self.number_of_vnfs] = (rq_cpu, rq_ram, rq_stor, rq_bw if self.number_of_vnfs > 0 else 0.0)
+        self.number_of_vnfs += 1
     
     def n_vnfs(self):
-        return len(self.nspr)
+        return self.number_of_vnfs
     
     def describe_vnfs(self):
-        all_descriptions = []
-        for i in range(1,len(self.nspr)+1):
-            vnf_desc = []
-            vnf_desc.append(self.nspr.nodes["vnf"+str(i)]["rq_cpu"])
-            vnf_desc.append(self.nspr.nodes["vnf"+str(i)]["rq_ram"])
-            vnf_desc.append(self.nspr.nodes["vnf"+str(i)]["rq_stor"])
-            if i == 1: vnf_desc.append(0.0)
-            else: vnf_desc.append(self.nspr["vnf"+str(i-1)]["vnf"+str(i)]["rq_bw"])
-            #---------------
-            all_descriptions.append(vnf_desc)
-        return all_descriptions
+        # list of [CPU,RAM,STORAGE,BANDWIDTH] per VNF
+        return self.requirements[:self.number_of_vnfs].tolist()
     
     def set_placement(self, vnf_id, cnode_id):
-        self.nspr.nodes["vnf"+str(vnf_id)]["placement"] = "s"+str(cnode_id)
+        self.placements[vnf_id-1] = cnode_id
     
     def get_placement(self, vnf_id):
-        return self.nspr.nodes["vnf"+str(vnf_id)]["placement"]
+        # name of the cnode hosting vnf_id ("s"+cnode id), None if not placed
+        cnode_id = self.placements[vnf_id-1]
+        return "s"+str(cnode_id) if cnode_id > 0 else None
+
+    def get_placement_id(self, vnf_id):
+        # id of the cnode hosting vnf_id, 0 if not placed
+        return int(self.placements[vnf_id-1])
     
     def set_satisfied_resources(self, vnf_id, cpu_ram_stor):
         # set amounts of satisfied cpu,ram,storage relative to the total amounts required
-        self.nspr.nodes["vnf"+str(vnf_id)]["satisf_res"] = cpu_ram_stor
+        self.satisfied_resources[vnf_id-1] = cpu_ram_stor
 
     def get_satisfied_resources(self, vnf_id):
         # returns amounts of satisfied cpu,ram,storage relative to the total amounts required
-        return self.nspr.nodes["vnf"+str(vnf_id)]["satisf_res"]
+        if numpy.isnan(self.satisfied_resources[vnf_id-1,0]):
+            return None
+        return self.satisfied_resources[vnf_id-1].tolist()
     
     def set_satisfied_bw(self, vnf_id, bandwidth):
         # set amount of satisfied bandwidth relative to the total amount required
         assert vnf_id >= 1
         # will match virtual link (vnf_id-1;vnf_id) to matching
         if vnf_id > 1:
-            self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["satisf_bw"] = bandwidth
+            self.satisfied_bw[vnf_id-1] = bandwidth
     
     def get_satisfied_bw(self, vnf_id):
         assert vnf_id >= 1
         # returns amount of satisfied bandwidth relative to the total amount required
         if vnf_id == 1:
             return "NoNeed"
+        elif numpy.isnan(self.satisfied_bw[vnf_id-1]):
+            return None
         else:
-            return self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["satisf_bw"]
+            return self.satisfied_bw[vnf_id-1].item()
     
     def set_matching(self, vnf_id, physical_path):
         assert vnf_id >= 1
         # will match virtual link (vnf_id-1;vnf_id) to physical_path
         if vnf_id > 1:
-            self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["matching"] = physical_path
+            self.matchings[vnf_id-1] = physical_path
     
     def get_matching(self, vnf_id):
         assert vnf_id >= 1
@@ -108,23 +132,28 @@ class NSPR:
         if vnf_id == 1:
             return "NoNeed"
         else:
-            return self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["matching"]
+            return self.matchings[vnf_id-1]
+
+    def number_of_placed_vnfs(self):
+        # VNFs are placed in order: vnf1..vnfK are placed, K being the returned value
+        unplaced = numpy.flatnonzero(self.placements[:self.number_of_vnfs] == 0)
+        return int(unplaced[0]) if len(unplaced) > 0 else self.number_of_vnfs
     
     def unset_placements_and_matchings(self):
-        for vnf_id in range(1,len(self.nspr)+1):
-            if self.nspr.nodes["vnf"+str(vnf_id)]["placement"] is not None:
-                self.nspr.nodes["vnf"+str(vnf_id)]["placement"] = None
-                self.nspr.nodes["vnf"+str(vnf_id)]["satisf_res"] = None
-                if vnf_id > 1:
-                    self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["matching"] = None
-                    self.nspr["vnf"+str(vnf_id-1)]["vnf"+str(vnf_id)]["satisf_bw"] = None
-            else:
-                break
+        n_placed = self.number_of_placed_vnfs()
+        self.placements[:n_placed] = 0
+        self.satisfied_resources[:n_placed] = numpy.nan
+        self.satisfied_bw[:n_placed] = numpy.nan
+        self.matchings[:n_placed] = [None] * n_placed
 
 
 class NSPRGenerator:
     def __init__(self, parameters) -> None:
-        # generation_law should be a function that generates an integer (number of nspr to be generated)
+        # every random draw (batch sizes included) comes from numpy_gen, seeded by train_seed or eval_seed
+        # batches are drawn pregenerated_batches at a time in one vectorized draw (see pregenerate) ; every batch takes the same number
+        # of draws from numpy_gen whatever its size, so the workload doesn't depend on pregenerated_batches, only the speed does
+        # batches arrive at the times of an arrival process (arrivals.process in ARRIVAL_PROCESSES, its other keys are its parameters)
+        # whose draws come from a separate stream of the same seed, so that the NSPRs drawn don't depend on it
         #-------------------------------------------------------------------------------------------------
         assert parameters["is_for_train"] in [True,False]
         self.is_for_train = parameters["is_for_train"]
@@ -149,31 +178,52 @@ class NSPRGenerator:
         self.max_duration = parameters["max_duration"] ; assert isinstance(self.max_duration, int)
         self.possible_priorities = parameters["priorities"]
         self.possible_nsprtypes = parameters["nspr_types"]
-        self.generation_law = lambda : numpy.random.randint(low=parameters["min_batch_nsprs"], high=parameters["max_batch_nsprs"]+1)
+        self.min_batch_nsprs = parameters["min_batch_nsprs"] ; assert isinstance(self.min_batch_nsprs, int)
+        self.max_batch_nsprs = parameters["max_batch_nsprs"] ; assert isinstance(self.max_batch_nsprs, int)
+        self.pregenerated_batches = parameters["pregenerated_batches"] ; assert self.pregenerated_batches >= 1
         self.id_counter = 1
-    
+        self.batches = deque() # batches drawn ahead of time, handed out in order by generate
+        arrivals = dict(parameters["arrivals"])
+        self.arrival_process = ARRIVAL_PROCESSES[arrivals.pop("process")](**arrivals)
+        self.arrival_process.reset(numpy.random.default_rng((self.current_seed, 1)))
+    
+    def pregenerate(self, n_batches):
+        # draws n_batches batches of NSPRs at once and queues them after those already pregenerated
+        # a batch takes 1 + max_batch_nsprs*(4 + 4*max_vnfs) uniform draws (its size, then per NSPR priority, duration, type, number of VNFs
+        # and the VNFs requirements), those of NSPRs or VNFs it doesn't have are dropped : the chunk is drawn in one call, and batch b reads
+        # the same draws whether it's drawn alone or in a chunk
+        uniforms = self.numpy_gen.random((n_batches, 1 + self.max_batch_nsprs*(4 + 4*self.max_vnfs)))
+        batch_sizes = (self.min_batch_nsprs + uniforms[:,0] * (self.max_batch_nsprs-self.min_batch_nsprs+1)).astype(numpy.int64).tolist()
+        nsprs_uniforms = uniforms[:,1:].reshape(n_batches, self.max_batch_nsprs, 4 + 4*self.max_vnfs)
+        fields = (numpy.array([0, self.min_duration, 0, self.min_vnfs]) + nsprs_uniforms[:,:,:4] * numpy.array(
+            [len(self.possible_priorities), self.max_duration-self.min_duration+1, len(self.possible_nsprtypes), self.max_vnfs-self.min_vnfs+1])).astype(numpy.int64).tolist()
+        # CPU,RAM,STORAGE,BANDWIDTH per VNF (the bandwidth drawn for the first VNF is unused)
+        low = numpy.array([self.rq_min_cpu, self.rq_min_ram, self.rq_min_stor, self.rq_min_bw])
+        high = numpy.array([self.rq_max_cpu, self.rq_max_ram, self.rq_max_stor, self.rq_max_bw])
+        requirements = low + (high-low) * nsprs_uniforms[:,:,4:].reshape(n_batches, self.max_batch_nsprs, self.max_vnfs, 4)
+        for b, batch_size in enumerate(batch_sizes):
+            batch = []
+            for i in range(batch_size):
+                priority, duration, nsprtype, n_vnfs = fields[b][i]
+                batch.append(NSPR(id="NSPR"+str(self.id_counter), priority=self.possible_priorities[priority], duration=duration,
+                                  nsprtype=self.possible_nsprtypes[nsprtype], vnfs_requirements=requirements[b,i,:n_vnfs]))
+                self.id_counter += 1
+            self.batches.append(batch)
+
     def generate(self):
-        nsprs = []
-        number_of_nsprs = self.generation_law() #TODO correct this as to make it being managed by the class itself based on user instruction
-        assert isinstance(number_of_nsprs, int)
-        for _ in range(number_of_nsprs):
-            # create nspr
-            nspr = NSPR(id="NSPR"+str(self.id_counter), priority=self.numpy_gen.choice(self.possible_priorities), duration=self.numpy_gen.integers(self.min_duration,self.max_duration+1), nsprtype=self.numpy_gen.choice(self.possible_nsprtypes))
-            # determine number of vnfs in nspr
-            n_vnfs = self.numpy_gen.integers(low=self.min_vnfs, high=self.max_vnfs+1)
-            # create nspr's vnfs
-            for _ in range(n_vnfs):
-                nspr.add_vnf(rq_cpu=self.numpy_gen.uniform(self.rq_min_cpu,self.rq_max_cpu),
-                             rq_ram=self.numpy_gen.uniform(self.rq_min_ram,self.rq_max_ram),
-                             rq_stor=self.numpy_gen.uniform(self.rq_min_stor,self.rq_max_stor),
-                             rq_bw=self.numpy_gen.uniform(self.rq_min_bw,self.rq_max_bw))
-                pass
-            nsprs.append(nspr)
-            self.id_counter += 1
-        return nsprs
+        # returns the next batch (list) of NSPRs
+        if len(self.batches) == 0:
+            self.pregenerate(self.pregenerated_batches)
+        return self.batches.popleft()
+
+    def next_arrival(self):
+        # returns the arrival time of the next batch of NSPRs and this batch
+        return self.arrival_process.next_arrival_time(), self.generate()
     
     def reset(self):
         if self.is_for_train:
             self.current_seed += 1
         self.numpy_gen = numpy.random.default_rng(self.current_seed)
-        self.id_counter = 1
\ No newline at end of file
+        self.id_counter = 1
+        self.batches.clear()
+        self.arrival_process.reset(numpy.random.default_rng((self.current_seed, 1)))
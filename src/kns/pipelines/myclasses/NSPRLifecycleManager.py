@@ -1,9 +1,12 @@
-import copy
+import heapq
 
 class NSPRLifecycleManager:
     def __init__(self) -> None:
         self.nsprs_waiting = [] # contains nsprs waiting to be processed
-        self.nsprs_running = [] # contains currently deployed (running) nsprs
+        self.nsprs_running = {} # contains currently deployed (running) nsprs keyed by admission number (in admission order)
+        self.running_expiries = [] # min-heap of (end time, admission number) of running nsprs
+        self.admissions = 0 # number of nsprs admitted to running since last reset
+        self.clock = 0 # number of simulation clock ticks since last reset
         self.nsprs_terminated_after_running = [] # contains nsprs terminated successfully after their deployment duration satisfied
         self.nsprs_terminated_after_fail = [] # contains nsprs which were not deployable
         self.nsprs_delayed = [] # contains nsprs which were delayed for re-processing in next time slot
@@ -23,15 +26,14 @@ class NSPRLifecycleManager:
                 if nspr_selector is None: # FIFO based selection
                     self.nsprs_waiting[0][0].update_status_chain("processing")
                     return self.nsprs_waiting[0].pop(0)
-                else: # ALLOCABILITY+FLEXIBILITY based selection                    
-                    slice_id,selected_nspr = nspr_selector.choose_best_slice(copy.deepcopy(self.nsprs_waiting[0]))
-                    # print(f"id : {slice_id}")
+                else: # ALLOCABILITY+FLEXIBILITY based selection (the selector only reads the waiting batch)
+                    slice_id,selected_nspr = nspr_selector.choose_best_slice(self.nsprs_waiting[0])
                     selected_nspr.update_status_chain("processing")
                     self.nsprs_waiting[0].pop(slice_id)
                     return selected_nspr
             else: # batch self.nsprs_waiting[0] has 0 remaining nspr and should be removed
                 self.nsprs_waiting.pop(0)
-                self.retrieve_a_waiting_nspr(nspr_selector)
+                return self.retrieve_a_waiting_nspr(nspr_selector)
         else:
             return None
     
@@ -42,24 +44,31 @@ class NSPRLifecycleManager:
         self.nsprs_delayed.append(nspr)
 
     def add_to_running_nsprs(self, nspr):
+        # the nspr will run for its remaining duration from the current clock time
         nspr.update_status_chain("running")
-        self.nsprs_running.append(nspr)
+        self.nsprs_running[self.admissions] = nspr
+        heapq.heappush(self.running_expiries, (self.clock + nspr.remaining_duration, self.admissions))
+        self.admissions += 1
 
-    def decrement_running_nsprs_durations(self, keep_terminated_nsprs_information):
-        # will decrement the remaining duration of each NSPR in running nsprs list then those having a remaining duration of 0 will be moved to nsprs_terminated_after_running and removed from running list
-        # also return moved NSPRs (they are required for restoring they resources)
+    def advance_clock_to(self, time):
+        # moves running nsprs whose end time is reached (by time) to nsprs_terminated_after_running and returns them, in end time order
+        # (they are required for restoring their resources) ; costs O(number of expired nsprs * log(number of running nsprs))
+        # remaining durations are not decremented tick by tick : they are only set to 0 when nsprs expire
+        assert time >= self.clock
+        self.clock = time
         nsprs_to_deallocate = []
-        for nspr in self.nsprs_running:
-            nspr.decrement_remaining_duration()
-            if nspr.can_continue_running() == False:
-                if not keep_terminated_nsprs_information:
-                    nspr.unset_placements_and_matchings() # delete placements and matchings information
-                nsprs_to_deallocate.append( copy.deepcopy(nspr) )
-                nspr.update_status_chain("successTerminate")
-                self.nsprs_terminated_after_running.append( copy.deepcopy(nspr) )
-                self.nsprs_running.remove(nspr)
+        while len(self.running_expiries) > 0 and self.running_expiries[0][0] <= time:
+            _, admission = heapq.heappop(self.running_expiries)
+            nspr = self.nsprs_running.pop(admission)
+            nspr.remaining_duration = 0
+            nspr.update_status_chain("successTerminate")
+            self.nsprs_terminated_after_running.append(nspr)
+            nsprs_to_deallocate.append(nspr)
         return nsprs_to_deallocate
 
+    def advance_clock(self, ticks=1):
+        return self.advance_clock_to(self.clock + ticks)
+
     def add_to_terminated_nsprs_after_fail(self, nspr):
         nspr.update_status_chain("failTerminate")
         self.nsprs_terminated_after_fail.append(nspr)
@@ -78,7 +87,10 @@ class NSPRLifecycleManager:
     
     def reset(self):
         self.nsprs_waiting = []
-        self.nsprs_running = []
+        self.nsprs_running = {}
+        self.running_expiries = []
+        self.admissions = 0
+        self.clock = 0
         self.nsprs_terminated_after_running = []
         self.nsprs_terminated_after_fail = []
         self.nsprs_delayed = []
@@ -0,0 +1,36 @@
+import numpy
+
+class NSPRSelector:
+    # ALLOCABILITY+FLEXIBILITY based selection of the next waiting NSPR to process, scored against the current free resources of the infrastructure
+    # allocability : share of the NSPR total CPU,RAM,STORAGE,BANDWIDTH demand covered by the free resources of all cnodes (the scarcest resource decides, in [0,1])
+    # flexibility : share of cnodes able to host a VNF of the NSPR, averaged over its VNFs (the more alternatives, the easier to place, in [0,1])
+    # the batch is only read : neither the NSPRs nor the infrastructure observation are copied or modified
+    def __init__(self, infrastructure_manager, allocability_weight=1.0, flexibility_weight=1.0) -> None:
+        self.infrastructure_manager = infrastructure_manager
+        self.allocability_weight = allocability_weight
+        self.flexibility_weight = flexibility_weight
+
+    def scores(self, batch):
+        # returns the score of every NSPR of batch, computed in one pass over a (n_nsprs, max_vnfs) stack of their requirements
+        cnodes = self.infrastructure_manager.describe().reshape(-1,4) # CPU,RAM,STORAGE,BANDWIDTH of every cnode (view)
+        n_vnfs = numpy.array([nspr.n_vnfs() for nspr in batch])
+        requirements = numpy.zeros((len(batch), n_vnfs.max(initial=1), 4))
+        for i, nspr in enumerate(batch):
+            requirements[i,:n_vnfs[i]] = nspr.requirements[:n_vnfs[i]]
+        vnfs = numpy.arange(requirements.shape[1]) < n_vnfs[:,None] # (n_nsprs, max_vnfs) mask of actual VNFs
+        #---allocability---
+        free = cnodes.sum(axis=0, dtype=numpy.float64)
+        demand = requirements.sum(axis=1)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            allocability = numpy.where(demand > 0, numpy.minimum(free / demand, 1.0), 1.0).min(axis=1)
+        #---flexibility---
+        hosting_cnodes = numpy.all(cnodes[None,None,:,:3] >= requirements[:,:,None,:3], axis=3).mean(axis=2) # hard NSPRs : cnodes covering the VNF requirements
+        soft = numpy.array([nspr.get_nspr_type() == 'soft' for nspr in batch])
+        hosting_cnodes[soft] = numpy.all(cnodes[:,:3] > 0, axis=1).mean() # soft NSPRs : any cnode with free resources
+        flexibility = (hosting_cnodes * vnfs).sum(axis=1) / numpy.maximum(n_vnfs, 1)
+        return self.allocability_weight * allocability + self.flexibility_weight * flexibility
+
+    def choose_best_slice(self, batch):
+        # returns the index in batch of the best scored NSPR (the earliest one on ties) and this NSPR
+        slice_id = int(numpy.argmax(self.scores(batch)))
+        return slice_id, batch[slice_id]
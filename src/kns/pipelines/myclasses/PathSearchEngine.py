@@ -0,0 +1,73 @@
+import numpy
+
+class PathSearchEngine:
+    # shortest-hop path search over an integer-indexed infrastructure given as a CSR adjacency:
+    # neighbors[indptr[node]:indptr[node+1]] are the neighbors of node and neighbor_edges[...] the ids of the corresponding links
+    # searches are BFS with parent pointers, a preallocated queue and a visited bitmap (O(V+E), no path copies) ; neighbors are scanned
+    # in the given order so the returned path is the one the list-of-paths mBFS would have returned (first shortest-hop path in BFS order)
+    def __init__(self, indptr, neighbors, neighbor_edges) -> None:
+        # plain Python lists : element access is much cheaper than on NumPy arrays inside the BFS loop
+        self.indptr = [int(position) for position in indptr]
+        self.neighbors = [int(neighbor) for neighbor in neighbors]
+        self.neighbor_edges = [int(edge_id) for edge_id in neighbor_edges]
+        self.number_of_nodes = len(self.indptr) - 1
+        #---search buffers reused by every search---
+        self.parents = [-1] * self.number_of_nodes
+        self.queue = [0] * self.number_of_nodes
+        self.visited = bytearray(self.number_of_nodes)
+
+    @staticmethod
+    def usable_edges(edge_bandwidths, bandwidth, nsprtype):
+        # one byte per link, non-zero if the link can carry the virtual link (enough bandwidth for 'hard' NSPRs, any bandwidth left for 'soft' ones)
+        if nsprtype == 'hard':
+            return (edge_bandwidths >= bandwidth).tobytes()
+        elif nsprtype == 'soft':
+            return (edge_bandwidths > 0).tobytes()
+
+    def breadth_first_search(self, source, usable_edges, target=-1):
+        # fills self.queue[:returned value] with the nodes reached from source (in discovery order) and self.parents for them
+        # stops as soon as target is discovered
+        indptr, neighbors, neighbor_edges = self.indptr, self.neighbors, self.neighbor_edges
+        parents, queue, visited = self.parents, self.queue, self.visited
+        visited[source] = 1
+        queue[0] = source
+        head, tail = 0, 1
+        while head < tail:
+            node = queue[head]
+            head += 1
+            for position in range(indptr[node], indptr[node+1]):
+                neighbor = neighbors[position]
+                if not visited[neighbor] and usable_edges[neighbor_edges[position]]:
+                    visited[neighbor] = 1
+                    parents[neighbor] = node
+                    queue[tail] = neighbor
+                    tail += 1
+                    if neighbor == target:
+                        return tail
+        return tail
+
+    def clear(self, n_reached):
+        for position in range(n_reached):
+            self.visited[self.queue[position]] = 0
+
+    def find_path(self, source, target, usable_edges):
+        # returns the list of node indexes of the first shortest-hop path from source to target using only usable links, None if there is none
+        assert source != target
+        n_reached = self.breadth_first_search(source, usable_edges, target)
+        found = self.visited[target]
+        self.clear(n_reached)
+        if not found:
+            return None
+        path = [target]
+        while path[-1] != source:
+            path.append(self.parents[path[-1]])
+        path.reverse()
+        return path
+
+    def reachable(self, source, usable_edges):
+        # boolean array telling which nodes can be reached from source using only usable links (source included)
+        n_reached = self.breadth_first_search(source, usable_edges)
+        reached = numpy.zeros(self.number_of_nodes, dtype=bool)
+        reached[self.queue[:n_reached]] = True
+        self.clear(n_reached)
+        return reached
@@ -0,0 +1,11 @@
+import collections
+import functools
+from pfrl.replay_buffers import PrioritizedReplayBuffer
+
+
+class PicklablePrioritizedReplayBuffer(PrioritizedReplayBuffer):
+    # pfrl PrioritizedReplayBuffer whose n-step queues are built by a partial instead of a local lambda, so that agents holding it
+    # can be pickled (e.g. by Kedro's ParallelRunner) ; storage, sampling and updates are pfrl's
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.last_n_transitions = collections.defaultdict(functools.partial(collections.deque, [], maxlen=self.num_steps))
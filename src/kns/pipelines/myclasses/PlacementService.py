@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import queue
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy
+import torch
+from kns.pipelines.myclasses.ActionSelection import masked_greedy_actions
+from kns.pipelines.myclasses.DDQN import float32_observations
+from kns.pipelines.myclasses.NSPRGenerator import NSPR
+from kns.pipelines.myclasses.QFunctionExport import ExportedQFunction
+
+
+def vnfs_requirements(vnfs):
+    # (n_vnfs x 4) requirements of a JSON-like list of [cpu, ram, storage, bandwidth] rows, ValueError when it isn't one
+    if not isinstance(vnfs, list) or len(vnfs) == 0:
+        raise ValueError("vnfs must be a non-empty list of [cpu, ram, storage, bandwidth] rows")
+    for vnf in vnfs:
+        if not isinstance(vnf, list) or len(vnf) != 4 or any(isinstance(value, bool) or not isinstance(value, (int, float)) for value in vnf):
+            raise ValueError(f"invalid VNF requirements {vnf!r} (expected 4 numbers)")
+    requirements = numpy.array(vnfs, dtype=numpy.float64)
+    if not numpy.isfinite(requirements).all() or (requirements < 0).any():
+        raise ValueError("VNF requirements must be finite and non-negative")
+    return requirements
+
+
+def non_negative_number(payload, key, default=None):
+    # payload[key] (or default when missing) if it is a finite non-negative number, ValueError otherwise
+    value = payload.get(key, default)
+    if value is None or isinstance(value, bool) or not isinstance(value, (int, float)) or not numpy.isfinite(value) or value < 0:
+        raise ValueError(f"{key} must be a non-negative number (got {value!r})")
+    return value
+
+
+def load_q_function(model, agent_directory="myagent"):
+    # loads the weights saved by DDQN.save (agent_directory/model.pt) into model and returns it in eval mode
+    model.load_state_dict(torch.load(os.path.join(agent_directory, "model.pt"), map_location="cpu"))
+    return model.eval()
+
+
+class PlacementRequest:
+    __slots__ = ("nspr", "arrival_time", "future", "submitted")
+
+    def __init__(self, nspr, arrival_time) -> None:
+        self.nspr = nspr
+        self.arrival_time = arrival_time
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class PlacementService:
+    # places incoming NSPRs with a trained Q-function (or its ExportedQFunction) on the live infrastructure of environment (an Environment whose generator is unused)
+    # requests are queued and a serving thread gathers them into micro-batches (up to max_batch_size requests, waiting at most max_wait
+    # seconds after the first one) ; a batch is placed VNF by VNF in rounds : one forward pass scores the next VNF of every NSPR still
+    # being placed, then the chosen cnodes are committed in request order on the live state
+    # observations of a round are taken before its commits, so an NSPR may be scored on a state its predecessors in the round already
+    # changed ; with action_mask, the cnode is chosen among those feasible at commit time (computed then), so commits never fail for that
+    # an NSPR is accepted (then runs for its duration) once all its VNFs are placed and rejected (resources restored) as soon as one fails
+    # the simulation clock of the NSPRs lifecycle manager moves to the latest arrival time of a batch before it's placed (expired NSPRs
+    # release their resources) ; requests without arrival time don't move it, which is why place_request requires one (a clock that
+    # never moves never expires anything, the infrastructure would eventually reject every request)
+    # if placing a batch raises, the NSPRs it was still placing give their resources back before every request of the batch fails
+    def __init__(self, model, environment, phi=float32_observations, max_batch_size=64, max_wait=0.001, action_mask=True, latency_window=100000) -> None:
+        self.model = model if isinstance(model, ExportedQFunction) else model.eval()
+        self.environment = environment
+        self.phi = phi
+        self.max_batch_size = max_batch_size ; assert max_batch_size >= 1
+        self.max_wait = max_wait
+        self.action_mask = action_mask
+        self.environment.nsprs_lifecycle_manager.reset()
+        self.requests = queue.Queue()
+        self.nspr_ids = itertools.count(1) # ids of the NSPRs built by place_request
+        #---statistics---
+        self.latencies = deque(maxlen=latency_window) # seconds between submission and result of the latest requests
+        self.completions = deque(maxlen=latency_window) # perf_counter times at which they completed
+        self.n_requests = 0
+        self.n_accepted = 0
+        self.n_batches = 0
+        self.n_forward_passes = 0
+        self.stats_lock = threading.Lock()
+        self.server = threading.Thread(target=self.serve, name="placement-service", daemon=True)
+        self.server.start()
+
+    def submit(self, nspr, arrival_time=None):
+        # queues the placement of nspr and returns a Future of its result (see place_batch)
+        # an NSPR without VNFs fails on its own (ValueError) instead of joining a batch
+        request = PlacementRequest(nspr, arrival_time)
+        if nspr.n_vnfs() == 0:
+            request.future.set_exception(ValueError(f"NSPR {nspr.id} has no VNFs"))
+        else:
+            self.requests.put(request)
+        return request.future
+
+    def place(self, nspr, arrival_time=None, timeout=None):
+        return self.submit(nspr, arrival_time).result(timeout)
+
+    def place_request(self, payload: dict, timeout=None):
+        # JSON-like request : {"vnfs": [[cpu, ram, storage, bandwidth], ...], "duration": ticks, "arrival_time": tick, "nsprtype": 'hard', "priority": 1}
+        # (nsprtype and priority are optional) ; malformed requests raise ValueError here, before being queued
+        requirements = vnfs_requirements(payload["vnfs"])
+        duration = int(payload["duration"])
+        if duration <= 0:
+            raise ValueError(f"duration must be positive (got {payload['duration']!r})")
+        arrival_time = non_negative_number(payload, "arrival_time")
+        priority = non_negative_number(payload, "priority", 1)
+        nsprtype = payload.get("nsprtype", 'hard')
+        if nsprtype not in ('hard', 'soft'):
+            raise ValueError(f"nsprtype must be 'hard' or 'soft' (got {nsprtype!r})")
+        nspr = NSPR(id=next(self.nspr_ids), priority=priority, duration=duration, nsprtype=nsprtype, vnfs_requirements=requirements)
+        return self.place(nspr, arrival_time, timeout)
+
+    def serve(self):
+        stopping = False
+        while not stopping:
+            request = self.requests.get()
+            if request is None:
+                break
+            batch = [request]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    request = self.requests.get(timeout=max(deadline - time.perf_counter(), 0.0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            try:
+                results = self.place_batch(batch)
+            except Exception as exception:
+                for request in batch:
+                    request.future.set_exception(exception)
+                continue
+            self.record(batch, results)
+
+    def place_batch(self, batch):
+        # returns one result per request : {"nspr_id", "accepted", "placements" (cnode ids of the placed VNFs)}
+        environment = self.environment
+        infrastructure_manager = environment.infrastructure_manager
+        arrival_times = [request.arrival_time for request in batch if request.arrival_time is not None]
+        if len(arrival_times) > 0 and max(arrival_times) > environment.nsprs_lifecycle_manager.clock:
+            environment.trigger_simulation_clock(max(arrival_times))
+            environment.nsprs_lifecycle_manager.nsprs_terminated_after_running.clear() # a long-running service keeps no history of NSPRs
+        nsprs = [request.nspr for request in batch]
+        requirements = [numpy.asarray(nspr.describe_vnfs(), dtype=numpy.float64) for nspr in nsprs]
+        results = [None] * len(batch)
+        try:
+            self.place_rounds(nsprs, requirements, results)
+        except Exception:
+            for nspr, result in zip(nsprs, results):
+                if result is None: # VNFs already committed would otherwise stay allocated on the live infrastructure
+                    infrastructure_manager.deallocate_whole_nspr(nspr)
+                    nspr.update_status_chain("failTerminate")
+            raise
+        return results
+
+    def place_rounds(self, nsprs, requirements, results):
+        # places the NSPRs VNF by VNF (one forward pass per round) and fills results as they are accepted or rejected
+        environment = self.environment
+        infrastructure_manager = environment.infrastructure_manager
+        active = list(range(len(nsprs)))
+        vnf_id = 1
+        while len(active) > 0:
+            cnodes_description = infrastructure_manager.describe()
+            x = numpy.concatenate((numpy.broadcast_to(cnodes_description, (len(active), len(cnodes_description))),
+                                   numpy.stack([requirements[index][vnf_id-1] for index in active])), axis=1)
+            batch_q = self.q_values(torch.as_tensor(self.phi(x))).numpy()
+            self.n_forward_passes += 1
+            still_active = []
+            for row, index in enumerate(active):
+                nspr, vnf_requirements = nsprs[index], requirements[index][vnf_id-1].tolist()
+                mask = environment.compute_action_mask(nspr, vnf_id, vnf_requirements) if self.action_mask else None
+                placed = mask is None or mask.any()
+                if placed:
+                    action = masked_greedy_actions(batch_q[row:row+1], [mask])[0]
+                    placed, _ = environment.place(vnf_id, vnf_requirements, action+1, nspr)
+                if not placed:
+                    infrastructure_manager.deallocate_whole_nspr(nspr)
+                    nspr.update_status_chain("failTerminate")
+                    results[index] = {"nspr_id": nspr.id, "accepted": False, "placements": []}
+                elif vnf_id == nspr.n_vnfs():
+                    environment.nsprs_lifecycle_manager.add_to_running_nsprs(nspr)
+                    results[index] = {"nspr_id": nspr.id, "accepted": True, "placements": nspr.placements[:nspr.n_vnfs()].tolist()}
+                else:
+                    still_active.append(index)
+            active = still_active
+            vnf_id += 1
+
+    def q_values(self, x):
+        if isinstance(self.model, ExportedQFunction):
+            return self.model.q_values(x)
+        with torch.no_grad():
+            return self.model(x).q_values
+
+    def record(self, batch, results):
+        completed = time.perf_counter()
+        with self.stats_lock:
+            for request, result in zip(batch, results):
+                self.latencies.append(completed - request.submitted)
+                self.completions.append(completed)
+                self.n_accepted += result["accepted"]
+            self.n_requests += len(batch)
+            self.n_batches += 1
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+    def stats(self):
+        # latency percentiles (milliseconds) and throughput (requests per second) over the latest latency_window requests
+        with self.stats_lock:
+            latencies = numpy.array(self.latencies)
+            completions = numpy.array(self.completions)
+            stats = {"requests": self.n_requests, "accepted": self.n_accepted, "batches": self.n_batches, "forward_passes": self.n_forward_passes,
+                     "mean_batch_size": self.n_requests / max(self.n_batches, 1)}
+        if len(latencies) > 0:
+            stats["p50_ms"], stats["p99_ms"] = (1000 * numpy.percentile(latencies, [50, 99])).tolist()
+            stats["mean_ms"] = 1000 * latencies.mean().item()
+            first_submission = completions[0] - latencies[0]
+            stats["throughput"] = len(latencies) / max((completions[-1] - first_submission).item(), 1e-9)
+        return stats
+
+    def close(self):
+        self.requests.put(None)
+        self.server.join()
+
+
+class PlacementRequestHandler(BaseHTTPRequestHandler):
+    # POST /place with a JSON request of PlacementService.place_request -> its JSON result ; GET /stats -> PlacementService.stats
+    def do_POST(self):
+        if self.path != "/place":
+            return self.reply(404, {"error": "unknown path " + self.path})
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            result = self.server.service.place_request(payload)
+        except (ValueError, KeyError, TypeError, AssertionError) as exception:
+            return self.reply(400, {"error": repr(exception)})
+        self.reply(200, result)
+
+    def do_GET(self):
+        if self.path != "/stats":
+            return self.reply(404, {"error": "unknown path " + self.path})
+        self.reply(200, self.server.service.stats())
+
+    def reply(self, status, content):
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # one line per request would cost more than the placement
+
+
+class PlacementHTTPServer(ThreadingHTTPServer):
+    # one thread per connection : concurrent HTTP requests meet in the service's queue and are micro-batched there
+    daemon_threads = True
+    request_queue_size = 128 # pending connections (socketserver's default of 5 resets bursts of clients)
+
+    def __init__(self, service, address=("127.0.0.1", 8000)) -> None:
+        super().__init__(address, PlacementRequestHandler)
+        self.service = service
@@ -22,3 +22,34 @@ class QFunction(torch.nn.Module):
         x = self.learner_head(x)
         return x
 
+
+
+class SharedEncoderQFunction(torch.nn.Module):
+    # scores every cnode with the same networks so that parameters don't depend on the number of cnodes (a model trained on one
+    # infrastructure runs on any other) and a forward pass costs O(n_cnodes):
+    # 1) encoder : [cnode features, VNF features] -> cnode embedding (hidden_sizes[-1] units)
+    # 2) context : mean of the cnodes embeddings
+    # 3) scorer : [cnode embedding, context] -> Q-value of placing the VNF on that cnode
+    # inputs are observations as given to QFunction (cnodes descriptions followed by the VNF description), n_cnodes is inferred from their size
+    def __init__(self, n_cnode_features, n_vnf_features, hidden_sizes, nonlinearity) -> None:
+        super().__init__()
+        assert nonlinearity in ['relu', 'tanh'] and len(hidden_sizes) > 0
+        activ_func = torch.relu
+        if nonlinearity == 'tanh':
+            activ_func = torch.tanh
+        self.n_cnode_features = n_cnode_features
+        self.n_vnf_features = n_vnf_features
+        self.activ_func = activ_func
+        embedding_size = hidden_sizes[-1]
+        self.encoder = pfrl.nn.MLP(in_size=n_cnode_features+n_vnf_features, hidden_sizes=hidden_sizes[:-1], nonlinearity=activ_func, out_size=embedding_size)
+        self.scorer = pfrl.nn.MLP(in_size=2*embedding_size, hidden_sizes=[embedding_size], nonlinearity=activ_func, out_size=1, last_wscale=1)
+        self.head = pfrl.q_functions.DiscreteActionValueHead()
+
+    def forward(self, x):
+        batch_size = x.shape[0]
+        cnodes = x[:, :-self.n_vnf_features].reshape(batch_size, -1, self.n_cnode_features) # (batch, n_cnodes, n_cnode_features)
+        vnf = x[:, None, -self.n_vnf_features:].expand(-1, cnodes.shape[1], -1)
+        embeddings = self.activ_func(self.encoder(torch.cat((cnodes, vnf), dim=2))) # (batch, n_cnodes, embedding_size)
+        context = embeddings.mean(dim=1, keepdim=True).expand_as(embeddings)
+        q_values = self.scorer(torch.cat((embeddings, context), dim=2)).squeeze(2) # (batch, n_cnodes)
+        return self.head(q_values)
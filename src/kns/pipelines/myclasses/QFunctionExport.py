@@ -0,0 +1,112 @@
+import warnings
+import torch
+from kns.pipelines.myclasses.QFunction import QFunction, SharedEncoderQFunction
+
+
+def activation_module(activ_func):
+    return {torch.relu: torch.nn.ReLU, torch.tanh: torch.nn.Tanh}[activ_func]()
+
+
+def plain_mlp(mlp, activ_func):
+    # pfrl.nn.MLP as a Sequential of copies of its Linear layers and activation modules (no Python loop nor function attribute)
+    layers = []
+    for layer in getattr(mlp, "hidden_layers", []):
+        layers += [torch.nn.Linear(layer.in_features, layer.out_features), activation_module(activ_func)]
+        layers[-2].load_state_dict(layer.state_dict())
+    layers.append(torch.nn.Linear(mlp.output.in_features, mlp.output.out_features))
+    layers[-1].load_state_dict(mlp.output.state_dict())
+    return torch.nn.Sequential(*layers)
+
+
+class SharedEncoderQValues(torch.nn.Module):
+    # Q-values of a SharedEncoderQFunction computed with plain modules
+    def __init__(self, model: SharedEncoderQFunction) -> None:
+        super().__init__()
+        self.n_cnode_features = model.n_cnode_features
+        self.n_vnf_features = model.n_vnf_features
+        self.encoder = plain_mlp(model.encoder, model.activ_func)
+        self.activation = activation_module(model.activ_func)
+        self.scorer = plain_mlp(model.scorer, model.activ_func)
+
+    def forward(self, x):
+        batch_size = x.shape[0]
+        cnodes = x[:, :-self.n_vnf_features].reshape(batch_size, -1, self.n_cnode_features)
+        vnf = x[:, None, -self.n_vnf_features:].expand(-1, cnodes.shape[1], -1)
+        embeddings = self.activation(self.encoder(torch.cat((cnodes, vnf), dim=2)))
+        context = embeddings.mean(dim=1, keepdim=True).expand_as(embeddings)
+        return self.scorer(torch.cat((embeddings, context), dim=2)).squeeze(2)
+
+
+class GreedyQNetwork(torch.nn.Module):
+    # inference-only Q-function : the DiscreteActionValueHead is folded into an argmax (forward returns the greedy actions)
+    def __init__(self, q_values_network) -> None:
+        super().__init__()
+        self.q_values_network = q_values_network
+
+    def forward(self, x):
+        return self.q_values_network(x).argmax(dim=1)
+
+    @torch.jit.export
+    def q_values(self, x):
+        return self.q_values_network(x)
+
+    @torch.jit.export
+    def masked_actions(self, x, mask):
+        # greedy actions among those allowed by the boolean mask (batch x n_actions)
+        return self.q_values_network(x).masked_fill(~mask, float("-inf")).argmax(dim=1)
+
+
+def greedy_q_network(model):
+    # GreedyQNetwork with a copy of the weights of model (a QFunction or a SharedEncoderQFunction)
+    if isinstance(model, QFunction):
+        mlp = model.learner_head[0]
+        network = GreedyQNetwork(plain_mlp(mlp, mlp.nonlinearity))
+    elif isinstance(model, SharedEncoderQFunction):
+        network = GreedyQNetwork(SharedEncoderQValues(model))
+    else:
+        raise TypeError(f"can't export {type(model).__name__}")
+    return network.eval()
+
+
+class ExportedQFunction:
+    # TorchScript inference path of a Q-function, frozen (weights are constants : export again after training further)
+    # quantize replaces Linear layers with dynamic int8 ones (weights quantized once, activations at each call)
+    # calls (actions or Q-values) whose batch size is in fixed_batch_sizes run a module traced for that exact input shape
+    # (e.g. 1 for acting on one observation and the full micro-batch size of a PlacementService)
+    # only plain Linear/activation/argmax operations remain, so the module is also what torch.onnx.export would need
+    def __init__(self, model, input_size, quantize=False, fixed_batch_sizes=(1,)) -> None:
+        self.quantize = quantize
+        self.input_size = input_size
+        network = greedy_q_network(model)
+        with warnings.catch_warnings(): # TorchScript and eager quantization are deprecated for torch.compile/torchao, which don't save a standalone module
+            warnings.simplefilter("ignore", FutureWarning)
+            warnings.simplefilter("ignore", DeprecationWarning)
+            warnings.simplefilter("ignore", UserWarning)
+            if quantize:
+                network = torch.ao.quantization.quantize_dynamic(network, {torch.nn.Linear}, dtype=torch.qint8)
+            self.module = torch.jit.freeze(torch.jit.script(network), preserved_attrs=["q_values", "masked_actions"])
+            self.fixed_shape_modules = {batch_size: torch.jit.freeze(torch.jit.trace(network, torch.zeros(batch_size, input_size)))
+                                        for batch_size in fixed_batch_sizes}
+            self.fixed_shape_q_values = {batch_size: torch.jit.freeze(torch.jit.trace(network.q_values_network, torch.zeros(batch_size, input_size)))
+                                         for batch_size in fixed_batch_sizes}
+
+    def __call__(self, x):
+        # greedy actions (int64 tensor) of a float32 batch of observations
+        with torch.inference_mode():
+            return self.fixed_shape_modules.get(x.shape[0], self.module)(x)
+
+    def q_values(self, x):
+        with torch.inference_mode():
+            if x.shape[0] in self.fixed_shape_q_values:
+                return self.fixed_shape_q_values[x.shape[0]](x)
+            return self.module.q_values(x)
+
+    def masked_actions(self, x, mask):
+        with torch.inference_mode():
+            return self.module.masked_actions(x, mask)
+
+    def save(self, path):
+        # standalone TorchScript file, loaded with torch.jit.load (no kns nor pfrl needed)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            torch.jit.save(self.module, path)
@@ -0,0 +1,61 @@
+import numpy
+
+
+class SumTree:
+    # sum and min segment trees over capacity priorities stored in flat NumPy arrays (the root is node 1, node i has children 2i and 2i+1,
+    # leaf i is node size+i with size the power of two above capacity) ; batched updates and stratified sampling walk the levels vectorized
+    # empty leaves hold 0 in the sum tree and inf in the min tree, so they are never sampled and never the minimum
+    def __init__(self, capacity) -> None:
+        assert capacity > 0
+        self.capacity = capacity
+        self.size = 1 << max(0, int(capacity - 1).bit_length())
+        self.depth = self.size.bit_length() - 1
+        self.sums = numpy.zeros(2 * self.size, dtype=numpy.float64)
+        self.mins = numpy.full(2 * self.size, numpy.inf, dtype=numpy.float64)
+
+    def total(self):
+        return self.sums[1].item()
+
+    def min(self):
+        return self.mins[1].item()
+
+    def leaves(self, indices):
+        return self.sums[self.size + numpy.asarray(indices)]
+
+    def set(self, index, priority, min_priority=None):
+        # single leaf update (the per-step path): priority in the sum tree and min_priority (priority by default) in the min tree
+        sums, mins = self.sums, self.mins
+        node = self.size + index
+        sums[node] = priority
+        mins[node] = priority if min_priority is None else min_priority
+        node >>= 1
+        while node >= 1:
+            left = 2 * node
+            sums[node] = sums[left] + sums[left + 1]
+            mins[node] = min(mins[left], mins[left + 1])
+            node >>= 1
+
+    def update(self, indices, priorities, min_priorities=None):
+        # batched leaf updates (a repeated index keeps its last priority), then one vectorized pass per level over the touched parents
+        nodes = self.size + numpy.asarray(indices, dtype=numpy.int64)
+        self.sums[nodes] = priorities
+        self.mins[nodes] = priorities if min_priorities is None else min_priorities
+        nodes = numpy.unique(nodes >> 1)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            self.sums[nodes] = self.sums[left] + self.sums[left + 1]
+            self.mins[nodes] = numpy.minimum(self.mins[left], self.mins[left + 1])
+            nodes = numpy.unique(nodes >> 1)
+
+    def sample(self, n, uniforms):
+        # stratified sampling: the i-th of the n leaves is drawn proportionally to priorities in the i-th of n equal slices of the total
+        # uniforms are n draws in [0,1) ; returns the leaf indices and their priorities
+        positions = (numpy.arange(n) + uniforms) * (self.total() / n)
+        nodes = numpy.ones(n, dtype=numpy.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            left_sums = self.sums[left]
+            go_right = (positions >= left_sums) & (self.sums[left + 1] > 0) # rounding never leads to an empty subtree
+            positions = numpy.where(go_right, positions - left_sums, positions)
+            nodes = left + go_right
+        return nodes - self.size, self.sums[nodes]
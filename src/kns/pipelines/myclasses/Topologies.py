@@ -0,0 +1,116 @@
+import numpy
+import networkx
+
+
+class Topology:
+    # structure of an infrastructure without its resources: network nodes (switches/routers), links between them and the network node every
+    # computing node hangs off ; computing node "s"+str(i+1) is linked to network node network_nodes[cnode_attachments[i]]
+    # structures are built once (from their own seed for random ones) and shared by every infrastructure generated from them
+    def __init__(self, network_nodes, links, cnode_attachments, bandwidths=None) -> None:
+        self.network_nodes = list(network_nodes) # names
+        self.links = numpy.asarray(links, dtype=numpy.int64).reshape(-1,2) # pairs of indexes in network_nodes
+        self.cnode_attachments = numpy.asarray(cnode_attachments, dtype=numpy.int64)
+        self.bandwidths = None if bandwidths is None else numpy.asarray(bandwidths, dtype=numpy.float64) # bandwidth of links if fixed (e.g. read from a file)
+        self.n_cnodes = len(self.cnode_attachments)
+
+
+def fat_tree(k):
+    # k-ary fat-tree : (k/2)^2 core switches, k pods of k/2 aggregation and k/2 edge switches, k/2 computing nodes per edge switch (k^3/4 cnodes)
+    assert k >= 2 and k % 2 == 0
+    half = k // 2
+    network_nodes = ["core"+str(i) for i in range(half*half)]
+    network_nodes += ["agg"+str(pod)+"_"+str(i) for pod in range(k) for i in range(half)]
+    network_nodes += ["edge"+str(pod)+"_"+str(i) for pod in range(k) for i in range(half)]
+    first_aggregation, first_edge = half*half, half*half + k*half
+    links = []
+    for pod in range(k):
+        for i in range(half):
+            aggregation = first_aggregation + pod*half + i
+            links += [(aggregation, i*half + j) for j in range(half)] # aggregation switch i of every pod reaches core group i
+            links += [(first_edge + pod*half + j, aggregation) for j in range(half)]
+    cnode_attachments = numpy.repeat(numpy.arange(first_edge, first_edge + k*half), half)
+    return Topology(network_nodes, links, cnode_attachments)
+
+
+def multi_tier(n_core, n_aggregation, n_edge, cnodes_per_edge, uplinks=2):
+    # edge/aggregation/core tiers : every edge switch hosts cnodes_per_edge computing nodes and is linked to uplinks aggregation switches (round robin),
+    # every aggregation switch is linked to every core router
+    assert 1 <= uplinks <= n_aggregation
+    network_nodes = ["core"+str(i) for i in range(n_core)] + ["agg"+str(i) for i in range(n_aggregation)] + ["edge"+str(i) for i in range(n_edge)]
+    links = [(n_core + aggregation, core) for aggregation in range(n_aggregation) for core in range(n_core)]
+    links += [(n_core + n_aggregation + edge, n_core + (edge + uplink) % n_aggregation) for edge in range(n_edge) for uplink in range(uplinks)]
+    cnode_attachments = numpy.repeat(numpy.arange(n_core + n_aggregation, n_core + n_aggregation + n_edge), cnodes_per_edge)
+    return Topology(network_nodes, links, cnode_attachments)
+
+
+def waxman(n_routers, cnodes_per_router, alpha, beta, seed, chunk_size=1024):
+    # routers placed uniformly in the unit square, linked with probability beta*exp(-distance/(alpha*L)) (L : largest distance)
+    # pairs are drawn chunk by chunk of rows (O(chunk_size*n_routers) memory) and components are then joined to stay connected
+    numpy_gen = numpy.random.default_rng(seed)
+    positions = numpy_gen.uniform(size=(n_routers,2))
+    largest_distance = numpy.sqrt(2.0)
+    links = []
+    for start in range(0, n_routers, chunk_size):
+        distances = pairwise_distances(positions, start, chunk_size)
+        linked = numpy_gen.uniform(size=distances.shape) < beta * numpy.exp(-distances / (alpha * largest_distance))
+        links.append(upper_pairs(linked, start))
+    return geometric_topology(positions, numpy.concatenate(links), cnodes_per_router)
+
+
+def random_geometric(n_routers, cnodes_per_router, radius, seed, chunk_size=1024):
+    # routers placed uniformly in the unit square, linked when closer than radius ; components are then joined to stay connected
+    numpy_gen = numpy.random.default_rng(seed)
+    positions = numpy_gen.uniform(size=(n_routers,2))
+    links = [upper_pairs(pairwise_distances(positions, start, chunk_size) <= radius, start) for start in range(0, n_routers, chunk_size)]
+    return geometric_topology(positions, numpy.concatenate(links), cnodes_per_router)
+
+
+def from_file(path, file_format, cnodes_per_router=1):
+    # network nodes and links read from a GraphML file or an edge list, computing nodes are attached to every network node
+    # links keep their "bw" attribute when every link of the file has one (drawn like core links otherwise)
+    if file_format == 'graphml':
+        graph = networkx.read_graphml(path)
+    elif file_format == 'edgelist':
+        graph = networkx.read_edgelist(path)
+    assert graph.number_of_nodes() > 0
+    graph = networkx.Graph(graph) # directed and multi graphs are read as simple undirected ones
+    index = {node: i for i, node in enumerate(graph.nodes)}
+    links = [(index[node1], index[node2]) for node1, node2 in graph.edges if node1 != node2]
+    bandwidths = [bandwidth for node1, node2, bandwidth in graph.edges.data("bw") if node1 != node2]
+    fixed_bandwidths = None not in bandwidths and len(bandwidths) > 0
+    return Topology(["r"+str(i) for i in range(len(index))], links, numpy.repeat(numpy.arange(len(index)), cnodes_per_router), [float(bandwidth) for bandwidth in bandwidths] if fixed_bandwidths else None)
+
+
+def pairwise_distances(positions, start, chunk_size):
+    # distances between positions[start:start+chunk_size] and all positions
+    return numpy.linalg.norm(positions[start:start+chunk_size,None,:] - positions[None,:,:], axis=2)
+
+
+def upper_pairs(linked, start):
+    # (i,j) pairs with i<j of a boolean chunk whose row r stands for position start+r
+    rows, columns = numpy.nonzero(linked)
+    rows = rows + start
+    keep = rows < columns
+    return numpy.column_stack((rows[keep], columns[keep]))
+
+
+def geometric_topology(positions, links, cnodes_per_router):
+    # joins every component to the rest of the network through its closest pair of routers, then attaches computing nodes
+    graph = networkx.Graph()
+    graph.add_nodes_from(range(len(positions)))
+    graph.add_edges_from(links.tolist())
+    components = sorted(networkx.connected_components(graph), key=len, reverse=True)
+    connected = numpy.array(sorted(components[0]))
+    extra_links = []
+    for members in components[1:]:
+        component = numpy.array(sorted(members))
+        distances = numpy.linalg.norm(positions[component,None,:] - positions[None,connected,:], axis=2)
+        closest = numpy.unravel_index(distances.argmin(), distances.shape)
+        extra_links.append((component[closest[0]], connected[closest[1]]))
+        connected = numpy.concatenate((connected, component))
+    links = numpy.concatenate((links, numpy.array(extra_links, dtype=numpy.int64).reshape(-1,2)))
+    n_routers = len(positions)
+    return Topology(["r"+str(i) for i in range(n_routers)], links, numpy.repeat(numpy.arange(n_routers), cnodes_per_router))
+
+
+TOPOLOGIES = {"fat_tree": fat_tree, "multi_tier": multi_tier, "waxman": waxman, "random_geometric": random_geometric, "file": from_file}
@@ -0,0 +1,182 @@
+import ctypes
+import numpy
+import multiprocessing
+
+class VectorEnvironment:
+    # N independently seeded Environments stepped in lockstep so that the agent acts on all of them with one forward pass
+    # observations are stacked in a float32 array: row i is cnodes_description+vnf_requirements of environment i
+    # and action_masks[i] is its feasibility mask when environments are built with action_mask=True (None otherwise)
+    # an environment whose episode is done is reset right away: its row then holds the first observation of its next episode
+    def __init__(self, environments) -> None:
+        self.environments = environments
+        self.n_envs = len(environments) ; assert self.n_envs > 0
+        self.observations = None
+        self.action_masks = None
+
+    def write_observation(self, env_index, obs):
+        n_cnodes_features = len(obs[0])
+        self.observations[env_index, :n_cnodes_features] = obs[0]
+        self.observations[env_index, n_cnodes_features:] = obs[1]
+        if len(obs) > 2:
+            self.action_masks[env_index] = obs[2]
+
+    def reset(self, env_indexes=None):
+        # resets all environments (or only those in env_indexes) and returns the stacked observations
+        # arrays are never modified in place: rows handed out earlier (e.g. stored in a replay buffer) stay valid
+        if env_indexes is None:
+            env_indexes = range(self.n_envs)
+        observations = [self.environments[env_index].reset() for env_index in env_indexes]
+        if self.observations is None:
+            self.observations = numpy.zeros((self.n_envs, len(observations[0][0])+len(observations[0][1])), dtype=numpy.float32)
+            if len(observations[0]) > 2:
+                self.action_masks = numpy.ones((self.n_envs, len(observations[0][2])), dtype=bool)
+        else:
+            self.copy_arrays()
+        for env_index, obs in zip(env_indexes, observations):
+            self.write_observation(env_index, obs)
+        return self.observations
+
+    def copy_arrays(self):
+        self.observations = self.observations.copy()
+        if self.action_masks is not None:
+            self.action_masks = self.action_masks.copy()
+
+    def step(self, actions):
+        # returns stacked observations, rewards, dones and infos ; infos[i] is a dict with Environment.step's info and,
+        # when the episode of environment i is done, the number of running and successfully terminated NSPRs it ended with
+        self.copy_arrays()
+        rewards = numpy.zeros(self.n_envs)
+        dones = numpy.zeros(self.n_envs, dtype=bool)
+        infos = []
+        for env_index, (environment, action) in enumerate(zip(self.environments, actions)):
+            obs, rewards[env_index], dones[env_index], info = environment.step(int(action))
+            infos.append({"info": info})
+            if dones[env_index]:
+                infos[env_index]["performance"] = environment.nsprs_lifecycle_manager.running_and_successfully_terminated_nsprs()
+                obs = environment.reset()
+            self.write_observation(env_index, obs)
+        return self.observations, rewards, dones, infos
+
+    def close(self):
+        for environment in self.environments:
+            environment.close()
+
+
+def environment_worker(connection, environment_factory, env_index, observations, action_masks, actions, rewards, dones, performances):
+    # owns one Environment stack (built here by environment_factory) and writes its results straight into the shared arrays
+    # only commands and Environment.step's info strings go through the pipe
+    environment = environment_factory()
+    try:
+        while True:
+            command, argument = connection.recv()
+            if command == "step":
+                obs, rewards[env_index], dones[env_index], info = environment.step(int(actions[env_index]))
+                if dones[env_index]:
+                    performances[env_index] = environment.nsprs_lifecycle_manager.running_and_successfully_terminated_nsprs()
+                    obs = environment.reset()
+            elif command == "reset":
+                obs, info = environment.reset(), None
+            elif command == "get_seeds": # seeds of the current episode, for checkpoints
+                connection.send((environment.infrastructure_manager.infrastructure_generator.current_seed, environment.nsprs_generator.current_seed))
+                continue
+            elif command == "set_seeds":
+                environment.infrastructure_manager.infrastructure_generator.current_seed, environment.nsprs_generator.current_seed = argument
+                connection.send(None)
+                continue
+            elif command == "close":
+                environment.close()
+                break
+            n_cnodes_features = len(obs[0])
+            observations[env_index, :n_cnodes_features] = obs[0]
+            observations[env_index, n_cnodes_features:] = obs[1]
+            if action_masks is not None:
+                action_masks[env_index] = obs[2]
+            connection.send(info)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connection.close()
+
+
+class SubprocessVectorEnvironment:
+    # same interface as VectorEnvironment but each Environment lives in its own worker process (no GIL contention between environments)
+    # environment_factories are picklable callables building one Environment each (its generators and lifecycle manager included)
+    # workers write observations, masks, rewards and dones into shared memory, the parent only copies them into fresh arrays
+    def __init__(self, environment_factories, observation_size, n_actions, action_mask, start_method="fork") -> None:
+        self.n_envs = len(environment_factories) ; assert self.n_envs > 0
+        context = multiprocessing.get_context(start_method)
+        #---shared memory---
+        self.shared_observations = context.RawArray(ctypes.c_float, self.n_envs * observation_size)
+        self.shared_action_masks = context.RawArray(ctypes.c_bool, self.n_envs * n_actions) if action_mask else None
+        self.shared_actions = context.RawArray(ctypes.c_int64, self.n_envs)
+        self.shared_rewards = context.RawArray(ctypes.c_double, self.n_envs)
+        self.shared_dones = context.RawArray(ctypes.c_bool, self.n_envs)
+        self.shared_performances = context.RawArray(ctypes.c_double, self.n_envs)
+        arrays = self.numpy_views(observation_size, n_actions)
+        #---workers---
+        self.connections, self.workers = [], []
+        for env_index, environment_factory in enumerate(environment_factories):
+            parent_connection, worker_connection = context.Pipe()
+            worker = context.Process(target=environment_worker, args=(worker_connection, environment_factory, env_index) + arrays, daemon=True)
+            worker.start()
+            worker_connection.close()
+            self.connections.append(parent_connection)
+            self.workers.append(worker)
+        self.observations = None
+        self.action_masks = None
+        self.closed = False
+
+    def numpy_views(self, observation_size, n_actions):
+        # NumPy arrays over the shared buffers (observations, action_masks, actions, rewards, dones, performances)
+        self.observations_view = numpy.frombuffer(self.shared_observations, dtype=numpy.float32).reshape(self.n_envs, observation_size)
+        self.action_masks_view = numpy.frombuffer(self.shared_action_masks, dtype=bool).reshape(self.n_envs, n_actions) if self.shared_action_masks is not None else None
+        self.actions_view = numpy.frombuffer(self.shared_actions, dtype=numpy.int64)
+        self.rewards_view = numpy.frombuffer(self.shared_rewards, dtype=numpy.float64)
+        self.dones_view = numpy.frombuffer(self.shared_dones, dtype=bool)
+        self.performances_view = numpy.frombuffer(self.shared_performances, dtype=numpy.float64)
+        return self.observations_view, self.action_masks_view, self.actions_view, self.rewards_view, self.dones_view, self.performances_view
+
+    def __getstate__(self):
+        raise TypeError("SubprocessVectorEnvironment can't be pickled, its workers belong to the process that created it")
+
+    def send_and_receive(self, command, env_indexes, arguments=None):
+        for position, env_index in enumerate(env_indexes):
+            self.connections[env_index].send((command, None if arguments is None else arguments[position]))
+        return [self.connections[env_index].recv() for env_index in env_indexes]
+
+    def environments_seeds(self):
+        # (infrastructure seed, NSPRs seed) of the current episode of every worker's environment
+        return self.send_and_receive("get_seeds", range(self.n_envs))
+
+    def restore_environments_seeds(self, seeds):
+        self.send_and_receive("set_seeds", range(self.n_envs), seeds)
+
+    def collect(self):
+        # fresh copies: rows handed out earlier (e.g. stored in a replay buffer) stay valid
+        self.observations = self.observations_view.copy()
+        if self.action_masks_view is not None:
+            self.action_masks = self.action_masks_view.copy()
+
+    def reset(self, env_indexes=None):
+        if env_indexes is None:
+            env_indexes = range(self.n_envs)
+        self.send_and_receive("reset", env_indexes)
+        self.collect()
+        return self.observations
+
+    def step(self, actions):
+        self.actions_view[:] = actions
+        infos = [{"info": info} for info in self.send_and_receive("step", range(self.n_envs))]
+        self.collect()
+        dones = self.dones_view.copy()
+        for env_index in numpy.flatnonzero(dones):
+            infos[env_index]["performance"] = int(self.performances_view[env_index])
+        return self.observations, self.rewards_view.copy(), dones, infos
+
+    def close(self):
+        if not self.closed:
+            for connection in self.connections:
+                connection.send(("close", None))
+            for worker in self.workers:
+                worker.join()
+            self.closed = True
@@ -0,0 +1,11 @@
+"""
+Pipeline 'sweep': trains the DDQN agent of 'ddqn_4_features' once per trial
+(parameter combination times seed) in a process pool and collects the
+performance curves of all trials.
+"""
+
+from .pipeline import create_pipeline
+
+__all__ = ["create_pipeline"]
+
+__version__ = "0.1"
@@ -0,0 +1,135 @@
+"""
+Nodes of the 'sweep' pipeline: a grid or random search over parameters of
+'ddqn_4_features', times seeds, run in a process pool.
+"""
+
+import os
+import copy
+import time
+import random
+import logging
+import itertools
+import traceback
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+import torch
+from kns.pipelines.ddqn_4_features import nodes as ddqn_nodes
+
+logger = logging.getLogger(__name__)
+
+TRIAL_SEED_STRIDE = 1000 * ddqn_nodes.SEED_STRIDE # training seeds shift between seeds of a trial (beyond the shifts of vector environments)
+
+
+def expand_sweep_trials(sweep: dict):
+    # returns the trials : one per combination of the search space (grid) or random draw (random), times each seed
+    # space maps dotted parameter paths (e.g. opt.learning_rate) to a list of values, or for random search to {low, high, log, integer}
+    space = sweep["space"]
+    if sweep["search"] == 'grid':
+        assert all(isinstance(values, list) for values in space.values()), "grid search takes a list of values per parameter"
+        combinations = [dict(zip(space.keys(), values)) for values in itertools.product(*space.values())]
+    elif sweep["search"] == 'random':
+        numpy_gen = numpy.random.default_rng(sweep["random_seed"])
+        combinations = [{path: draw(values, numpy_gen) for path, values in space.items()} for _ in range(sweep["n_random_trials"])]
+    else:
+        raise ValueError(f"unknown search '{sweep['search']}' (expected 'grid' or 'random')")
+    return [{"trial": trial_index, "combination": combination_index, "seed": seed, "overrides": combination}
+            for trial_index, (combination_index, combination, seed) in enumerate((combination_index, combination, seed)
+                for combination_index, combination in enumerate(combinations) for seed in sweep["seeds"])]
+
+
+def draw(values, numpy_gen):
+    if isinstance(values, list):
+        return values[int(numpy_gen.integers(len(values)))]
+    low, high = float(values["low"]), float(values["high"]) # YAML reads exponent notation without a dot as a string
+    value = numpy.exp(numpy_gen.uniform(numpy.log(low), numpy.log(high))) if values.get("log", False) else numpy_gen.uniform(low, high)
+    return int(round(value)) if values.get("integer", False) else float(value)
+
+
+def trial_parameters(parameters: dict, trial: dict, sweep: dict):
+    # parameters of the trial : overrides applied and training seeds shifted by the trial's seed (evaluations stay on the same environments)
+    parameters = copy.deepcopy(parameters)
+    for path, value in trial["overrides"].items():
+        *sections, key = path.split(".")
+        section = parameters
+        for name in sections:
+            section = section[name]
+        assert key in section, f"unknown parameter {path}"
+        section[key] = value
+    parameters["infragen"]["train_seed"] += trial["seed"] * TRIAL_SEED_STRIDE
+    parameters["nsprgen"]["train_seed"] += trial["seed"] * TRIAL_SEED_STRIDE
+    parameters["loop"]["max_episodes"] = sweep["max_episodes"]
+    parameters["checkpoint"] = dict(parameters["checkpoint"], interval=0, resume=False)
+    parameters["instrumentation"] = dict(parameters["instrumentation"], enabled=False, profiler=None)
+    return parameters
+
+
+def run_trial(trial: dict, parameters: dict, sweep: dict):
+    # trains one agent as the 'ddqn_4_features' pipeline does, in the trial's own directory (best agents are saved in the working directory)
+    # everything is constructed in the launch directory, so that relative input files (arrival traces, topology files) resolve as in the pipeline
+    # returns the trial with its performance records, or with the error that stopped it
+    parameters = trial_parameters(parameters, trial, sweep)
+    directory = os.path.join(sweep["output_dir"], f"trial_{trial['trial']}")
+    os.makedirs(directory, exist_ok=True)
+    working_directory = os.getcwd()
+    start = time.perf_counter()
+    result = dict(trial, performance_records=[], mean_final_performance=None, seconds=None, error=None)
+    try:
+        torch.manual_seed(trial["seed"]) ; numpy.random.seed(trial["seed"]) ; random.seed(trial["seed"])
+        train_infra_gen, eval_infra_gen, n_cnodes = ddqn_nodes.construct_infrastructure_generators(parameters["infragen"])
+        train_infra_man, eval_infra_man = ddqn_nodes.construct_infrastructure_managers(train_infra_gen, eval_infra_gen, parameters["envs"])
+        train_nspr_gen, eval_nspr_gen = ddqn_nodes.construct_nspr_generators(parameters["nsprgen"])
+        train_nsprs_man, eval_nsprs_man = ddqn_nodes.construct_nsprs_lifecycle_managers()
+        train_env, eval_env = ddqn_nodes.construct_environments(train_infra_man, eval_infra_man, train_nspr_gen, eval_nspr_gen, train_nsprs_man, eval_nsprs_man, parameters["envs"])
+        train_vector_env = ddqn_nodes.construct_train_vector_environment(train_env, parameters["infragen"], parameters["nsprgen"], parameters["envs"], parameters["loop"], parameters["n_vnf_features"])
+        model = ddqn_nodes.construct_nn(parameters["nn"], parameters["n_cnode_features"], parameters["n_vnf_features"], n_cnodes)
+        replay_buffer = ddqn_nodes.construct_replay_buffer(parameters["rbuf"])
+        explorer = ddqn_nodes.construct_explorer(parameters["explor"], n_cnodes)
+        ddqn_agent = ddqn_nodes.construct_optimizer_and_ddqn_agent(model, parameters["opt"], replay_buffer, explorer, parameters["ddqn"])
+        os.chdir(directory)
+        performance_records, _ = ddqn_nodes.agent_and_envs_interaction(ddqn_agent, train_vector_env, eval_env, parameters["loop"], parameters["instrumentation"], parameters["checkpoint"])
+        result["performance_records"] = [int(performance) for performance in performance_records]
+        final_records = result["performance_records"][-sweep["final_window"]:]
+        result["mean_final_performance"] = statistics.mean(final_records) if len(final_records) > 0 else None
+    except Exception:
+        result["error"] = traceback.format_exc()
+    finally:
+        os.chdir(working_directory)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def limit_threads(threads_per_worker: int):
+    # initializer of the pool workers : CPU thread budget of each trial
+    torch.set_num_threads(threads_per_worker)
+
+
+def run_sweep_trials(trials: list, parameters: dict, sweep: dict):
+    # runs the trials in a pool of sweep.n_workers processes (spawned: nothing of the parent's state is inherited) and returns their results
+    # in trial order, ranked combinations (mean over seeds of the final performances) are logged
+    logger.info("Sweep of %d trials on %d workers (%d threads each)", len(trials), sweep["n_workers"], sweep["threads_per_worker"])
+    with ProcessPoolExecutor(max_workers=sweep["n_workers"], mp_context=multiprocessing.get_context("spawn"),
+                             initializer=limit_threads, initargs=(sweep["threads_per_worker"],)) as executor:
+        futures = [executor.submit(run_trial, trial, parameters, sweep) for trial in trials]
+        results = []
+        for future in futures:
+            result = future.result()
+            if result["error"] is not None:
+                logger.warning("Sweep trial %d (%s, seed %d) failed:\n%s", result["trial"], result["overrides"], result["seed"], result["error"])
+            else:
+                logger.info("Sweep trial %d (%s, seed %d): mean final performance %s in %.1f s", result["trial"], result["overrides"], result["seed"], result["mean_final_performance"], result["seconds"])
+            results.append(result)
+    for rank, (combination, mean_performance) in enumerate(rank_combinations(results), start=1):
+        logger.info("Sweep rank %d: %s with mean final performance %.2f", rank, combination, mean_performance)
+    return results
+
+
+def rank_combinations(results: list):
+    # (overrides, mean over seeds of the mean final performances) of the combinations, best first ; failed trials are left out
+    performances = {}
+    for result in results:
+        if result["mean_final_performance"] is not None:
+            performances.setdefault(result["combination"], (result["overrides"], []))[1].append(result["mean_final_performance"])
+    ranking = [(overrides, statistics.mean(values)) for overrides, values in performances.values()]
+    return sorted(ranking, key=lambda ranked: ranked[1], reverse=True)
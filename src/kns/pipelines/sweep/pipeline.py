@@ -0,0 +1,22 @@
+"""
+Pipeline 'sweep' (not part of __default__): kedro run --pipeline sweep
+"""
+
+from kedro.pipeline import Pipeline, pipeline, node
+from .nodes import expand_sweep_trials, run_sweep_trials
+
+def create_pipeline(**kwargs) -> Pipeline:
+    return pipeline([
+        node(
+            func=expand_sweep_trials,
+            inputs="params:sweep",
+            outputs="sweep_trials",
+            name="sweep_trials_node"
+        ),
+        node(
+            func=run_sweep_trials,
+            inputs=["sweep_trials", "parameters", "params:sweep"],
+            outputs="sweep_results",
+            name="sweep_run_node"
+        )
+    ])
@@ -0,0 +1,97 @@
+"""
+Checks that the array replay buffer holds the same n-step transitions as
+pfrl's replay buffer fed with the same interleaved episodes, keeps pfrl's
+importance sampling weights, and samples proportionally to priorities
+through its array sum tree.
+"""
+import collections
+import numpy
+import pytest
+from pfrl.replay_buffers import ReplayBuffer
+from kns.pipelines.myclasses.ArrayReplayBuffer import ArrayPrioritizedReplayBuffer
+from kns.pipelines.myclasses.SumTree import SumTree
+
+GAMMA = 0.9
+
+
+def feed(buffers, n_steps=400, n_envs=3, seed=0):
+    # interleaved episodes of n_envs environments, ended by terminal states or interruptions ; state values identify the steps
+    random = numpy.random.default_rng(seed)
+    last_states = [None] * n_envs
+    for step in range(n_steps):
+        env_id = int(random.integers(n_envs))
+        state = numpy.array([step, env_id, -step], dtype=numpy.float64)
+        if last_states[env_id] is not None:
+            terminal, interrupted = bool(random.random() < 0.05), bool(random.random() < 0.05)
+            for buffer in buffers:
+                buffer.append(state=last_states[env_id], action=step % 5, reward=float(step), next_state=state, is_state_terminal=terminal, env_id=env_id)
+                if terminal or interrupted:
+                    buffer.stop_current_episode(env_id=env_id)
+            state = None if terminal or interrupted else state
+        last_states[env_id] = state
+    for buffer in buffers:
+        for env_id in range(n_envs):
+            buffer.stop_current_episode(env_id=env_id) # the array buffer only samples a transition once its next one is known
+
+
+def pfrl_entry(entry):
+    # state, action, n-step reward, discount, next state and terminal flag of an entry of pfrl's memory
+    return (entry[0]["state"][0], entry[0]["action"], sum(GAMMA**i * transition["reward"] for i, transition in enumerate(entry)), GAMMA**len(entry),
+            None if any(transition["is_state_terminal"] for transition in entry) else entry[-1]["next_state"][0])
+
+
+def array_entries(buffer, indices):
+    batch = buffer.gather(indices)
+    rewards = batch["reward"] @ (GAMMA ** numpy.arange(buffer.num_steps))
+    return [(batch["state"][i][0], batch["action"][i], pytest.approx(rewards[i]), GAMMA**batch["n_steps"][i],
+             None if batch["is_state_terminal"][i] else batch["next_state"][i][0]) for i in range(len(indices))]
+
+
+@pytest.mark.parametrize("num_steps", [1, 3])
+def test_array_buffer_holds_the_pfrl_transitions(num_steps):
+    pfrl_buffer = ReplayBuffer(capacity=None, num_steps=num_steps)
+    array_buffer = ArrayPrioritizedReplayBuffer(capacity=1000, num_steps=num_steps)
+    small_array_buffer = ArrayPrioritizedReplayBuffer(capacity=64, num_steps=num_steps)
+    feed([pfrl_buffer, array_buffer, small_array_buffer])
+    expected = sorted((pfrl_entry(entry) for entry in pfrl_buffer.memory), key=lambda entry: entry[0])
+    assert len(array_buffer) == len(expected) and array_buffer.states.dtype == numpy.float32
+    assert sorted(array_entries(array_buffer, numpy.flatnonzero(array_buffer.is_sampleable)), key=lambda entry: entry[0]) == expected
+    # once the ring is full, the oldest slots are overwritten (slots of interrupted episodes' next states included)
+    kept = array_entries(small_array_buffer, numpy.flatnonzero(small_array_buffer.is_sampleable))
+    assert 48 < len(small_array_buffer) <= 64 and all(entry in expected for entry in kept)
+    assert max(entry[0] for entry in kept) == max(entry[0] for entry in expected)
+
+
+@pytest.mark.parametrize("normalize_by_max", ['batch', 'memory', False])
+def test_array_buffer_prioritization(normalize_by_max):
+    buffer = ArrayPrioritizedReplayBuffer(capacity=1000, alpha=0.5, beta0=0.4, betasteps=10, eps=0.01, normalize_by_max=normalize_by_max)
+    feed([buffer], n_steps=100)
+    numpy.random.seed(0)
+    batch = buffer.sample(len(buffer))
+    assert sorted(buffer.sampled_indices.tolist()) == numpy.flatnonzero(buffer.is_sampleable).tolist() # one per slice of equal priorities
+    assert numpy.allclose(batch["weight"], 1.0) # every priority is still the initial max priority
+    errors = numpy.linspace(0.0, 2.0, len(buffer))
+    priorities = dict(zip(buffer.sampled_indices.tolist(), (numpy.minimum(errors, 1.0) + 0.01) ** 0.5)) # errors are clipped to [0, 1]
+    buffer.update_errors(errors)
+    batch = buffer.sample(len(buffer))
+    probabilities = numpy.array([priorities[slot] for slot in buffer.sampled_indices.tolist()]) / sum(priorities.values())
+    min_probability = {'batch': probabilities.min(), 'memory': min(priorities.values()) / sum(priorities.values()), False: 1 / len(buffer)}[normalize_by_max]
+    expected_weights = (probabilities / min_probability) ** -0.46
+    assert batch["weight"] == pytest.approx(expected_weights, rel=1e-5) and buffer.beta == pytest.approx(0.52)
+    counts = collections.Counter()
+    for _ in range(500):
+        counts.update(buffer.sample(32)["state"][:, 0].tolist())
+    slots = sorted(priorities)
+    frequencies = numpy.array([counts[buffer.states[slot, 0]] for slot in slots]) / (500 * 32)
+    assert frequencies == pytest.approx(numpy.array([priorities[slot] for slot in slots]) / sum(priorities.values()), abs=0.01)
+
+
+def test_sum_tree():
+    tree = SumTree(5) # padded to 8 leaves
+    tree.update([0, 2, 3, 2], [1.0, 5.0, 2.0, 3.0]) # a repeated leaf keeps its last priority
+    tree.set(4, 4.0, numpy.inf)
+    assert tree.total() == 10.0 and tree.min() == 1.0 and tree.leaves([0, 1, 2, 3, 4]).tolist() == [1.0, 0.0, 3.0, 2.0, 4.0]
+    indices, priorities = tree.sample(5, numpy.full(5, 0.5)) # middles of the 5 slices of width 2
+    assert indices.tolist() == [2, 2, 3, 4, 4] and priorities.tolist() == [3.0, 3.0, 2.0, 4.0, 4.0]
+    indices, _ = tree.sample(2, numpy.array([0.0, 1.0 - 1e-16])) # slice bounds never reach empty leaves
+    assert indices.tolist() == [0, 4]
@@ -0,0 +1,100 @@
+"""
+Checks the NSPR arrival processes and the event-driven simulation clock of
+the Environment.
+"""
+import types
+import numpy
+import pytest
+from kns.pipelines.myclasses.ArrivalProcesses import TickArrivals, PoissonArrivals, TraceArrivals
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+from kns.pipelines.myclasses.NSPRGenerator import NSPRGenerator
+from .test_infrastructure_managers import make_environment, NSPRGEN, INFRAGEN
+
+
+def arrival_times(process, n, seed=0):
+    process.reset(numpy.random.default_rng(seed))
+    return [process.next_arrival_time() for _ in range(n)]
+
+
+def test_arrival_processes(tmp_path):
+    assert arrival_times(TickArrivals(), 4) == [0, 1, 2, 3]
+    times = arrival_times(PoissonArrivals(rate=0.01, chunk_size=1000), 5000)
+    assert times == arrival_times(PoissonArrivals(rate="1e-2", chunk_size=1000), 5000) # seeded
+    assert times == pytest.approx(arrival_times(PoissonArrivals(rate=0.01, chunk_size=7), 5000)) # same stream whatever the chunks
+    gaps = numpy.diff([0.0] + times)
+    assert (gaps > 0).all() and gaps.mean() == pytest.approx(100.0, rel=0.05)
+    path = tmp_path / "arrivals.csv"
+    path.write_text("time,batch\n0.5,a\n2,b\n2,c\n10,d\n")
+    assert arrival_times(TraceArrivals(str(path)), 6) == [0.5, 2.0, 2.0, 10.0, 10.5, 12.0] # replayed after its last time
+
+
+def test_nsprs_do_not_depend_on_the_arrival_process():
+    tick_generator = NSPRGenerator(dict(NSPRGEN, is_for_train=True))
+    poisson_generator = NSPRGenerator(dict(NSPRGEN, is_for_train=True, arrivals={"process": "poisson", "rate": 0.1}))
+    for _ in range(20):
+        (tick_time, tick_batch), (poisson_time, poisson_batch) = tick_generator.next_arrival(), poisson_generator.next_arrival()
+        assert [nspr.describe_vnfs() for nspr in tick_batch] == [nspr.describe_vnfs() for nspr in poisson_batch]
+    assert tick_time == 19 and poisson_time > 19
+
+
+def test_clock_jumps_from_event_to_event(monkeypatch):
+    # arrivals far apart compared to durations : every running NSPR has departed when the next batch arrives
+    env = make_environment(ArrayInfrastructureManager, True)
+    env.nsprs_generator = NSPRGenerator(dict(NSPRGEN, is_for_train=True, arrivals={"process": "poisson", "rate": 1e-4}))
+    arrivals = []
+    next_arrival = env.nsprs_generator.next_arrival
+    def recorded_next_arrival():
+        arrival_time, batch = next_arrival()
+        arrivals.append((arrival_time, list(batch))) # batch itself is emptied as its NSPRs are processed
+        return arrival_time, batch
+    monkeypatch.setattr(env.nsprs_generator, "next_arrival", recorded_next_arrival)
+    actions = numpy.random.default_rng(0)
+    env.reset()
+    lifecycle_manager = env.nsprs_lifecycle_manager
+    done = False
+    while not done:
+        assert lifecycle_manager.clock == arrivals[-1][0]
+        assert all(end > lifecycle_manager.clock for end, _ in lifecycle_manager.running_expiries)
+        if env.ongoing_nspr is arrivals[-1][1][0] and env.id_of_vnf_to_place == 1: # first NSPR of a batch
+            assert lifecycle_manager.running_nsprs() == 0
+        _, _, done, _ = env.step(int(actions.integers(0, INFRAGEN["n_cnodes"])))
+    assert len(arrivals) > 2 and arrivals[-1][0] > 1e4
+    assert lifecycle_manager.successfully_terminated_nsprs() > 0
+
+
+def baseline_load_a_nspr(env):
+    # former clock : one tick when the waiting batch runs out, then batches are generated (without ticks) until one isn't empty
+    episode_should_be_stopped = False
+    env.ongoing_nspr = env.nsprs_lifecycle_manager.retrieve_a_waiting_nspr(env.nspr_selector)
+    if env.ongoing_nspr is None:
+        env.trigger_simulation_clock(env.nsprs_lifecycle_manager.clock + 1)
+        if env.number_of_successful_nsprs_in_batch == 0:
+            episode_should_be_stopped = True
+        else:
+            env.number_of_successful_nsprs_in_batch = 0
+    while env.ongoing_nspr is None:
+        env.nsprs_lifecycle_manager.add_to_waiting_nsprs(env.nsprs_generator.generate())
+        env.ongoing_nspr = env.nsprs_lifecycle_manager.retrieve_a_waiting_nspr(env.nspr_selector)
+    env.nspr_vnfs = env.iterative_nspr_vnfs_descriptions()
+    env.id_of_vnf_to_place, env.requirements_of_vnf_to_place = next(env.nspr_vnfs)
+    return episode_should_be_stopped
+
+
+def test_tick_arrivals_match_the_former_clock():
+    # batches are never empty (min_batch_nsprs >= 1) : an empty batch would now also move the clock by a tick
+    env, baseline_env = make_environment(ArrayInfrastructureManager, True), make_environment(ArrayInfrastructureManager, True)
+    baseline_env.load_a_nspr_from_current_batch_and_if_empty_receive_new_batch_of_nsprs_and_load_one = types.MethodType(baseline_load_a_nspr, baseline_env)
+    actions = numpy.random.default_rng(5)
+    n_ticks = 0
+    for _ in range(3):
+        obs, baseline_obs = env.reset(), baseline_env.reset()
+        done = False
+        while not done:
+            assert all(numpy.array_equal(part, baseline_part) for part, baseline_part in zip(obs, baseline_obs))
+            assert env.nsprs_lifecycle_manager.clock == baseline_env.nsprs_lifecycle_manager.clock
+            action = int(actions.integers(0, INFRAGEN["n_cnodes"]))
+            (obs, reward, done, _), (baseline_obs, baseline_reward, baseline_done, _) = env.step(action), baseline_env.step(action)
+            assert reward == baseline_reward and done == baseline_done
+        assert env.nsprs_lifecycle_manager.running_and_successfully_terminated_nsprs() == baseline_env.nsprs_lifecycle_manager.running_and_successfully_terminated_nsprs()
+        n_ticks += env.nsprs_lifecycle_manager.clock
+    assert n_ticks > 0
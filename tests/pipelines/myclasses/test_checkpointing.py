@@ -0,0 +1,79 @@
+"""
+Checks that training resumed from a checkpoint goes on exactly as if it had
+never been interrupted, and the versioned checkpoint dataset round trip.
+"""
+import numpy
+import torch
+import pytest
+import functools
+from kedro.io.core import Version
+from kns.datasets import CheckpointDataset
+from kns.pipelines.ddqn_4_features import nodes
+from kns.pipelines.myclasses import Checkpointing
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+from kns.pipelines.myclasses.VectorEnvironment import SubprocessVectorEnvironment
+from .test_infrastructure_managers import make_environment, INFRAGEN
+
+LOOP = {"max_iterations": None, "eval_max_iterations": None, "eval_episodes_interval": 1, "eval_worker": False, "n_envs": 1, "env_workers": False}
+INSTRUMENTATION = {"enabled": False, "profiler": None}
+RBUF = {"storage": 'pfrl', "capacity": 1000, "alpha": 1.0, "beta0": 0.4, "betasteps": 15, "epsilon": 0.1, "normalize_by_max": 'batch', "num_steps": 1}
+DDQN = {"gpu": None, "gamma": 0.99, "replay_start_size": 20, "minibatch_size": 8, "update_interval": 1, "clip_delta": False,
+        "target_update_method": 'hard', "target_update_interval": 30, "soft_update_tau": 0.0005, "n_times_update": 1,
+        "batch_accumulator": 'mean', "max_grad_norm": None}
+
+
+def train(max_episodes, checkpoint, rbuf=RBUF, loop=LOOP):
+    # builds the agent and environments from scratch (as a new run would) and trains them
+    torch.manual_seed(0) ; numpy.random.seed(0)
+    train_env, eval_env = make_environment(ArrayInfrastructureManager, True), make_environment(ArrayInfrastructureManager, False)
+    model = nodes.construct_nn({"architecture": 'mlp', "hidden_sizes": [16], "activation_func": 'relu'}, 4, 4, INFRAGEN["n_cnodes"])
+    explorer = nodes.construct_explorer({"start_epsilon": 1.0, "end_epsilon": 0.1, "decay_steps": 200}, INFRAGEN["n_cnodes"])
+    ddqn_agent = nodes.construct_optimizer_and_ddqn_agent(model, {"learning_rate": 1e-3, "betas": [0.9, 0.99], "weight_decay": 0.0},
+                                                          nodes.construct_replay_buffer(rbuf), explorer, DDQN)
+    performance_records, _ = nodes.agent_and_envs_interaction(ddqn_agent, train_env, eval_env, dict(loop, max_episodes=max_episodes), INSTRUMENTATION, checkpoint)
+    return performance_records, ddqn_agent
+
+
+@pytest.mark.parametrize("storage", ['pfrl', 'array'])
+def test_resumed_training_matches_uninterrupted_training(tmp_path, monkeypatch, storage):
+    monkeypatch.chdir(tmp_path) # best agents are saved in the working directory
+    checkpoint = {"interval": 3, "filepath": str(tmp_path / "checkpoint"), "background": True, "resume": False}
+    rbuf = dict(RBUF, storage=storage)
+    uninterrupted_records, uninterrupted_agent = train(5, dict(checkpoint, interval=0), rbuf)
+    train(3, checkpoint, rbuf)
+    resumed_records, resumed_agent = train(5, dict(checkpoint, interval=0, resume=True), rbuf)
+    assert resumed_records == uninterrupted_records and len(resumed_records) == 5
+    assert resumed_agent.t == uninterrupted_agent.t and resumed_agent.optim_t == uninterrupted_agent.optim_t > 0
+    assert len(resumed_agent.replay_buffer) == len(uninterrupted_agent.replay_buffer)
+    for parameter, uninterrupted_parameter in zip(resumed_agent.model.parameters(), uninterrupted_agent.model.parameters()):
+        assert torch.equal(parameter, uninterrupted_parameter)
+
+
+def test_seeds_of_environments_in_worker_processes_are_checkpointed():
+    factory = functools.partial(make_environment, ArrayInfrastructureManager, True)
+    checkpointed_env = SubprocessVectorEnvironment([factory, factory], observation_size=6*4+4, n_actions=6, action_mask=False)
+    resumed_env = SubprocessVectorEnvironment([factory, factory], observation_size=6*4+4, n_actions=6, action_mask=False)
+    try:
+        for _ in range(3):
+            checkpointed_env.reset()
+        seeds = Checkpointing.environments_seeds(checkpointed_env)
+        assert len(seeds) == 2 and seeds != Checkpointing.environments_seeds(resumed_env)
+        Checkpointing.restore_environments_seeds(resumed_env, seeds)
+        assert Checkpointing.environments_seeds(resumed_env) == seeds
+        assert numpy.array_equal(resumed_env.reset(), checkpointed_env.reset())
+        with pytest.raises(ValueError):
+            Checkpointing.restore_environments_seeds(resumed_env, seeds[:1])
+    finally:
+        checkpointed_env.close() ; resumed_env.close()
+
+
+def test_checkpoint_dataset_loads_the_latest_version(tmp_path):
+    filepath = str(tmp_path / "checkpoint")
+    assert not CheckpointDataset(filepath=filepath, version=Version(None, None)).exists()
+    for episode in (1, 2):
+        data = {"arrays": {"states": numpy.full((3, 2), episode, dtype=numpy.float32)}, "torch": {"w": torch.ones(2) * episode}, "state": {"episode": episode}}
+        CheckpointDataset(filepath=filepath, version=Version(None, f"2024-01-01T00.00.0{episode}.000Z")).save(data) # distinct save versions
+    loaded = CheckpointDataset(filepath=filepath, version=Version(None, None)).load()
+    assert loaded["state"] == {"episode": 2} and torch.equal(loaded["torch"]["w"], torch.ones(2) * 2)
+    assert isinstance(loaded["arrays"]["states"], numpy.memmap) and (loaded["arrays"]["states"] == 2).all()
+    assert len(list((tmp_path / "checkpoint").iterdir())) == 2 and not list((tmp_path / "checkpoint").glob("*/*.tmp"))
@@ -0,0 +1,44 @@
+"""
+Checks that evaluations run by the evaluation worker record the same
+performances and save the same best agent as in-line evaluations, without
+changing training.
+"""
+import torch
+from kns.pipelines.ddqn_4_features import nodes
+from kns.pipelines.myclasses.EvaluationWorker import EvaluationWorker
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+from .test_checkpointing import train, LOOP, RBUF, DDQN
+from .test_infrastructure_managers import make_environment, INFRAGEN
+
+NO_CHECKPOINT = {"interval": 0, "filepath": "checkpoint", "background": False, "resume": False}
+
+
+def test_evaluation_worker_matches_inline_evaluation(tmp_path, monkeypatch):
+    runs = {}
+    for eval_worker in (False, True):
+        (tmp_path / str(eval_worker)).mkdir()
+        monkeypatch.chdir(tmp_path / str(eval_worker)) # best agents are saved in the working directory
+        performance_records, ddqn_agent = train(6, NO_CHECKPOINT, loop=dict(LOOP, eval_episodes_interval=2, eval_worker=eval_worker))
+        best_model = torch.load(tmp_path / str(eval_worker) / "myagent" / "model.pt")
+        runs[eval_worker] = performance_records, ddqn_agent, best_model
+    (inline_records, inline_agent, inline_best_model), (worker_records, worker_agent, worker_best_model) = runs[False], runs[True]
+    assert worker_records == inline_records and len(worker_records) == 3
+    assert worker_agent.t == inline_agent.t
+    assert all(torch.equal(worker_best_model[name], inline_best_model[name]) for name in inline_best_model)
+    assert sorted(path.name for path in (tmp_path / "True" / "myagent").iterdir()) == ["model.pt", "optimizer.pt", "target_model.pt"]
+
+
+def test_evaluation_worker_bounds_pending_evaluations(tmp_path):
+    torch.manual_seed(0)
+    model = nodes.construct_nn({"architecture": 'mlp', "hidden_sizes": [16], "activation_func": 'relu'}, 4, 4, INFRAGEN["n_cnodes"])
+    explorer = nodes.construct_explorer({"start_epsilon": 1.0, "end_epsilon": 0.1, "decay_steps": 200}, INFRAGEN["n_cnodes"])
+    ddqn_agent = nodes.construct_optimizer_and_ddqn_agent(model, {"learning_rate": 1e-3, "betas": [0.9, 0.99], "weight_decay": 0.0},
+                                                          nodes.construct_replay_buffer(RBUF), explorer, DDQN)
+    worker = EvaluationWorker(ddqn_agent, make_environment(ArrayInfrastructureManager, False), LOOP, agent_directory=str(tmp_path / "myagent"), max_pending=1)
+    performance_records, actions_records, best_performance = [], [], -1 # any recorded performance is a new best
+    for _ in range(3):
+        best_performance = worker.evaluate(ddqn_agent, None, LOOP, performance_records, actions_records, best_performance)
+        assert len(worker.pending) <= 1
+    best_performance = worker.close(performance_records, actions_records, best_performance)
+    assert len(performance_records) == 3 and best_performance == max(performance_records)
+    assert sorted(path.name for path in (tmp_path / "myagent").iterdir()) == ["model.pt", "optimizer.pt", "target_model.pt"]
@@ -0,0 +1,70 @@
+"""
+Checks the cnode choices of the heuristic placement baselines, that their
+vectorized batch_act acts as per-environment act calls, and that they run
+whole episodes on (vector) environments with or without action masks.
+"""
+import numpy
+import pytest
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+from kns.pipelines.myclasses.VectorEnvironment import VectorEnvironment
+from kns.pipelines.myclasses.HeuristicPolicies import HEURISTICS, HeuristicPolicy, run_heuristic_episodes
+from .test_infrastructure_managers import make_environment, INFRAGEN, NSPRGEN
+
+# cnode 0 can't host the VNF, cnode 1 is the tightest fit, cnode 2 the loosest and cnode 3 has the most bandwidth around
+CNODES = numpy.array([[5.0, 100.0, 100.0, 50.0], [20.0, 20.0, 20.0, 40.0], [200.0, 200.0, 200.0, 30.0], [50.0, 50.0, 50.0, 400.0]], dtype=numpy.float32)
+
+
+def observation(requirements):
+    return CNODES.reshape(-1), numpy.array(requirements, dtype=numpy.float32)
+
+
+def test_heuristics_choose_their_cnode():
+    first_vnf = observation([10.0, 10.0, 10.0, 0.0])
+    assert [HeuristicPolicy(heuristic).act(first_vnf) for heuristic in ['first_fit', 'best_fit', 'worst_fit', 'bandwidth_greedy']] == [1, 1, 2, 3]
+    policy = HeuristicPolicy('bandwidth_greedy')
+    policy.act(observation([10.0, 10.0, 10.0, 0.0]))
+    assert policy.act(observation([10.0, 10.0, 10.0, 35.0])) == 3 # precedent VNF's cnode
+    policy.last_actions[:] = 2
+    assert policy.act(observation([10.0, 10.0, 10.0, 35.0])) == 2 # not enough bandwidth around cnode 2 but no virtual link to route
+    assert HeuristicPolicy('first_fit').act(observation([10.0, 10.0, 10.0, 45.0])) == 3 # first VNF on cnode -1 : bandwidth needed around cnode 1
+    mask = numpy.array([False, False, True, False])
+    assert HeuristicPolicy('best_fit').act(observation([10.0, 10.0, 10.0, 0.0]) + (mask,)) == 2
+    with pytest.raises(AssertionError):
+        HeuristicPolicy('random_fit')
+
+
+@pytest.mark.parametrize("heuristic", sorted(HEURISTICS))
+def test_batch_act_acts_as_per_environment_act(heuristic):
+    rng = numpy.random.default_rng(0)
+    batch_obs = numpy.concatenate((rng.uniform(0.0, 300.0, size=(32, 4*6)), rng.uniform(0.0, 70.0, size=(32, 4))), axis=1).astype(numpy.float32)
+    policies = [HeuristicPolicy(heuristic) for _ in range(len(batch_obs))]
+    batch_policy = HeuristicPolicy(heuristic)
+    for _ in range(3):
+        actions = [policy.act((obs[:-4], obs[-4:])) for policy, obs in zip(policies, batch_obs)]
+        assert batch_policy.batch_act(batch_obs).tolist() == actions
+        batch_obs = numpy.roll(batch_obs, 1, axis=0) # next VNFs of the same environments
+
+
+@pytest.mark.parametrize("action_mask", [False, True])
+def test_heuristic_episodes_run_in_parallel(action_mask):
+    vector_env = VectorEnvironment([make_environment(ArrayInfrastructureManager, False, action_mask=action_mask) for _ in range(3)])
+    performances = run_heuristic_episodes(HeuristicPolicy('best_fit'), vector_env, episodes_per_env=2)
+    vector_env.close()
+    assert len(performances) == 3 and all(len(env_performances) == 2 for env_performances in performances)
+    assert all(performance > 0 for env_performances in performances for performance in env_performances)
+    assert len({tuple(env_performances) for env_performances in performances}) == 1 # evaluation environments replay the same episode
+
+
+@pytest.mark.parametrize("env_workers", [False, True])
+def test_baseline_comparison_reports_heuristics_next_to_ddqn(env_workers):
+    nodes = pytest.importorskip("kns.pipelines.ddqn_4_features.nodes") # the pipeline needs torch and pfrl, the heuristics don't
+    envs = {"failed_nspr_strategy": 2, "keep_information": True, "action_mask": False, "infrastructure_backend": 'array', "candidate_paths": 3, "nspr_selection": 'fifo'}
+    baselines = {"heuristics": ['first_fit', 'bandwidth_greedy'], "n_episodes": 3, "env_workers": env_workers}
+    comparison = nodes.compare_with_heuristic_baselines([4, 9, 7], INFRAGEN, NSPRGEN, envs, 4, baselines)
+    assert comparison["ddqn"] == {"evaluations": 3, "best": 9, "last": 7}
+    for heuristic in baselines["heuristics"]:
+        report = comparison[heuristic]
+        assert len(report["episodes"]) == 3 and report["evaluation_episode"] == report["episodes"][0]
+        assert report["min"] <= report["mean"] <= report["max"]
+    environment = nodes.build_environment(INFRAGEN, NSPRGEN, dict(envs, action_mask=True), False) # heuristics are compared with action masks
+    assert run_heuristic_episodes(HeuristicPolicy('first_fit'), VectorEnvironment([environment]))[0][0] == comparison["first_fit"]["evaluation_episode"]
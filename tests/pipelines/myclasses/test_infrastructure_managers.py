@@ -0,0 +1,205 @@
+"""
+Checks that the array-backed infrastructure state engine gives exactly the
+same results as the networkx-backed reference implementation, and that both
+path searches return the path of the former list-of-paths mBFS.
+"""
+import copy
+import numpy
+import networkx
+import pytest
+from kns.pipelines.myclasses.InfrastructureGenerator import InfrastructureGenerator, InfrastructureSnapshot
+from kns.pipelines.myclasses.InfrastructureManager import InfrastructureManager
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+from kns.pipelines.myclasses.NSPRGenerator import NSPRGenerator
+from kns.pipelines.myclasses.NSPRLifecycleManager import NSPRLifecycleManager
+from kns.pipelines.myclasses.Environment import Environment
+
+INFRAGEN = {"infrastructure": 1, "n_cnodes": 6, "train_seed": 1, "eval_seed": 99999999,
+            "min_cpu": 150.0, "max_cpu": 300.0, "min_ram": 150.0, "max_ram": 300.0, "min_stor": 150.0, "max_stor": 300.0,
+            "cnodePl_min_bw": 100.0, "cnodePl_max_bw": 500.0, "corePl_min_bw": 300.0, "corePl_max_bw": 3000.0,
+            "min_latency": 4.0, "max_latency": 8.0}
+NSPRGEN = {"train_seed": 8888888888, "eval_seed": 7777777778,
+           "rq_min_cpu": 3.0, "rq_max_cpu": 40.0, "rq_min_ram": 3.0, "rq_max_ram": 40.0, "rq_min_stor": 3.0, "rq_max_stor": 40.0,
+           "rq_min_bw": 3.0, "rq_max_bw": 70.0, "min_vnfs": 5, "max_vnfs": 15, "min_duration": 2, "max_duration": 6,
+           "min_batch_nsprs": 1, "max_batch_nsprs": 3, "priorities": [1, 2, 3], "nspr_types": ['hard', 'soft'], "pregenerated_batches": 8,
+           "arrivals": {"process": "tick"}}
+
+
+def make_environment(infrastructure_manager_class, is_for_train, action_mask=False, keep_information=True, **manager_kwargs):
+    infragen = dict(INFRAGEN, is_for_train=is_for_train)
+    nsprgen = dict(NSPRGEN, is_for_train=is_for_train)
+    return Environment(infrastructure_manager=infrastructure_manager_class(InfrastructureGenerator(infragen), **manager_kwargs),
+                       nsprs_generator=NSPRGenerator(nsprgen),
+                       nsprs_lifecycle_manager=NSPRLifecycleManager(),
+                       failed_nspr_strategy=2,
+                       keep_information=keep_information,
+                       action_mask=action_mask)
+
+
+@pytest.mark.parametrize("candidate_paths", [0, 1, 3])
+@pytest.mark.parametrize("is_for_train", [True, False])
+def test_array_backend_matches_graph_backend(is_for_train, candidate_paths):
+    graph_env = make_environment(InfrastructureManager, is_for_train)
+    array_env = make_environment(ArrayInfrastructureManager, is_for_train, candidate_paths=candidate_paths)
+    actions = numpy.random.default_rng(0)
+    for _ in range(5):
+        graph_obs = graph_env.reset()
+        array_obs = array_env.reset()
+        assert list(graph_obs[0]) == list(array_obs[0])
+        done = False
+        while not done:
+            action = int(actions.integers(0, INFRAGEN["n_cnodes"]))
+            graph_obs, graph_reward, done, _ = graph_env.step(action)
+            array_obs, array_reward, array_done, _ = array_env.step(action)
+            assert list(graph_obs[0]) == list(array_obs[0])
+            assert graph_obs[1] == array_obs[1]
+            assert graph_reward == array_reward
+            assert done == array_done
+        assert graph_env.nsprs_lifecycle_manager.running_and_successfully_terminated_nsprs() == \
+               array_env.nsprs_lifecycle_manager.running_and_successfully_terminated_nsprs()
+
+
+def test_array_backend_finds_same_paths():
+    graph_manager = InfrastructureManager(InfrastructureGenerator(dict(INFRAGEN, is_for_train=True)))
+    array_manager = ArrayInfrastructureManager(InfrastructureGenerator(dict(INFRAGEN, is_for_train=True)))
+    for cnode_id1 in range(1, INFRAGEN["n_cnodes"]+1):
+        for cnode_id2 in range(1, INFRAGEN["n_cnodes"]+1):
+            if cnode_id1 == cnode_id2:
+                continue
+            for bandwidth, nsprtype in [(50.0, 'hard'), (450.0, 'hard'), (10000.0, 'hard'), (10000.0, 'soft')]:
+                graph_path = graph_manager.found_a_valid_path_between("s"+str(cnode_id1), "s"+str(cnode_id2), bandwidth, nsprtype)
+                array_path = array_manager.found_a_valid_path_between("s"+str(cnode_id1), "s"+str(cnode_id2), bandwidth, nsprtype)
+                assert graph_path == array_path
+                if graph_path is not None:
+                    assert graph_manager.allocate_path(graph_path, bandwidth) == array_manager.allocate_path(array_path, bandwidth)
+
+
+@pytest.mark.parametrize("infrastructure_manager_class", [InfrastructureManager, ArrayInfrastructureManager])
+def test_action_mask_predicts_placements(infrastructure_manager_class):
+    env = make_environment(infrastructure_manager_class, True, action_mask=True)
+    actions = numpy.random.default_rng(1)
+    for _ in range(3):
+        obs = env.reset()
+        done = False
+        while not done:
+            action = int(actions.integers(0, INFRAGEN["n_cnodes"]))
+            feasible = bool(obs[2][action])
+            obs, reward, done, _ = env.step(action)
+            assert feasible == (reward != -100.0)
+
+
+@pytest.mark.parametrize("infrastructure_manager_class", [InfrastructureManager, ArrayInfrastructureManager])
+def test_incremental_observation_matches_rebuilt_one(infrastructure_manager_class):
+    env = make_environment(infrastructure_manager_class, True)
+    manager = env.infrastructure_manager
+    actions = numpy.random.default_rng(2)
+    for _ in range(3):
+        obs = env.reset()
+        done = False
+        while not done:
+            assert obs[0] is manager.describe() and obs[0].dtype == numpy.float32 # view on the maintained buffer
+            maintained = (manager.observation.copy(), manager.cnodes_bandwidth.copy())
+            manager.build_observation()
+            assert numpy.array_equal(maintained[0], manager.observation)
+            assert numpy.array_equal(maintained[1], manager.cnodes_bandwidth)
+            obs, _, done, _ = env.step(int(actions.integers(0, INFRAGEN["n_cnodes"])))
+
+
+@pytest.mark.parametrize("infrastructure_manager_class", [InfrastructureManager, ArrayInfrastructureManager])
+def test_evaluation_resets_restore_the_same_infrastructure(infrastructure_manager_class, monkeypatch):
+    restores = []
+    monkeypatch.setattr(InfrastructureSnapshot, "restore", lambda snapshot, infrastructure, restore=InfrastructureSnapshot.restore: restores.append(restore(snapshot, infrastructure)))
+    env = make_environment(infrastructure_manager_class, False)
+    generator = env.infrastructure_manager.infrastructure_generator
+    actions = numpy.random.default_rng(4)
+    initial_obs = env.reset()[0].copy()
+    infrastructure = generator.backup_of_infrastructure
+    for _ in range(2):
+        done = False
+        while not done:
+            _, _, done, _ = env.step(int(actions.integers(0, INFRAGEN["n_cnodes"])))
+        assert numpy.array_equal(env.reset()[0], initial_obs)
+        assert generator.backup_of_infrastructure is infrastructure # restored, not copied
+    assert len(restores) == (0 if infrastructure_manager_class is ArrayInfrastructureManager else 3) # one per reset, the array backend never writes into the graph
+    fresh_infrastructure = InfrastructureGenerator(dict(INFRAGEN, is_for_train=False)).generate()
+    assert dict(infrastructure.nodes.data()) == dict(fresh_infrastructure.nodes.data())
+    assert list(infrastructure.edges.data()) == list(fresh_infrastructure.edges.data())
+
+
+def list_of_paths_mbfs(infrastructure, cnode_id1, cnode_id2, bandwidth, nsprtype):
+    # former InfrastructureManager.found_a_valid_path_between
+    paths = [[cnode_id1]]
+    while len(paths) != 0:
+        path = paths.pop(0)
+        if path[-1] == cnode_id2:
+            return path
+        for neighbor in networkx.neighbors(infrastructure, path[-1]):
+            bw = infrastructure[path[-1]][neighbor]["bw"]
+            if neighbor not in path and ((nsprtype == 'hard' and bw >= bandwidth) or (nsprtype == 'soft' and bw > 0)):
+                paths.append(path+[neighbor])
+    return None
+
+
+class FixedInfrastructureGenerator:
+    def __init__(self, infrastructure) -> None:
+        self.infrastructure = infrastructure
+        self.max_cpu = self.max_ram = self.max_stor = 1.0
+
+    def generate(self):
+        return copy.deepcopy(self.infrastructure)
+
+    def reset(self):
+        pass
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_path_searches_match_list_of_paths_mbfs(seed):
+    numpy_gen = numpy.random.default_rng(seed)
+    infrastructure = networkx.Graph()
+    for i in range(1, 16):
+        infrastructure.add_node("s"+str(i), cpu=1.0, ram=1.0, stor=1.0)
+    for router1, router2 in networkx.random_regular_graph(3, 20, seed=seed).edges:
+        infrastructure.add_edge("r"+str(router1), "r"+str(router2), bw=numpy_gen.choice([0.0, 20.0, 60.0]))
+    for i in range(1, 16):
+        infrastructure.add_edge("s"+str(i), "r"+str(numpy_gen.integers(0, 20)), bw=100.0)
+    graph_manager = InfrastructureManager(FixedInfrastructureGenerator(infrastructure))
+    array_managers = [ArrayInfrastructureManager(FixedInfrastructureGenerator(infrastructure), candidate_paths=k) for k in [0, 1, 4]]
+    for cnode_id1 in range(1, 16):
+        for cnode_id2 in range(1, 16):
+            if cnode_id1 == cnode_id2:
+                continue
+            for bandwidth, nsprtype in [(10.0, 'hard'), (50.0, 'hard'), (50.0, 'soft')]:
+                query = ("s"+str(cnode_id1), "s"+str(cnode_id2), bandwidth, nsprtype)
+                expected = list_of_paths_mbfs(infrastructure, *query)
+                assert graph_manager.found_a_valid_path_between(*query) == expected
+                for array_manager in array_managers:
+                    assert array_manager.found_a_valid_path_between(*query) == expected
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_candidate_paths_are_the_first_mbfs_paths(seed):
+    numpy_gen = numpy.random.default_rng(seed)
+    infrastructure = networkx.Graph()
+    for i in range(1, 9):
+        infrastructure.add_node("s"+str(i), cpu=1.0, ram=1.0, stor=1.0)
+    for router1, router2 in networkx.random_regular_graph(3, 10, seed=seed).edges:
+        infrastructure.add_edge("r"+str(router1), "r"+str(router2), bw=1.0)
+    for i in range(1, 9):
+        infrastructure.add_edge("s"+str(i), "r"+str(numpy_gen.integers(0, 10)), bw=1.0)
+    infrastructure.add_node("s9", cpu=1.0, ram=1.0, stor=1.0) # isolated cnode
+    manager = ArrayInfrastructureManager(FixedInfrastructureGenerator(infrastructure), candidate_paths=5)
+    index = manager.candidate_path_index
+    assert len(index.candidates) == 0 # built on demand
+    for source in range(9):
+        expected = {target: [] for target in range(9)}
+        paths = [[source]] # every simple path, in list-of-paths mBFS order
+        while len(paths) != 0:
+            path = paths.pop(0)
+            if path[-1] < 9 and path[-1] != source:
+                expected[path[-1]].append(path)
+            paths += [path+[neighbor] for neighbor in manager.neighbors[manager.indptr[path[-1]]:manager.indptr[path[-1]+1]].tolist() if neighbor not in path]
+        for target in range(9):
+            if target != source:
+                candidates, _, _, exhaustive = index.candidates_of(source, target)
+                assert candidates == expected[target][:5]
+                assert exhaustive == (len(expected[target]) < 5)
@@ -0,0 +1,44 @@
+"""
+Checks the training loop instrumentation: timed environments behave the same,
+phases are counted, and profiles of an episode window are written.
+"""
+import numpy
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+from kns.pipelines.myclasses.Instrumentation import PhaseTimers, EpisodeProfiler
+from .test_infrastructure_managers import make_environment, INFRAGEN
+
+
+def test_instrumented_environment_behaves_the_same():
+    env, instrumented_env = make_environment(ArrayInfrastructureManager, True), make_environment(ArrayInfrastructureManager, True)
+    timers = PhaseTimers()
+    instrumented_env.instrument(timers)
+    assert "step" not in vars(env) and "step" in vars(instrumented_env) # nothing is wrapped unless instrumented
+    actions = numpy.random.default_rng(0)
+    steps = 0
+    for _ in range(3):
+        obs, instrumented_obs = env.reset(), instrumented_env.reset()
+        done = False
+        while not done:
+            action = int(actions.integers(0, INFRAGEN["n_cnodes"]))
+            obs, reward, done, _ = env.step(action)
+            instrumented_obs, instrumented_reward, _, _ = instrumented_env.step(action)
+            assert list(obs[0]) == list(instrumented_obs[0]) and reward == instrumented_reward
+            steps += 1
+    assert timers.calls["env.step"] == timers.calls["env.place"] == steps and timers.calls["env.reset"] == 3
+    report = timers.report(3, timers.calls["env.step"], 0)
+    assert report["env_steps"] == steps and report["env_steps_per_second"] > 0 and report["updates_per_second"] == 0
+    assert set(report["phases"]) == {"env.step", "env.reset", "env.place", "env.load_nspr", "env.simulation_clock"} # no action mask
+    assert report["phases"]["env.step"]["seconds"] >= report["phases"]["env.place"]["seconds"]
+    assert timers.reports == [report] and PhaseTimers.summary(report).startswith("episode 3:")
+
+
+def test_profiler_captures_the_episode_window(tmp_path):
+    profiler = EpisodeProfiler('cprofile', 2, 3, str(tmp_path / "reports" / "profile"))
+    env = make_environment(ArrayInfrastructureManager, True)
+    for episode in range(1, 5):
+        profiler.episode_started(episode)
+        env.reset()
+        profiler.episode_finished(episode)
+    profiler.stop() # nothing left to stop
+    assert sorted(path.name for path in (tmp_path / "reports").iterdir()) == ["profile.prof", "profile.txt"]
+    assert "reset" in (tmp_path / "reports" / "profile.txt").read_text()
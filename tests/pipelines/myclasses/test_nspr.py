@@ -0,0 +1,64 @@
+"""
+Checks the array-backed NSPR keeps the behaviour of the former networkx one.
+"""
+import copy
+import numpy
+from kns.pipelines.myclasses.NSPRGenerator import NSPR, NSPRGenerator
+from .test_infrastructure_managers import NSPRGEN
+
+
+def test_nspr_api():
+    nspr = NSPR(id="NSPR1", priority=2, duration=3, nsprtype='hard')
+    for i in range(5): # more VNFs than the initial capacity
+        nspr.add_vnf(rq_cpu=float(i), rq_ram=10.0+i, rq_stor=20.0+i, rq_bw=30.0+i)
+    assert nspr.get_id() == "NSPR1" and nspr.n_vnfs() == 5
+    assert nspr.describe_vnfs() == [[0.0, 10.0, 20.0, 0.0]] + [[float(i), 10.0+i, 20.0+i, 30.0+i] for i in range(1, 5)]
+    assert nspr.describe_vnfs() == NSPR("NSPR1", 2, 3, 'hard', vnfs_requirements=numpy.array(nspr.describe_vnfs())).describe_vnfs()
+    assert nspr.get_placement(1) is None and nspr.get_satisfied_resources(1) is None
+    assert nspr.get_matching(1) == "NoNeed" and nspr.get_satisfied_bw(1) == "NoNeed"
+    assert nspr.get_matching(2) is None and nspr.get_satisfied_bw(2) is None
+    #---place the two first VNFs---
+    nspr.set_placement(1, 4)
+    nspr.set_satisfied_resources(1, [0.0, 10.0, 20.0])
+    nspr.set_placement(2, 6)
+    nspr.set_satisfied_resources(2, [1.0, 11.0, 19.5])
+    nspr.set_matching(2, ["s4", "r1", "s6"])
+    nspr.set_satisfied_bw(2, 31.0)
+    assert nspr.get_placement(2) == "s6" and nspr.get_placement_id(2) == 6 and nspr.get_placement(3) is None
+    assert nspr.get_satisfied_resources(2) == [1.0, 11.0, 19.5]
+    assert nspr.get_matching(2) == ["s4", "r1", "s6"] and nspr.get_satisfied_bw(2) == 31.0
+    assert nspr.number_of_placed_vnfs() == 2
+    #---copies are independent---
+    nspr_copy = copy.deepcopy(nspr)
+    nspr.unset_placements_and_matchings()
+    assert [nspr.get_placement(vnf_id) for vnf_id in range(1, 6)] == [None] * 5
+    assert nspr.get_satisfied_resources(2) is None and nspr.get_matching(2) is None and nspr.get_satisfied_bw(2) is None
+    assert nspr_copy.get_placement(2) == "s6" and nspr_copy.get_matching(2) == ["s4", "r1", "s6"]
+
+
+def test_generation_is_seeded_and_pregenerated_in_order():
+    # chunks pregenerated ahead of time are the batches generate would have drawn next, and the global generator is never used
+    generator, pregenerating_generator = NSPRGenerator(dict(NSPRGEN, is_for_train=True)), NSPRGenerator(dict(NSPRGEN, is_for_train=True))
+    for _ in range(3):
+        pregenerating_generator.pregenerate(NSPRGEN["pregenerated_batches"])
+    numpy.random.seed(0)
+    batches = [generator.generate() for _ in range(3*NSPRGEN["pregenerated_batches"]+2)]
+    numpy.random.seed(1)
+    pregenerated = [pregenerating_generator.generate() for _ in range(3*NSPRGEN["pregenerated_batches"])]
+    assert [describe(batch) for batch in batches[:len(pregenerated)]] == [describe(batch) for batch in pregenerated]
+    assert {len(batch) for batch in batches} == {NSPRGEN["min_batch_nsprs"], 2, NSPRGEN["max_batch_nsprs"]}
+    assert all(NSPRGEN["min_vnfs"] <= nspr.n_vnfs() <= NSPRGEN["max_vnfs"] for batch in batches for nspr in batch)
+    generator.reset() ; pregenerating_generator.reset() # same new seed for both
+    assert describe(generator.generate()) == describe(pregenerating_generator.generate())
+
+
+def test_workload_does_not_depend_on_pregenerated_batches():
+    batches = {}
+    for pregenerated_batches in (1, 3, 64):
+        generator = NSPRGenerator(dict(NSPRGEN, is_for_train=True, pregenerated_batches=pregenerated_batches))
+        batches[pregenerated_batches] = [describe(generator.generate()) for _ in range(70)]
+    assert batches[1] == batches[3] == batches[64]
+
+
+def describe(batch):
+    return [(nspr.get_id(), nspr.get_priority(), nspr.get_initial_duration(), nspr.get_nspr_type(), nspr.describe_vnfs()) for nspr in batch]
@@ -0,0 +1,53 @@
+"""
+Checks the expiry heap of NSPRLifecycleManager against tick-by-tick duration
+decrements, and that expired NSPRs give all their resources back.
+"""
+import numpy
+import pytest
+from kns.pipelines.myclasses.NSPRGenerator import NSPR
+from kns.pipelines.myclasses.NSPRLifecycleManager import NSPRLifecycleManager
+from kns.pipelines.myclasses.InfrastructureManager import InfrastructureManager
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+from .test_infrastructure_managers import make_environment, INFRAGEN
+
+
+def test_expiries_match_tick_by_tick_decrements():
+    numpy_gen = numpy.random.default_rng(0)
+    manager = NSPRLifecycleManager()
+    remaining = {} # reference : nspr -> remaining duration decremented at every tick
+    for tick in range(200):
+        for nspr_id in range(int(numpy_gen.integers(0, 4))):
+            nspr = NSPR(id="NSPR"+str(tick)+"_"+str(nspr_id), priority=1, duration=int(numpy_gen.integers(1, 20)), nsprtype='hard')
+            manager.add_to_running_nsprs(nspr)
+            remaining[nspr] = nspr.duration
+        for nspr in remaining:
+            remaining[nspr] -= 1
+        expected = [nspr for nspr, duration in remaining.items() if duration == 0]
+        expired = manager.advance_clock()
+        assert sorted(expired, key=id) == sorted(expected, key=id) # the running objects themselves, no copies
+        for nspr in expected:
+            del remaining[nspr]
+            assert nspr.get_status_chain() == "running-successTerminate"
+        assert manager.running_nsprs() == len(remaining)
+    assert manager.successfully_terminated_nsprs() == len(manager.nsprs_terminated_after_running) > 0
+
+
+@pytest.mark.parametrize("infrastructure_manager_class", [InfrastructureManager, ArrayInfrastructureManager])
+def test_dropping_information_still_frees_resources(infrastructure_manager_class):
+    # placements of expired NSPRs used to be unset before their deallocation, leaking their resources
+    kept_env = make_environment(infrastructure_manager_class, True, keep_information=True)
+    dropped_env = make_environment(infrastructure_manager_class, True, keep_information=False)
+    actions = numpy.random.default_rng(3)
+    n_terminated = 0
+    for _ in range(3):
+        kept_obs, dropped_obs = kept_env.reset(), dropped_env.reset()
+        done = False
+        while not done:
+            assert numpy.array_equal(kept_obs[0], dropped_obs[0])
+            action = int(actions.integers(0, INFRAGEN["n_cnodes"]))
+            kept_obs, _, done, _ = kept_env.step(action)
+            dropped_obs, _, _, _ = dropped_env.step(action)
+        terminated = dropped_env.nsprs_lifecycle_manager.nsprs_terminated_after_running
+        assert all(nspr.get_placement(1) is None for nspr in terminated)
+        n_terminated += len(terminated)
+    assert n_terminated > 0
@@ -0,0 +1,62 @@
+"""
+Checks the allocability+flexibility selection of waiting NSPRs and its use by
+the lifecycle manager and the environment.
+"""
+import numpy
+import pytest
+from kns.pipelines.myclasses.InfrastructureGenerator import InfrastructureGenerator
+from kns.pipelines.myclasses.InfrastructureManager import InfrastructureManager
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+from kns.pipelines.myclasses.NSPRGenerator import NSPR
+from kns.pipelines.myclasses.NSPRLifecycleManager import NSPRLifecycleManager
+from kns.pipelines.myclasses.NSPRSelector import NSPRSelector
+from .test_infrastructure_managers import make_environment, INFRAGEN
+
+
+def make_nspr(id, nsprtype, requirements):
+    return NSPR(id=id, priority=1, duration=3, nsprtype=nsprtype, vnfs_requirements=numpy.array(requirements, dtype=numpy.float64))
+
+
+@pytest.mark.parametrize("infrastructure_manager_class", [InfrastructureManager, ArrayInfrastructureManager])
+def test_selector_prefers_allocable_and_flexible_nsprs(infrastructure_manager_class):
+    selector = NSPRSelector(infrastructure_manager_class(InfrastructureGenerator(dict(INFRAGEN, is_for_train=True))))
+    unplaceable = make_nspr("NSPR1", 'hard', [[1000.0, 1000.0, 1000.0, 0.0], [1000.0, 1000.0, 1000.0, 50.0]])
+    demanding = make_nspr("NSPR2", 'hard', [[250.0, 250.0, 250.0, 0.0], [250.0, 250.0, 250.0, 50.0]])
+    small = make_nspr("NSPR3", 'hard', [[10.0, 10.0, 10.0, 0.0], [10.0, 10.0, 10.0, 50.0]])
+    small_twin = make_nspr("NSPR4", 'hard', [[10.0, 10.0, 10.0, 0.0], [10.0, 10.0, 10.0, 50.0]])
+    batch = [unplaceable, demanding, small, small_twin]
+    scores = selector.scores(batch)
+    assert scores[0] < scores[1] < scores[2] == scores[3] == 2.0
+    assert selector.choose_best_slice(batch) == (2, small) # earliest on ties
+    assert batch == [unplaceable, demanding, small, small_twin] and unplaceable.describe_vnfs()[0] == [1000.0, 1000.0, 1000.0, 0.0]
+    # soft NSPRs can be placed on any cnode with free resources
+    soft_scores = selector.scores([make_nspr("NSPR5", 'soft', unplaceable.describe_vnfs()), unplaceable])
+    assert soft_scores[0] - soft_scores[1] == 1.0
+
+
+def test_retrieval_skips_empty_batches():
+    manager = NSPRLifecycleManager()
+    manager.add_to_waiting_nsprs([])
+    nsprs = [make_nspr("NSPR"+str(i), 'hard', [[10.0*i, 10.0, 10.0, 0.0]]) for i in range(1, 4)]
+    manager.add_to_waiting_nsprs(list(nsprs))
+    assert manager.retrieve_a_waiting_nspr() is nsprs[0]
+    selector = NSPRSelector(InfrastructureManager(InfrastructureGenerator(dict(INFRAGEN, is_for_train=True))))
+    assert manager.retrieve_a_waiting_nspr(selector) is nsprs[1] # the waiting NSPR itself, not a copy
+    assert manager.nsprs_waiting == [[nsprs[2]]] and nsprs[1].get_status_chain() == "waiting-processing"
+
+
+def test_selection_is_the_same_on_both_backends():
+    graph_env = make_environment(InfrastructureManager, True)
+    array_env = make_environment(ArrayInfrastructureManager, True)
+    for env in (graph_env, array_env):
+        env.nspr_selector = NSPRSelector(env.infrastructure_manager)
+    actions = numpy.random.default_rng(5)
+    for _ in range(3):
+        graph_obs, array_obs = graph_env.reset(), array_env.reset()
+        done = False
+        while not done:
+            assert list(graph_obs[0]) == list(array_obs[0])
+            assert graph_env.ongoing_nspr.get_id() == array_env.ongoing_nspr.get_id()
+            action = int(actions.integers(0, INFRAGEN["n_cnodes"]))
+            graph_obs, _, done, _ = graph_env.step(action)
+            array_obs, _, _, _ = array_env.step(action)
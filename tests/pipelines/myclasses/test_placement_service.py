@@ -0,0 +1,130 @@
+"""
+Checks that the placement service micro-batches concurrent requests, keeps
+the live infrastructure consistent (expired NSPRs give back exactly what they
+took, rejected ones leave nothing behind) and answers over HTTP.
+"""
+import json
+import threading
+import urllib.error
+import urllib.request
+import numpy
+import torch
+import pytest
+from kns.pipelines.ddqn_4_features import nodes
+from kns.pipelines.myclasses.NSPRGenerator import NSPR, NSPRGenerator
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+from kns.pipelines.myclasses.PlacementService import PlacementService, PlacementHTTPServer, load_q_function
+from kns.pipelines.myclasses.QFunctionExport import ExportedQFunction
+from .test_infrastructure_managers import make_environment, INFRAGEN, NSPRGEN
+
+
+def make_service(export=False, **kwargs):
+    torch.manual_seed(0)
+    environment = make_environment(ArrayInfrastructureManager, False)
+    model = nodes.construct_nn({"architecture": 'mlp', "hidden_sizes": [16], "activation_func": 'relu'}, 4, 4, INFRAGEN["n_cnodes"])
+    if export:
+        model = ExportedQFunction(model, 4*INFRAGEN["n_cnodes"] + 4)
+    return PlacementService(model, environment, **kwargs)
+
+
+def test_concurrent_requests_are_batched_and_expired_nsprs_free_their_resources():
+    service = make_service(max_batch_size=16, max_wait=0.05)
+    initial_observation = service.environment.infrastructure_manager.describe().copy()
+    generator = NSPRGenerator(dict(NSPRGEN, is_for_train=False))
+    nsprs = [nspr for _ in range(8) for nspr in generator.next_arrival()[1]]
+    results = [future.result() for future in [service.submit(nspr, arrival_time=0) for nspr in nsprs]]
+    assert service.stats()["batches"] < len(nsprs) and service.stats()["forward_passes"] <= max(nspr.n_vnfs() for nspr in nsprs) * service.stats()["batches"]
+    assert any(result["accepted"] for result in results)
+    for nspr, result in zip(nsprs, results):
+        assert result["nspr_id"] == nspr.id
+        assert result["placements"] == (nspr.placements[:nspr.n_vnfs()].tolist() if result["accepted"] else [])
+    assert service.environment.nsprs_lifecycle_manager.running_nsprs() == sum(result["accepted"] for result in results)
+    service.place(NSPR("late", 1, 1, 'hard', [[1.0, 1.0, 1.0, 0.0]]), arrival_time=NSPRGEN["max_duration"]) # every NSPR of the burst expired
+    late_observation = service.environment.infrastructure_manager.describe()
+    service.close()
+    assert numpy.allclose(late_observation.reshape(-1, 4)[:, :3].sum(axis=0) + 1.0, initial_observation.reshape(-1, 4)[:, :3].sum(axis=0))
+    stats = service.stats()
+    assert stats["requests"] == len(nsprs) + 1 and stats["p50_ms"] <= stats["p99_ms"] and stats["throughput"] > 0
+
+
+def test_exported_q_function_places_as_the_eager_one():
+    placements = []
+    for export in (False, True):
+        service = make_service(export)
+        generator = NSPRGenerator(dict(NSPRGEN, is_for_train=False))
+        placements.append([service.place(nspr, arrival_time)["placements"] for arrival_time, nsprs in [generator.next_arrival() for _ in range(20)] for nspr in nsprs])
+        service.close()
+    assert placements[0] == placements[1] and any(len(nspr_placements) > 0 for nspr_placements in placements[0])
+
+
+def test_unplaceable_nspr_is_rejected_without_side_effects():
+    service = make_service()
+    initial_observation = service.environment.infrastructure_manager.describe().copy()
+    result = service.place(NSPR("big", 1, 5, 'hard', [[10.0, 10.0, 10.0, 0.0], [1e9, 10.0, 10.0, 5.0]]))
+    service.close()
+    assert result == {"nspr_id": "big", "accepted": False, "placements": []}
+    assert (service.environment.infrastructure_manager.describe() == initial_observation).all()
+
+
+VNFS = [[5.0, 5.0, 5.0, 0.0]]
+
+
+@pytest.mark.parametrize("payload", [{"vnfs": [], "duration": 10, "arrival_time": 0}, {"vnfs": [[5.0, 5.0, 5.0]], "duration": 10, "arrival_time": 0},
+                                     {"vnfs": [[5.0, 5.0, "5", 0.0]], "duration": 10, "arrival_time": 0}, {"vnfs": VNFS, "duration": 0, "arrival_time": 0},
+                                     {"vnfs": VNFS, "duration": 10}, {"vnfs": VNFS, "duration": 10, "arrival_time": "3"},
+                                     {"vnfs": VNFS, "duration": 10, "arrival_time": -1}, {"vnfs": VNFS, "duration": 10, "arrival_time": 0, "nsprtype": 'medium'},
+                                     {"vnfs": VNFS, "duration": 10, "arrival_time": 0, "priority": "high"}])
+def test_malformed_request_fails_on_its_own(payload):
+    service = make_service(max_batch_size=16, max_wait=0.05)
+    generator = NSPRGenerator(dict(NSPRGEN, is_for_train=False))
+    futures = [service.submit(nspr, arrival_time=0) for nspr in generator.next_arrival()[1]] # same micro-batch as the malformed request
+    with pytest.raises(ValueError):
+        service.place_request(payload)
+    with pytest.raises(ValueError):
+        service.place(NSPR("empty", 1, 1, 'hard'))
+    results = [future.result(timeout=10) for future in futures]
+    service.close()
+    assert all(isinstance(result["accepted"], bool) for result in results) and service.stats()["requests"] == len(futures)
+
+
+def test_failing_batch_gives_back_the_resources_of_its_unfinished_nsprs(monkeypatch):
+    service = make_service(max_batch_size=16, max_wait=0.05)
+    initial_observation = service.environment.infrastructure_manager.describe().copy()
+    compute_action_mask = service.environment.compute_action_mask
+    def failing_action_mask(nspr, vnf_id, vnf_requirements):
+        if nspr.id == "bad" and vnf_id == 2:
+            raise RuntimeError("unexpected failure")
+        return compute_action_mask(nspr, vnf_id, vnf_requirements)
+    monkeypatch.setattr(service.environment, "compute_action_mask", failing_action_mask)
+    nsprs = [NSPR(i, 1, 5, 'hard', [[5.0, 5.0, 5.0, 0.0], [5.0, 5.0, 5.0, 4.0], [5.0, 5.0, 5.0, 4.0]]) for i in range(3)]
+    futures = [service.submit(nspr, arrival_time=0) for nspr in nsprs[:2] + [NSPR("bad", 1, 5, 'hard', [[5.0, 5.0, 5.0, 0.0]] * 3), nsprs[2]]] # fails in the second round
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=10)
+    service.close()
+    assert (service.environment.infrastructure_manager.describe() == initial_observation).all()
+    assert service.environment.nsprs_lifecycle_manager.running_nsprs() == 0
+
+
+def test_http_server_places_requests_and_reports_stats(tmp_path):
+    service = make_service()
+    torch.save(service.model.state_dict(), tmp_path / "model.pt")
+    assert load_q_function(nodes.construct_nn({"architecture": 'mlp', "hidden_sizes": [16], "activation_func": 'relu'}, 4, 4, INFRAGEN["n_cnodes"]), tmp_path).training is False
+    server = PlacementHTTPServer(service, ("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://%s:%d" % server.server_address[:2]
+    try:
+        payload = {"vnfs": [[5.0, 5.0, 5.0, 0.0], [5.0, 5.0, 5.0, 4.0]], "duration": 10, "arrival_time": 3}
+        request = urllib.request.Request(url + "/place", data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            result = json.loads(response.read())
+        request = urllib.request.Request(url + "/place", data=json.dumps({"vnfs": [], "duration": 10}).encode(), headers={"Content-Type": "application/json"})
+        with pytest.raises(urllib.error.HTTPError) as bad_request:
+            urllib.request.urlopen(request)
+        with urllib.request.urlopen(url + "/stats") as response:
+            stats = json.loads(response.read())
+    finally:
+        server.shutdown() ; server.server_close() ; service.close()
+    assert result["accepted"] and len(result["placements"]) == 2 and result["nspr_id"] == 1
+    assert bad_request.value.code == 400
+    assert stats["requests"] == 1 and stats["accepted"] == 1 and service.environment.nsprs_lifecycle_manager.clock == 3
@@ -0,0 +1,19 @@
+"""
+Checks that SharedEncoderQFunction runs on any number of cnodes and scores
+each cnode independently of its position.
+"""
+import torch
+from kns.pipelines.myclasses.QFunction import SharedEncoderQFunction
+
+
+def test_shared_encoder_is_topology_size_independent():
+    torch.manual_seed(0)
+    model = SharedEncoderQFunction(n_cnode_features=4, n_vnf_features=4, hidden_sizes=[32, 16], nonlinearity='relu')
+    for n_cnodes in [6, 50]:
+        x = torch.rand(3, 4*n_cnodes + 4)
+        q_values = model(x).q_values
+        assert q_values.shape == (3, n_cnodes)
+        # permuting the cnodes permutes their Q-values
+        permutation = torch.randperm(n_cnodes)
+        permuted_x = torch.cat((x[:, :-4].reshape(3, n_cnodes, 4)[:, permutation].reshape(3, -1), x[:, -4:]), dim=1)
+        assert torch.allclose(model(permuted_x).q_values, q_values[:, permutation], atol=1e-6)
@@ -0,0 +1,56 @@
+"""
+Checks that the exported inference path of both Q-function architectures
+gives the Q-values and greedy actions of the eager model (approximately when
+quantized), and survives a TorchScript save/load round trip.
+"""
+import numpy
+import torch
+import pytest
+from kns.pipelines.ddqn_4_features import nodes
+from kns.pipelines.myclasses.ActionSelection import masked_greedy_actions
+from kns.pipelines.myclasses.QFunctionExport import ExportedQFunction
+
+N_CNODES = 6
+INPUT_SIZE = 4*N_CNODES + 4
+
+
+def make_model(architecture):
+    torch.manual_seed(0)
+    return nodes.construct_nn({"architecture": architecture, "hidden_sizes": [32, 16], "activation_func": 'tanh' if architecture == 'mlp' else 'relu'}, 4, 4, N_CNODES).eval()
+
+
+def observations(n):
+    # scales of the infrastructure observations (resources in the hundreds, requirements in the tens)
+    return torch.as_tensor(numpy.random.default_rng(0).uniform(0.0, 300.0, size=(n, INPUT_SIZE)), dtype=torch.float32) / 100
+
+
+@pytest.mark.parametrize("architecture", ['mlp', 'shared_encoder'])
+def test_exported_q_function_matches_eager_model(architecture, tmp_path):
+    model = make_model(architecture)
+    exported = ExportedQFunction(model, INPUT_SIZE, fixed_batch_sizes=(1, 16))
+    x = observations(64)
+    with torch.no_grad():
+        q_values = model(x).q_values
+    assert torch.allclose(exported.q_values(x), q_values, atol=1e-5)
+    for batch_size in (1, 16, 64): # fixed-shape paths and the generic one
+        assert torch.equal(exported(x[:batch_size]), q_values[:batch_size].argmax(dim=1))
+        assert torch.allclose(exported.q_values(x[:batch_size]), q_values[:batch_size], atol=1e-5)
+    masks = torch.as_tensor(numpy.random.default_rng(1).random((64, N_CNODES)) < 0.5)
+    masks[:, 0] = True
+    assert exported.masked_actions(x, masks).tolist() == masked_greedy_actions(q_values.numpy(), list(masks.numpy())).tolist()
+    exported.save(str(tmp_path / "q_function.pt"))
+    assert torch.equal(torch.jit.load(str(tmp_path / "q_function.pt"))(x), exported(x))
+
+
+@pytest.mark.parametrize("architecture", ['mlp', 'shared_encoder'])
+def test_quantized_q_function_mostly_agrees_with_eager_model(architecture):
+    model = make_model(architecture)
+    quantized = ExportedQFunction(model, INPUT_SIZE, quantize=True, fixed_batch_sizes=(1, 1000))
+    x = observations(1000)
+    with torch.no_grad():
+        q_values = model(x).q_values
+    assert torch.allclose(quantized.q_values(x), q_values, atol=0.1 * q_values.abs().max().item()) # traced path
+    assert torch.allclose(quantized.q_values(x[:999]), q_values[:999], atol=0.1 * q_values.abs().max().item()) # scripted one
+    assert (quantized(x) == q_values.argmax(dim=1)).double().mean().item() > 0.9
+    with pytest.raises(TypeError):
+        ExportedQFunction(torch.nn.Linear(INPUT_SIZE, N_CNODES), INPUT_SIZE)
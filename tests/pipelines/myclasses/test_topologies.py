@@ -0,0 +1,102 @@
+"""
+Checks the scalable topologies: sizes, connectivity, reproducibility and
+loading from files.
+"""
+import networkx
+import numpy
+import pytest
+from kns.pipelines.myclasses.InfrastructureGenerator import InfrastructureGenerator
+from kns.pipelines.myclasses.Topologies import fat_tree, multi_tier, waxman, random_geometric, from_file
+from .test_infrastructure_managers import INFRAGEN
+
+
+def generate(infrastructure, topology, is_for_train=True):
+    generator = InfrastructureGenerator(dict(INFRAGEN, infrastructure=infrastructure, topology=topology, is_for_train=is_for_train))
+    return generator, generator.generate()
+
+
+@pytest.mark.parametrize("infrastructure,topology,n_cnodes", [
+    ("fat_tree", {"k": 4}, 16),
+    ("multi_tier", {"n_core": 2, "n_aggregation": 4, "n_edge": 8, "cnodes_per_edge": 3}, 24),
+    ("waxman", {"n_routers": 60, "cnodes_per_router": 2, "alpha": 0.1, "beta": 0.3, "seed": 0}, 120),
+    ("random_geometric", {"n_routers": 60, "cnodes_per_router": 1, "radius": 0.1, "seed": 0}, 60)])
+def test_generated_topologies(infrastructure, topology, n_cnodes):
+    generator, graph = generate(infrastructure, topology)
+    assert generator.number_of_computing_nodes() == n_cnodes
+    assert sorted(cnode for cnode, cpu in graph.nodes.data("cpu") if cpu is not None) == sorted("s"+str(i) for i in range(1, n_cnodes+1))
+    assert all(graph.degree("s"+str(i)) == 1 for i in range(1, n_cnodes+1))
+    assert networkx.is_connected(graph)
+    # the structure only depends on the topology parameters, the resources on the seed
+    generator.reset()
+    next_graph = generator.generate()
+    assert sorted(next_graph.edges) == sorted(graph.edges)
+    assert [cpu for _, cpu in next_graph.nodes.data("cpu")] != [cpu for _, cpu in graph.nodes.data("cpu")]
+
+
+def test_fat_tree_structure():
+    topology = fat_tree(4)
+    assert len(topology.network_nodes) == 4 + 8 + 8 # core, aggregation and edge switches
+    assert len(topology.links) == 16 + 16 # edge-aggregation and aggregation-core links
+    degrees = numpy.bincount(topology.links.ravel(), minlength=len(topology.network_nodes))
+    assert (degrees == 4 - 2*(numpy.arange(20) >= 12)).all() # edge switches have k/2 uplinks (and k/2 cnodes)
+
+
+def links_graph(topology):
+    graph = networkx.Graph()
+    graph.add_nodes_from(range(len(topology.network_nodes)))
+    graph.add_edges_from(topology.links.tolist())
+    return graph
+
+
+def test_multi_tier_structure():
+    topology = multi_tier(n_core=2, n_aggregation=4, n_edge=6, cnodes_per_edge=3, uplinks=2)
+    assert len(topology.network_nodes) == 2 + 4 + 6 and topology.n_cnodes == 6*3
+    assert len(topology.links) == 4*2 + 6*2 # aggregation-core and edge-aggregation links
+    degrees = numpy.bincount(topology.links.ravel(), minlength=len(topology.network_nodes))
+    assert (degrees[:2] == 4).all() and (degrees[6:] == 2).all() # every aggregation switch reaches every core router, edge switches have 2 uplinks
+    assert (numpy.bincount(topology.cnode_attachments, minlength=12)[6:] == 3).all()
+    assert networkx.is_connected(links_graph(topology))
+
+
+@pytest.mark.parametrize("build", [lambda seed, chunk_size: waxman(80, 2, alpha=0.1, beta=0.2, seed=seed, chunk_size=chunk_size),
+                                   lambda seed, chunk_size: random_geometric(80, 2, radius=0.1, seed=seed, chunk_size=chunk_size)])
+def test_geometric_topologies_structure(build):
+    topology = build(0, 1024)
+    assert len(topology.network_nodes) == 80 and topology.n_cnodes == 160
+    assert (numpy.bincount(topology.cnode_attachments, minlength=80) == 2).all()
+    graph = links_graph(topology)
+    assert networkx.is_connected(graph) and graph.number_of_edges() == len(topology.links) # joined components, no duplicate links
+    assert (topology.links[:, 0] != topology.links[:, 1]).all()
+    # the structure only depends on the seed, not on the chunking of the pairs
+    assert numpy.array_equal(build(0, 1024).links, topology.links)
+    assert numpy.array_equal(build(0, 16).links, topology.links)
+    assert not numpy.array_equal(build(1, 1024).links, topology.links)
+
+
+def test_random_geometric_links_close_routers():
+    topology = random_geometric(100, 1, radius=0.15, seed=3)
+    positions = numpy.random.default_rng(3).uniform(size=(100, 2))
+    lengths = numpy.linalg.norm(positions[topology.links[:, 0]] - positions[topology.links[:, 1]], axis=1)
+    close = numpy.linalg.norm(positions[:, None, :] - positions[None, :, :], axis=2) <= 0.15
+    routers = networkx.Graph()
+    routers.add_nodes_from(range(100))
+    routers.add_edges_from(numpy.argwhere(numpy.triu(close, 1)).tolist())
+    n_components = networkx.number_connected_components(routers)
+    assert (lengths > 0.15).sum() == n_components - 1 # every pair closer than radius is linked, only the joining links are longer
+    assert len(topology.links) == numpy.triu(close, 1).sum() + n_components - 1
+
+
+@pytest.mark.parametrize("file_format", ["graphml", "edgelist"])
+def test_topology_from_file(tmp_path, file_format):
+    graph = networkx.cycle_graph(["a", "b", "c", "d"])
+    networkx.set_edge_attributes(graph, 1234.0, "bw")
+    path = str(tmp_path / ("topology."+file_format))
+    if file_format == "graphml":
+        networkx.write_graphml(graph, path)
+    else:
+        networkx.write_edgelist(graph, path, data=False)
+    topology = from_file(path, file_format, cnodes_per_router=2)
+    assert topology.n_cnodes == 8 and len(topology.links) == 4
+    _, infrastructure = generate("file", {"path": path, "file_format": file_format, "cnodes_per_router": 2})
+    core_bandwidths = {bandwidth for node1, node2, bandwidth in infrastructure.edges.data("bw") if node1[0] == node2[0] == "r"}
+    assert (core_bandwidths == {1234.0}) == (file_format == "graphml")
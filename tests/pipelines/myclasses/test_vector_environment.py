@@ -0,0 +1,61 @@
+"""
+Checks that VectorEnvironment steps its environments exactly as they would be
+stepped one by one, auto-resetting those whose episode is done.
+"""
+import numpy
+import functools
+from kns.pipelines.myclasses.VectorEnvironment import VectorEnvironment, SubprocessVectorEnvironment
+from kns.pipelines.myclasses.ArrayInfrastructureManager import ArrayInfrastructureManager
+from .test_infrastructure_managers import make_environment
+
+
+def test_vector_environment_matches_single_environments():
+    vector_env = VectorEnvironment([make_environment(ArrayInfrastructureManager, True, action_mask=True) for _ in range(2)])
+    single_envs = [make_environment(ArrayInfrastructureManager, True, action_mask=True) for _ in range(2)]
+    observations = vector_env.reset()
+    single_observations = [env.reset() for env in single_envs]
+    actions = numpy.random.default_rng(0)
+    n_dones = 0
+    for _ in range(300):
+        for env_index in range(2):
+            assert observations.dtype == numpy.float32
+            assert numpy.array_equal(observations[env_index], numpy.float32(numpy.concatenate((single_observations[env_index][0], single_observations[env_index][1]))))
+            assert numpy.array_equal(vector_env.action_masks[env_index], single_observations[env_index][2])
+        batch_actions = actions.integers(0, 6, size=2)
+        observations, rewards, dones, infos = vector_env.step(batch_actions)
+        for env_index, env in enumerate(single_envs):
+            single_observations[env_index], reward, done, _ = env.step(int(batch_actions[env_index]))
+            assert rewards[env_index] == reward and dones[env_index] == done
+            if done:
+                assert infos[env_index]["performance"] == env.nsprs_lifecycle_manager.running_and_successfully_terminated_nsprs()
+                single_observations[env_index] = env.reset()
+                n_dones += 1
+    assert n_dones > 0
+
+
+def test_subprocess_vector_environment_matches_single_environments():
+    factory = functools.partial(make_environment, ArrayInfrastructureManager, True, action_mask=True)
+    vector_env = SubprocessVectorEnvironment([factory, factory], observation_size=6*4+4, n_actions=6, action_mask=True)
+    batch_actions = numpy.random.default_rng(0).integers(0, 6, size=(200, 2))
+    try:
+        records = [(vector_env.reset(), vector_env.action_masks, None, None)]
+        for actions in batch_actions:
+            observations, rewards, dones, infos = vector_env.step(actions)
+            records.append((observations, vector_env.action_masks, rewards, dones))
+    finally:
+        vector_env.close()
+    assert records[1][0] is not records[2][0] # arrays handed out are never overwritten afterwards
+    n_dones = 0
+    for env_index in range(2):
+        env = factory()
+        obs = env.reset()
+        for step, (observations, action_masks, rewards, dones) in enumerate(records):
+            if step > 0:
+                obs, reward, done, _ = env.step(int(batch_actions[step-1][env_index]))
+                assert rewards[env_index] == reward and dones[env_index] == done
+                if done:
+                    obs = env.reset()
+                    n_dones += 1
+            assert numpy.array_equal(observations[env_index], numpy.float32(numpy.concatenate((obs[0], obs[1]))))
+            assert numpy.array_equal(action_masks[env_index], obs[2])
+    assert n_dones > 0
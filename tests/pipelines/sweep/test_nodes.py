@@ -0,0 +1,88 @@
+"""
+Checks the expansion of sweeps into trials, a small sweep run in worker
+processes, and that everything a trial builds can be sent to another process.
+"""
+import pickle
+import pathlib
+import pytest
+from kedro.config import OmegaConfigLoader
+from kns.pipelines.ddqn_4_features import nodes as ddqn_nodes
+from kns.pipelines.sweep.nodes import expand_sweep_trials, run_sweep_trials, run_trial, trial_parameters, rank_combinations
+from ..myclasses.test_infrastructure_managers import INFRAGEN, NSPRGEN
+
+PARAMETERS = OmegaConfigLoader(conf_source=str(pathlib.Path(__file__).parents[3] / "conf"), base_env="base", default_run_env="base")["parameters"]
+SMALL = dict({f"infragen.{key}": value for key, value in INFRAGEN.items() if key != "n_cnodes"},
+             **{f"nsprgen.{key}": value for key, value in NSPRGEN.items()},
+             **{"nn.hidden_sizes": [16], "rbuf.capacity": 1000, "ddqn.gpu": None, "ddqn.replay_start_size": 20, "ddqn.minibatch_size": 8,
+                "loop.eval_episodes_interval": 1}) # the short episodes of the myclasses tests
+SWEEP = dict(PARAMETERS["sweep"], search='grid', space={"opt.learning_rate": [1e-3, 1e-4]}, seeds=[0], max_episodes=2, final_window=2,
+             n_workers=2, threads_per_worker=1)
+
+
+def small_parameters():
+    return trial_parameters(PARAMETERS, {"overrides": SMALL, "seed": 0}, SWEEP)
+
+
+def test_grid_sweep_expands_every_combination_for_every_seed():
+    trials = expand_sweep_trials(dict(SWEEP, space={"opt.learning_rate": [1e-3, 1e-4], "nn.hidden_sizes": [[8], [16], [32]]}, seeds=[0, 1]))
+    assert [trial["trial"] for trial in trials] == list(range(12))
+    assert len({(trial["combination"], trial["seed"]) for trial in trials}) == 12
+    assert trials[0]["overrides"] == {"opt.learning_rate": 1e-3, "nn.hidden_sizes": [8]} and trials[1]["overrides"] == trials[0]["overrides"]
+
+
+def test_random_sweep_draws_reproducible_values_within_ranges():
+    sweep = dict(SWEEP, search='random', n_random_trials=5, space={"opt.learning_rate": {"low": 1e-5, "high": 1e-3, "log": True},
+                                                                   "explor.decay_steps": {"low": 100, "high": 200, "integer": True},
+                                                                   "nn.activation_func": ['relu', 'tanh']})
+    trials = expand_sweep_trials(sweep)
+    assert trials == expand_sweep_trials(sweep) and len(trials) == 5 * len(SWEEP["seeds"])
+    for trial in trials:
+        assert 1e-5 <= trial["overrides"]["opt.learning_rate"] <= 1e-3
+        assert isinstance(trial["overrides"]["explor.decay_steps"], int) and 100 <= trial["overrides"]["explor.decay_steps"] <= 200
+        assert trial["overrides"]["nn.activation_func"] in ('relu', 'tanh')
+    with pytest.raises(ValueError):
+        expand_sweep_trials(dict(SWEEP, search='bayesian'))
+
+
+def test_trial_parameters_apply_overrides_and_shift_training_seeds_only():
+    parameters = trial_parameters(PARAMETERS, {"overrides": {"opt.learning_rate": 1e-3}, "seed": 2}, SWEEP)
+    assert parameters["opt"]["learning_rate"] == 1e-3 and PARAMETERS["opt"]["learning_rate"] != 1e-3
+    assert parameters["nsprgen"]["train_seed"] != PARAMETERS["nsprgen"]["train_seed"] and parameters["nsprgen"]["eval_seed"] == PARAMETERS["nsprgen"]["eval_seed"]
+    assert parameters["loop"]["max_episodes"] == SWEEP["max_episodes"] and parameters["checkpoint"]["interval"] == 0
+    with pytest.raises(AssertionError):
+        trial_parameters(PARAMETERS, {"overrides": {"opt.learning_rat": 1e-3}, "seed": 0}, SWEEP)
+
+
+def test_trial_reads_relative_input_files_and_writes_its_outputs_in_its_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "arrivals.csv").write_text("time\n" + "\n".join(str(time) for time in range(0, 200, 2)))
+    trial = {"trial": 0, "combination": 0, "seed": 0, "overrides": dict(SMALL, **{"nsprgen.arrivals": {"process": 'trace', "path": 'arrivals.csv'}})}
+    result = run_trial(trial, PARAMETERS, dict(SWEEP, output_dir="sweep"))
+    assert result["error"] is None and len(result["performance_records"]) == 2
+    assert (tmp_path / "sweep" / "trial_0" / "myagent").is_dir() and not (tmp_path / "myagent").exists()
+    assert pathlib.Path.cwd() == tmp_path
+
+
+def test_sweep_runs_trials_in_worker_processes(tmp_path):
+    sweep = dict(SWEEP, output_dir=str(tmp_path / "sweep"))
+    results = run_sweep_trials(expand_sweep_trials(sweep), small_parameters(), sweep)
+    assert [result["error"] for result in results] == [None, None]
+    assert all(len(result["performance_records"]) == 2 and result["mean_final_performance"] is not None for result in results)
+    assert sorted(path.name for path in (tmp_path / "sweep").iterdir()) == ["trial_0", "trial_1"]
+    assert len(rank_combinations(results)) == 2
+
+
+def test_constructed_agent_and_environments_can_be_pickled():
+    parameters = small_parameters()
+    train_infra_gen, eval_infra_gen, n_cnodes = ddqn_nodes.construct_infrastructure_generators(parameters["infragen"])
+    train_infra_man, eval_infra_man = ddqn_nodes.construct_infrastructure_managers(train_infra_gen, eval_infra_gen, parameters["envs"])
+    train_nspr_gen, eval_nspr_gen = ddqn_nodes.construct_nspr_generators(parameters["nsprgen"])
+    train_nsprs_man, eval_nsprs_man = ddqn_nodes.construct_nsprs_lifecycle_managers()
+    train_env, eval_env = ddqn_nodes.construct_environments(train_infra_man, eval_infra_man, train_nspr_gen, eval_nspr_gen, train_nsprs_man, eval_nsprs_man, parameters["envs"])
+    model = ddqn_nodes.construct_nn(parameters["nn"], parameters["n_cnode_features"], parameters["n_vnf_features"], n_cnodes)
+    explorer = ddqn_nodes.construct_explorer(parameters["explor"], n_cnodes)
+    ddqn_agent = ddqn_nodes.construct_optimizer_and_ddqn_agent(model, parameters["opt"], ddqn_nodes.construct_replay_buffer(parameters["rbuf"]), explorer, parameters["ddqn"])
+    agent_copy, train_env_copy = pickle.loads(pickle.dumps((ddqn_agent, train_env)))
+    assert agent_copy.phi is ddqn_agent.phi
+    assert (agent_copy.phi(train_env_copy.reset()[0]) == ddqn_agent.phi(train_env.reset()[0])).all()
+    pickle.dumps(eval_env)